@@ -0,0 +1,88 @@
+"""
+Measures cold-start cost of the Cloud Function module.
+
+Usage:
+    python benchmarks/bench_cold_start.py [--repeat N] [--top N]
+
+Each stage runs in a fresh interpreter so nothing is cached between runs:
+importing main, then the extra imports the BeautifulSoup engine and the
+Gemini client pull in on first use. It also prints the slowest imports
+reported by `python -X importtime -c "import main"`.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STAGES = [
+    ('import main', 'import main'),
+    ('import main + BeautifulSoup engine', 'import main\nfrom scraping_engines import html_parsing\nhtml_parsing.parser_name()'),
+    ('import main + Gemini client', 'import main\nimport google.generativeai'),
+    ('load_config (cold, then warm)', None),
+]
+
+TIMER = '''
+import time, warnings
+warnings.filterwarnings('ignore')
+start = time.perf_counter()
+{code}
+print(time.perf_counter() - start)
+'''
+
+CONFIG_TIMER = '''
+import time, warnings
+warnings.filterwarnings('ignore')
+import logging
+logging.disable(logging.CRITICAL)
+import main
+start = time.perf_counter(); main.load_config(); cold = time.perf_counter() - start
+start = time.perf_counter(); main.load_config(); warm = time.perf_counter() - start
+print(cold, warm)
+'''
+
+
+def run_python(source, *flags):
+    result = subprocess.run(
+        [sys.executable, *flags, '-c', source], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    )
+    return result
+
+
+def slowest_imports(top):
+    stderr = run_python('import main', '-X', 'importtime').stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative), name.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'stage':<40}{'median ms':>12}{'min ms':>10}")
+    for name, code in STAGES:
+        if code is None:
+            samples = [tuple(map(float, run_python(CONFIG_TIMER).stdout.split())) for _ in range(args.repeat)]
+            cold = statistics.median(sample[0] for sample in samples)
+            warm = statistics.median(sample[1] for sample in samples)
+            print(f"{name:<40}{cold * 1000:>12.2f}{warm * 1000:>10.2f}  (cold / warm)")
+            continue
+        samples = [float(run_python(TIMER.format(code=code)).stdout) for _ in range(args.repeat)]
+        print(f"{name:<40}{statistics.median(samples) * 1000:>12.1f}{min(samples) * 1000:>10.1f}")
+
+    print("\nSlowest imports under `import main` (cumulative):")
+    for cumulative, name in slowest_imports(args.top):
+        print(f"{cumulative / 1000:>10.1f} ms  {name}")
+
+
+if __name__ == '__main__':
+    main()
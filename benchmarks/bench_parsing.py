@@ -0,0 +1,76 @@
+"""
+Micro-benchmark for the HTML parsing modes on a saved listings page.
+
+Usage:
+    python benchmarks/bench_parsing.py [path/to/page.html] [--repeat N]
+
+Compares the original full html.parser tree against the lxml backend and the
+SoupStrainer-limited parse of the listing containers.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+from scraping_engines import html_parsing  # noqa: E402
+
+DEFAULT_PAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'namdar_listings.html')
+
+
+def original_path(html_content):
+    soup = BeautifulSoup(html_content, 'html.parser')
+    return soup.find_all('div', class_=html_parsing.LISTING_CONTAINER_CLASS)
+
+
+def mode(parser, parse_only):
+    config = {'html_parser': parser, 'parse_only_listings': parse_only}
+    return lambda html_content: html_parsing.find_listing_items(html_content, config)
+
+
+MODES = [
+    ('html.parser, full tree (original)', original_path),
+    ('html.parser, listings only', mode('html.parser', True)),
+    ('lxml, full tree', mode('lxml', False)),
+    ('lxml, listings only', mode('lxml', True)),
+]
+
+
+def measure(func, html_content, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = func(html_content)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(html_content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(items), statistics.median(timings), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('page', nargs='?', default=DEFAULT_PAGE)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with open(args.page, 'r', encoding='utf-8') as f:
+        html_content = f.read()
+
+    print(f"{os.path.basename(args.page)}: {len(html_content) / 1024:.0f} KiB, {args.repeat} runs per mode\n")
+    print(f"{'mode':<36}{'items':>6}{'median ms':>12}{'peak KiB':>12}{'speedup':>9}")
+    baseline = None
+    for name, func in MODES:
+        count, median, peak = measure(func, html_content, args.repeat)
+        baseline = baseline or median
+        print(f"{name:<36}{count:>6}{median * 1000:>12.1f}{peak / 1024:>12.0f}{baseline / median:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
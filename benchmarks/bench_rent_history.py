@@ -0,0 +1,95 @@
+"""
+Micro-benchmark for rent history queries over years of twice-daily snapshots.
+
+Usage:
+    python benchmarks/bench_rent_history.py [--properties N] [--units N] [--years N] [--repeat N]
+
+Fills a temporary rent history with synthetic runs (rents drifting and
+occasionally dropping), then times appending one run, a price-drop scan, a
+median-rent series and the trend alerts of one run.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rent_history  # noqa: E402
+
+DAY_SECONDS = 86400
+
+
+def synthetic_run(properties, units, rents):
+    """One run's all_listings with every rent nudged; a few units drop by 5-15%."""
+    all_listings = []
+    for property_index in range(properties):
+        listings = []
+        for unit in range(units):
+            key = (property_index, unit)
+            rents[key] *= random.uniform(0.85, 0.95) if random.random() < 0.002 else random.uniform(0.998, 1.003)
+            listings.append({
+                'title': f"Residence {unit}",
+                'rent': f"${rents[key]:,.0f}",
+                'bed_bath': f"{unit % 3} bd / 1 ba",
+                'available_date': 'NOW',
+                'url': f"https://example.com/p{property_index}/u{unit}",
+            })
+        all_listings.append({'name': f"Property {property_index}", 'listings': listings})
+    return all_listings
+
+
+def timed(func, repeat):
+    timings = []
+    results = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results.append(func())
+        timings.append(time.perf_counter() - start)
+    return results[0], statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--properties', type=int, default=20)
+    parser.add_argument('--units', type=int, default=40)
+    parser.add_argument('--years', type=float, default=2)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(7)
+    history = rent_history.RentHistory(tempfile.mkdtemp(prefix='apt_finder_rent_history_'))
+    rents = {(p, u): random.uniform(1800, 4500) for p in range(args.properties) for u in range(args.units)}
+    runs = int(args.years * 365 * 2)
+    now = time.time()
+    start = time.perf_counter()
+    for run in range(runs):
+        last_run = synthetic_run(args.properties, args.units, rents)
+        history.append(last_run, now=now - (runs - 1 - run) * DAY_SECONDS / 2)
+    fill_seconds = time.perf_counter() - start
+    rows = runs * args.properties * args.units
+    print(f"{runs} runs x {args.properties * args.units} units = {rows:,} rows "
+          f"({rows * 24 / 1024 / 1024:.1f} MiB), filled in {fill_seconds:.1f} s\n")
+
+    options = rent_history.settings({'rent_history': {'price_drop_percent': 5, 'below_median_percent': 10}})
+    fresh = rent_history.RentHistory(history.directory)
+    queries = [
+        ('first query (reads every column)', lambda: fresh.price_drops(5, 14, now=now), 1),
+        ('append one run', lambda: history.append(last_run, now=now), args.repeat),
+        ('rent dropped >= 5% in 14 days', lambda: history.price_drops(5, 14, now=now), args.repeat),
+        ('median 1bd rent per property, daily', lambda: history.median_rent(beds=1), args.repeat),
+        ('median rent, one property, weekly', lambda: history.median_rent(property_name='Property 0', bucket_days=7), args.repeat),
+        ('trend alerts for one run', lambda: history.trend_alerts(last_run, options, now=now), args.repeat),
+    ]
+    print(f"{'query':<40}{'median ms':>12}{'results':>9}")
+    for name, func, repeat in queries:
+        result, median = timed(func, repeat)
+        count = sum(len(series) for series in result.values()) if isinstance(result, dict) else result if isinstance(result, int) else len(result)
+        print(f"{name:<40}{median * 1000:>12.1f}{count:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,323 @@
+"""
+Local stand-ins for every network dependency of the pipeline.
+
+* FixtureServer: serves recorded pages over HTTP (with ETags, so conditional
+  GETs can be exercised, and gzip when the client accepts it) and a fake
+  Jina reader under /jina/<url>. With volatile=True pages come without ETags
+  and with fresh tracking/CSRF tokens on every request, like most live sites.
+* SMTPSink: a minimal SMTP server that accepts and counts messages.
+* StubGeminiModel: a deterministic replacement for genai.GenerativeModel.
+"""
+import gzip
+import hashlib
+import http.server
+import json
+import re
+import socketserver
+import threading
+import time
+import uuid
+from html.parser import HTMLParser
+from urllib.parse import urlparse
+
+
+class _ReaderMarkdown(HTMLParser):
+    """Very small HTML -> markdown-ish converter standing in for the Jina reader."""
+
+    SKIP = {'script', 'style', 'head', 'noscript', 'svg'}
+
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+        self._skip_depth = 0
+        self._heading = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag in self.SKIP:
+            self._skip_depth += 1
+        elif tag == 'div' and 'js-listing-item' in (attrs.get('class') or '').split():
+            self.lines.append(f"\n### Listing {attrs.get('id', '')}\n")  # One section per listing block
+        elif tag in ('h1', 'h2', 'h3'):
+            self._heading = '#' * int(tag[1])
+        elif tag == 'a' and attrs.get('href') and not self._skip_depth:
+            self.lines.append(f"[link]({attrs['href']})")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag in ('h1', 'h2', 'h3'):
+            self._heading = None
+        elif tag in ('p', 'div', 'dl', 'li'):
+            self.lines.append('\n')
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        text = ' '.join(data.split())
+        if text:
+            self.lines.append(f"\n{self._heading} {text}\n" if self._heading else text + ' ')
+
+    def markdown(self):
+        return re.sub(r'\n{3,}', '\n\n', ''.join(self.lines)).strip()
+
+
+def html_to_markdown(html_content):
+    parser = _ReaderMarkdown()
+    parser.feed(html_content)
+    return parser.markdown()
+
+
+def add_volatile_tokens(html_content):
+    """Adds per-request tokens: a CSRF meta tag, a RUM session script and a hidden input in the first listing."""
+    token = uuid.uuid4().hex
+    html_content = html_content.replace(
+        '</head>',
+        f'<meta name="csrf-token" content="{token}" />'
+        f'<script>window.DD_RUM && DD_RUM.init({{sessionId: "{token}"}});</script></head>',
+        1,
+    )
+    return re.sub(
+        r'(<div class="listing-item result js-listing-item"[^>]*>)',
+        rf'\1<input type="hidden" name="authenticity_token" value="{token}" />',
+        html_content,
+        count=1,
+    )
+
+
+class FixtureServer:
+    """
+    Serves fixture pages on 127.0.0.1.
+
+    routes maps a path (e.g. '/property-3/listings/') to HTML. A request for
+    /jina/<absolute url> answers with that page converted to markdown, like
+    r.jina.ai would.
+    """
+
+    def __init__(self, routes, latency=0.0, compress=True, volatile=False):
+        self.routes = dict(routes)
+        self.latency = latency
+        self.compress = compress
+        self.volatile = volatile
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                path = self.path
+                is_jina = path.startswith('/jina/')
+                if is_jina:
+                    path = urlparse(path[len('/jina/'):]).path
+                body = server.routes.get(path)
+                if body is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                if is_jina:
+                    body = html_to_markdown(body)
+                elif server.volatile:
+                    body = add_volatile_tokens(body)
+                payload = body.encode('utf-8')
+                etag = '"' + hashlib.sha1(payload).hexdigest() + '"'
+                with server._lock:
+                    server.requests += 1
+                if not is_jina and self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/markdown' if is_jina else 'text/html; charset=utf-8')
+                if server.compress and 'gzip' in self.headers.get('Accept-Encoding', ''):
+                    payload = gzip.compress(payload, compresslevel=6)
+                    self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(payload)))
+                if not is_jina and not server.volatile:
+                    self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(payload)
+                with server._lock:
+                    server.bytes_sent += len(payload)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(http.server.ThreadingHTTPServer):
+            def handle_error(self, request, client_address):
+                pass  # Streamed fetches hang up mid-body on purpose
+
+        self._httpd = Server(('127.0.0.1', 0), Handler)
+        self._httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._httpd.server_port}"
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+class SMTPSink:
+    """Accepts SMTP sessions (EHLO, AUTH, MAIL, RCPT, DATA) and keeps the messages."""
+
+    def __init__(self):
+        self.messages = []
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write(line.encode('ascii') + b'\r\n')
+
+            def handle(self):
+                self.reply('220 localhost sink ready')
+                mail_from, recipients = None, []
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    command = line.decode('utf-8', 'replace').strip()
+                    verb = command.split(' ', 1)[0].upper()
+                    if verb == 'EHLO':
+                        self.reply('250-localhost')
+                        self.reply('250 AUTH PLAIN LOGIN')
+                    elif verb == 'HELO':
+                        self.reply('250 localhost')
+                    elif verb == 'AUTH':
+                        self.reply('235 2.7.0 Authentication successful')
+                    elif verb == 'MAIL':
+                        mail_from, recipients = command[10:].strip('<> '), []
+                        self.reply('250 OK')
+                    elif verb == 'RCPT':
+                        recipients.append(command[8:].strip('<> '))
+                        self.reply('250 OK')
+                    elif verb == 'DATA':
+                        self.reply('354 End data with <CR><LF>.<CR><LF>')
+                        data = []
+                        while True:
+                            data_line = self.rfile.readline()
+                            if not data_line or data_line in (b'.\r\n', b'.\n'):
+                                break
+                            data.append(data_line)
+                        sink.messages.append({'from': mail_from, 'to': recipients, 'data': b''.join(data)})
+                        self.reply('250 OK queued')
+                    elif verb == 'QUIT':
+                        self.reply('221 Bye')
+                        return
+                    else:  # RSET, NOOP and anything else
+                        self.reply('250 OK')
+
+        self._server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self.host, self.port = self._server.server_address
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _StubResponse:
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = None
+
+
+class _StubStream:
+    """Iterable of reply chunks, like a streamed GenerateContentResponse."""
+
+    def __init__(self, text, chunk_chars):
+        self.chunks = [_StubResponse(text[start:start + chunk_chars]) for start in range(0, len(text), chunk_chars)]
+        self.usage_metadata = None
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+
+class StubGeminiModel:
+    """
+    Deterministic stand-in for genai.GenerativeModel.generate_content.
+
+    Pulls rent, square feet, bed/bath, date, address and title out of each
+    listing section with regexes and answers in the fenced JSON format the
+    real model uses, as one reply or, with stream=True, in small chunks.
+    `latency` seconds are slept per call to model API time. `truncate_at`
+    cuts every reply off after that many characters.
+    """
+
+    MONEY = re.compile(r'\$\s?\d[\d,]*')
+    SQFT = re.compile(r'Square Feet:?\s*([\d,]+)', re.I)
+    BED_BATH = re.compile(r'((?:Studio|\d+ bd)\s*/\s*[\d.]+ ba)', re.I)
+    DATE = re.compile(r'Available:?\s*(\d{1,2}/\d{1,2}/\d{2,4}|NOW)', re.I)
+    ADDRESS = re.compile(r'([^\n]*?,\s*[A-Z]{2}\s+\d{5})')
+    TITLE = re.compile(r'(Residence [^\n,]+?)(?:\n| {2,}|$)')
+    SECTION = re.compile(r'^(?:Listing (\d+):|#{1,6} )', re.M)
+
+    STREAM_CHUNK_CHARS = 200
+
+    def __init__(self, latency=0.0, truncate_at=None):
+        self.latency = latency
+        self.truncate_at = truncate_at
+        self.calls = 0
+        self.prompt_chars = 0
+        self._lock = threading.Lock()
+
+    def _sections(self, text):
+        starts = [match for match in self.SECTION.finditer(text)]
+        if not starts:
+            return [(None, text)]
+        sections = []
+        for index, match in enumerate(starts):
+            end = starts[index + 1].start() if index + 1 < len(starts) else len(text)
+            sections.append((match.group(1), text[match.end():end]))
+        return sections
+
+    def _listing(self, number, text):
+        def first(pattern, group=0):
+            match = pattern.search(text)
+            return ' '.join(match.group(group).split()) if match else 'N/A'
+
+        listing = {
+            'rent': first(self.MONEY),
+            'square_feet': first(self.SQFT, 1),
+            'bed_bath': first(self.BED_BATH, 1),
+            'available_date': first(self.DATE, 1),
+            'address': first(self.ADDRESS, 1),
+            'title': first(self.TITLE, 1),
+            'url': 'N/A',
+        }
+        if number:
+            listing['listing_number'] = number
+        return listing
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+            self.prompt_chars += len(prompt)
+        if self.latency:
+            time.sleep(self.latency)
+        text = prompt.split('Listings text:', 1)[-1]
+        listings = [
+            self._listing(number, section) for number, section in self._sections(text) if self.MONEY.search(section)
+        ]
+        if kwargs.get('generation_config'):
+            reply = json.dumps(listings, indent=2)  # Structured output comes without fences
+        else:
+            reply = '```json\n' + json.dumps(listings, indent=2) + '\n```'
+        if self.truncate_at is not None:
+            reply = reply[:self.truncate_at]
+        return _StubStream(reply, self.STREAM_CHUNK_CHARS) if stream else _StubResponse(reply)
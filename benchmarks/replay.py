@@ -0,0 +1,374 @@
+"""
+Offline replay benchmark for the full apartment finder pipeline.
+
+Usage:
+    python benchmarks/replay.py [--properties N] [--engine BeautifulSoup|JinaAi|race]
+                                [--target main|agent] [--iterations N] [--repeat N] [--volatile] [--pipeline]
+                                [--shards N] [--baseline benchmarks/baseline.json] [--save-baseline]
+
+Recorded pages from benchmarks/fixtures/ are served by a local HTTP server
+(which also plays r.jina.ai), Gemini is replaced by a deterministic stub and
+alerts go to a local SMTP sink, so no network access or API keys are needed.
+The first iteration runs with empty caches, later ones reuse them.
+
+Reports wall time, properties per second, peak memory and time spent
+per stage, and exits with status 1 if any metric regresses more than
+--tolerance (--stage-tolerance for stage totals) against the stored baseline for the same scenario. The
+scenario is run --repeat times, each in a fresh process with empty
+caches. Medians are reported and saved as the baseline; a time is flagged
+only when even its fastest repetition exceeds the baseline median, since a
+real regression slows every repetition while other load on the machine
+slows only some.
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from offline_stubs import FixtureServer, SMTPSink, StubGeminiModel  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+MIN_COMPARED_SECONDS = 0.25  # Summed over threads; shorter stage totals are too noisy to flag
+MIN_REGRESSION_SECONDS = 0.1  # A slowdown must also exceed this, so scheduler jitter on short stages is not flagged
+
+
+class StageTimer:
+    """Accumulates call counts and wall time per stage from the run metrics of each iteration."""
+
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, calls, seconds):
+        with self._lock:
+            entry = self.stages.setdefault(stage, {'calls': 0, 'total_s': 0.0})
+            entry['calls'] += calls
+            entry['total_s'] += seconds
+
+    def reset(self):
+        with self._lock:
+            stages, self.stages = self.stages, {}
+        return stages
+
+
+def load_fixtures():
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(BENCH_DIR, 'fixtures', '*.html'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            fixtures[os.path.splitext(os.path.basename(path))[0]] = f.read()
+    return fixtures
+
+
+def build_routes(fixtures, properties):
+    """Gives every simulated property its own URL, cycling through the recorded pages."""
+    names = sorted(fixtures)
+    routes = {}
+    websites = []
+    for index in range(properties):
+        fixture = names[index % len(names)]
+        path = f"/property-{index}/{fixture}/"
+        routes[path] = fixtures[fixture]
+        websites.append({'name': f"Property {index} ({fixture})", 'path': path})
+    return routes, websites
+
+
+def build_config(args, server, websites):
+    host = server.base_url.split('//', 1)[1]
+    return {
+        'max_rent_threshold': 3200,
+        'websites': [{'name': site['name'], 'url': server.base_url + site['path']} for site in websites],
+        'filters': {
+            'min_sqft': 550,
+            'bedrooms': '1',
+            'bathrooms': '1',
+            'move_in_date_range_days': 20,
+            'desired_move_in_date': '05/10/2025',
+        },
+        'scraping_engine': args.engine,
+        'site_profiles': not args.no_profiles,
+        'streaming': {'enabled': not args.no_streaming},
+        'pipeline': {'enabled': args.pipeline},
+        'sharding': {'enabled': args.shards > 0, 'shards': max(1, args.shards)},
+        # Simulated properties reuse the same recorded pages, so de-duplication would fold them into one
+        'dedup': {'enabled': False},
+        'rate_limits': {'hosts': {host: {'requests_per_second': 1000, 'burst': 1000}}},
+        'engine_config': {},
+    }
+
+
+def run_main(args, timer, stub, sink):
+    import flask
+    import main
+
+    main._gemini_model = stub
+    app = flask.Flask('replay')
+
+    def call(request_json):
+        with app.test_request_context(json=request_json):
+            response, status = main.run_apartment_finder(flask.request)
+        return response.get_json(), status
+
+    def run_once():
+        # Stage times come from the response's own metrics block
+        payload, status = call({})
+        if args.pipeline:
+            # Queued run: poll its status until the alert stage has finished
+            run_id = payload['run_id']
+            while status == 202:
+                time.sleep(0.01)
+                payload, status = call({'run_id': run_id})
+            payload = payload.get('result') or payload
+        if status != 200:
+            raise RuntimeError(f"run_apartment_finder returned {status}: {payload}")
+        for stage, entry in payload['metrics']['stages'].items():
+            if stage != 'property':  # Per-property totals overlap every other stage
+                timer.add(stage, entry['calls'], entry['total_ms'] / 1000)
+        matching = payload.get('matching_listings', payload['listings'])  # Without subscriber profiles
+        return sum(len(property_data['listings']) for property_data in matching)
+
+    return run_once
+
+
+def run_agent(args, timer, stub, sink):
+    import agent
+    import main
+    import run_metrics
+
+    main._gemini_model = stub
+
+    def run_once():
+        with run_metrics.run() as metrics:
+            agent.main()
+        for stage, entry in metrics.to_dict()['stages'].items():
+            timer.add(stage, entry['calls'], entry['total_ms'] / 1000)
+        return None
+
+    return run_once
+
+
+def measure(run_once, timer, server, sink, properties, trace_memory=False):
+    requests_before, bytes_before, emails_before = server.requests, server.bytes_sent, len(sink.messages)
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    listings = run_once()
+    wall = time.perf_counter() - start
+    traced_peak = None
+    if trace_memory:
+        traced_peak = round(tracemalloc.get_traced_memory()[1] / 1024)
+        tracemalloc.stop()
+    return {
+        'wall_s': round(wall, 4),
+        'properties_per_s': round(properties / wall, 2) if wall else None,
+        'peak_mem_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,  # Process high-water mark (KiB on Linux)
+        'peak_traced_kib': traced_peak,
+        'http_requests': server.requests - requests_before,
+        'bytes_served': server.bytes_sent - bytes_before,
+        'emails': len(sink.messages) - emails_before,
+        'listings': listings,
+        'stages': {name: {'calls': entry['calls'], 'total_s': round(entry['total_s'], 4)} for name, entry in sorted(timer.reset().items())},
+    }
+
+
+def scenario_key(args):
+    key = f"{args.target}:{args.engine}:{args.properties}p:profiles={not args.no_profiles}:gemini={args.gemini_latency}s:site={args.site_latency}s"
+    key += (':volatile' if args.volatile else '') + (':pipeline' if args.pipeline else '')
+    return key + (f':shards={args.shards}' if args.shards else '')
+
+
+def summarize_repetitions(repetitions, statistic, properties):
+    """Per-iteration summary of repetitions of a scenario: statistic of the times, median of the memory."""
+    merged = []
+    for samples in zip(*repetitions):
+        result = dict(samples[0])
+        result['wall_s'] = round(statistic([sample['wall_s'] for sample in samples]), 4)
+        result['properties_per_s'] = round(properties / result['wall_s'], 2) if result['wall_s'] else None
+        result['peak_mem_kib'] = statistics.median(sample['peak_mem_kib'] for sample in samples)
+        stages = {}
+        for name in sorted({name for sample in samples for name in sample['stages']}):
+            entries = [sample['stages'][name] for sample in samples if name in sample['stages']]
+            stages[name] = {
+                'calls': max(entry['calls'] for entry in entries),
+                'total_s': round(statistic([entry['total_s'] for entry in entries]), 4),
+            }
+        result['stages'] = stages
+        merged.append(result)
+    return merged
+
+
+def compare(results, baseline, tolerance, stage_tolerance):
+    """
+    Returns a list of human readable regressions of results against baseline.
+
+    Stage totals are summed over concurrent threads, so CPU and GIL contention
+    swing them more than wall time; they are held to stage_tolerance instead.
+    """
+    regressions = []
+    for index, (current, previous) in enumerate(zip(results, baseline)):
+        label = 'cold' if index == 0 else f"warm #{index}"
+        checks = [('wall_s', current['wall_s'], previous['wall_s'], tolerance, MIN_REGRESSION_SECONDS),
+                  ('peak_mem_kib', current['peak_mem_kib'], previous['peak_mem_kib'], tolerance, 0)]
+        for stage, entry in previous.get('stages', {}).items():
+            if entry['total_s'] >= MIN_COMPARED_SECONDS:
+                checks.append((f"stage {stage}", current['stages'].get(stage, {}).get('total_s', 0.0), entry['total_s'],
+                               stage_tolerance, MIN_REGRESSION_SECONDS))
+        for name, value, reference, allowed, floor in checks:
+            if reference and value > reference * (1 + allowed) and value - reference > floor:
+                regressions.append(f"{label} {name}: {value} vs baseline {reference} (+{(value / reference - 1) * 100:.0f}%)")
+    return regressions
+
+
+def run_repetitions(args):
+    """Runs the scenario args.repeat times, each in a fresh process, and returns (results per repetition, stub stats)."""
+    repetitions = []
+    stub_stats = None
+    for repetition in range(args.repeat):
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            output = f.name
+        try:
+            subprocess.run([sys.executable, os.path.abspath(__file__), *sys.argv[1:], '--repeat', '1', '--results-json', output],
+                           check=True)
+            with open(output, 'r') as f:
+                data = json.load(f)
+        finally:
+            os.remove(output)
+        repetitions.append(data['results'])
+        stub_stats = stub_stats or data['stub']
+        print(f"  repetition {repetition + 1}/{args.repeat}: " + ', '.join(f"{result['wall_s'] * 1000:.0f} ms" for result in data['results']))
+    return repetitions, stub_stats
+
+
+def print_results(key, results):
+    print(f"\nScenario {key}")
+    for index, result in enumerate(results):
+        label = 'cold' if index == 0 else f"warm #{index}"
+        print(
+            f"  [{label}] {result['wall_s'] * 1000:.0f} ms, {result['properties_per_s']} properties/s, "
+            f"peak RSS {result['peak_mem_kib']} KiB"
+            + (f" (traced {result['peak_traced_kib']} KiB)" if result['peak_traced_kib'] is not None else '')
+            + f", {result['http_requests']} HTTP requests, "
+            f"{result['bytes_served'] / 1024:.0f} KiB served, {result['emails']} emails, listings={result['listings']}"
+        )
+        for stage, entry in result['stages'].items():
+            print(f"      {stage:<22}{entry['calls']:>6} calls{entry['total_s'] * 1000:>12.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--properties', type=int, default=10)
+    parser.add_argument('--engine', default='BeautifulSoup', choices=['BeautifulSoup', 'JinaAi', 'race'])
+    parser.add_argument('--target', default='main', choices=['main', 'agent'])
+    parser.add_argument('--iterations', type=int, default=2, help='first run is cold, the rest reuse caches')
+    parser.add_argument('--no-profiles', action='store_true', help='disable site profiles so every block goes to Gemini')
+    parser.add_argument('--no-streaming', action='store_true', help='buffer whole pages instead of streaming them')
+    parser.add_argument('--shards', type=int, default=0, help='run properties in this many worker processes (Gemini is not stubbed there)')
+    parser.add_argument('--pipeline', action='store_true', help='queue the run on the stage workers and poll for the result')
+    parser.add_argument('--volatile', action='store_true', help='serve pages without ETags and with per-request tokens')
+    parser.add_argument('--gemini-latency', type=float, default=0.2, help='seconds the stub model sleeps per call')
+    parser.add_argument('--site-latency', type=float, default=0.05, help='seconds the fixture server sleeps per request')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown of wall time and memory')
+    parser.add_argument('--stage-tolerance', type=float, default=0.5, help='allowed slowdown of per-stage totals')
+    parser.add_argument('--repeat', type=int, default=5, help='runs of the scenario, each in a fresh process')
+    parser.add_argument('--results-json', help=argparse.SUPPRESS)  # Set on the per-repetition processes
+    parser.add_argument('--trace-memory', action='store_true', help='also report tracemalloc peak (slows the run)')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    key = scenario_key(args)
+    if args.repeat > 1:
+        repetitions, stub_stats = run_repetitions(args)
+        results = summarize_repetitions(repetitions, statistics.median, args.properties)
+        fastest = summarize_repetitions(repetitions, min, args.properties)
+        print_results(key + f" (median of {args.repeat} runs)", results)
+    else:
+        results, stub_stats = run_scenario(args)
+        fastest = results
+        if args.results_json:
+            with open(args.results_json, 'w') as f:
+                json.dump({'results': results, 'stub': stub_stats}, f)
+            return 0
+        print_results(key, results)
+    print(f"  Gemini stub: {stub_stats['calls']} calls, {stub_stats['prompt_chars'] / 1024:.0f} KiB of prompt")
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baselines = json.load(f)
+
+    if args.save_baseline:
+        baselines[key] = results
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"\nSaved baseline for {key} to {args.baseline}")
+        return 0
+
+    if key not in baselines:
+        print(f"\nNo baseline for this scenario in {args.baseline}; run with --save-baseline to record one.")
+        return 0
+    regressions = compare(fastest, baselines[key], args.tolerance, args.stage_tolerance)
+    if regressions:
+        print(f"\nREGRESSIONS (> {args.tolerance * 100:.0f}% over baseline, {args.stage_tolerance * 100:.0f}% for stages):")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print(f"\nNo regressions against baseline (tolerance {args.tolerance * 100:.0f}%, {args.stage_tolerance * 100:.0f}% for stages).")
+    return 0
+
+
+def run_scenario(args):
+    """Runs the scenario's iterations in this process; returns (results, stub stats)."""
+    workdir = tempfile.mkdtemp(prefix='apt_finder_replay_')
+    fixtures = load_fixtures()
+    routes, websites = build_routes(fixtures, args.properties)
+
+    with FixtureServer(routes, latency=args.site_latency, volatile=args.volatile) as server, SMTPSink() as sink:
+        # Environment must be in place before the pipeline modules are imported
+        os.environ.update({
+            'APT_FINDER_CACHE_DIR': os.path.join(workdir, 'cache'),
+            'JINA_READER_URL': server.base_url + '/jina/',
+            'SMTP_HOST': sink.host,
+            'SMTP_PORT': str(sink.port),
+            'ALERT_SENDER': 'replay@localhost',
+            'ALERT_RECIPIENTS': 'alerts@localhost',
+            'GOOGLE_API_KEY': os.environ.get('GOOGLE_API_KEY', 'offline'),
+            'JINA_API_KEY': os.environ.get('JINA_API_KEY', 'offline'),
+        })
+        config = build_config(args, server, websites)
+        if args.target == 'agent':
+            config['websites'] = [site['url'] for site in config['websites']]
+            config['scraping_engine'] = 'beautifulsoup'
+        with open(os.path.join(workdir, 'config.json'), 'w') as f:
+            json.dump(config, f)
+        os.chdir(workdir)  # Both entry points read ./config.json
+
+        timer = StageTimer()
+        stub = StubGeminiModel(latency=args.gemini_latency)
+        run_once = (run_agent if args.target == 'agent' else run_main)(args, timer, stub, sink)
+        results = []
+        for _ in range(args.iterations):
+            results.append(measure(run_once, timer, server, sink, args.properties, args.trace_memory))
+
+    return results, {'calls': stub.calls, 'prompt_chars': stub.prompt_chars}
+
+
+if __name__ == '__main__':
+    sys.exit(main())
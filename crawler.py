@@ -0,0 +1,117 @@
+import logging
+import re
+from urllib.parse import parse_qsl, urldefrag, urlencode, urljoin, urlsplit, urlunsplit
+import fetch_pool
+import run_metrics
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_DEPTH = 1
+DEFAULT_MAX_PAGES = 20
+DEFAULT_CONCURRENCY = 4
+
+# Links in HTML (href attributes) and in reader markdown ([text](url))
+_LINK = re.compile(r'''\bhref\s*=\s*["']([^"'#][^"']*)["']|\]\((https?://[^)\s]+)\)''', re.I)
+TRACKING_PARAMS = ('utm_', 'gclid', 'fbclid', 'msclkid', '_ga', '_gl')
+
+
+def rules_for(property):
+    """
+    Returns the crawl rules of a website entry with defaults filled in, or None if it has none.
+
+    A website entry's optional "crawl" section:
+        follow (list): Regexes for links to floorplan / detail pages; following one adds a level of depth.
+        pagination (list): Regexes for "next page" links; these stay on the same depth.
+        max_depth (int): Levels of `follow` links below the seed URL (default 1).
+        max_pages (int): Pages fetched per property, seed included (default 20).
+        same_host (bool): Only follow links on the seed's host (default true).
+        concurrency (int): Pages fetched at once (default 4); per-host rate limits still apply.
+    """
+    crawl_config = property.get('crawl')
+    if not crawl_config:
+        return None
+    return {
+        'follow': [re.compile(pattern) for pattern in crawl_config.get('follow', [])],
+        'pagination': [re.compile(pattern) for pattern in crawl_config.get('pagination', [])],
+        'max_depth': crawl_config.get('max_depth', DEFAULT_MAX_DEPTH),
+        'max_pages': crawl_config.get('max_pages', DEFAULT_MAX_PAGES),
+        'same_host': crawl_config.get('same_host', True),
+        'concurrency': crawl_config.get('concurrency', DEFAULT_CONCURRENCY),
+    }
+
+
+def canonical_url(url):
+    """Normalizes a URL for de-duplication: no fragment, lowercase host, no tracking parameters."""
+    url, _ = urldefrag(url)
+    parts = urlsplit(url)
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+             if not key.lower().startswith(TRACKING_PARAMS)]
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', urlencode(query), ''))
+
+
+def extract_links(content, base_url):
+    """Returns the absolute, canonical http(s) URLs linked from an HTML or markdown page, in page order."""
+    links = []
+    for match in _LINK.finditer(content):
+        href = (match.group(1) or match.group(2)).strip().replace('&amp;', '&')
+        url = urljoin(base_url, href)
+        if url.startswith(('http://', 'https://')):
+            links.append(canonical_url(url))
+    return list(dict.fromkeys(links))
+
+
+def _classify(url, rules, seed_host):
+    """Returns 'pagination', 'follow' or None for a discovered link."""
+    if rules['same_host'] and urlsplit(url).netloc != seed_host:
+        return None
+    if any(pattern.search(url) for pattern in rules['pagination']):
+        return 'pagination'
+    if any(pattern.search(url) for pattern in rules['follow']):
+        return 'follow'
+    return None
+
+
+def crawl(seed_url, rules, fetch_page):
+    """
+    Fetches a property's seed page and the pages its crawl rules lead to.
+
+    Pages are fetched level by level, each level concurrently; every URL is
+    fetched at most once.
+
+    Args:
+        seed_url (str): The website entry's url.
+        rules (dict): From rules_for().
+        fetch_page (callable): Returns a page's content (HTML or markdown) for a URL, or None on failure.
+
+    Returns:
+        list: (url, content) for every page fetched successfully, seed first, in discovery order.
+    """
+    seed_url = canonical_url(seed_url)
+    seed_host = urlsplit(seed_url).netloc
+    seen = {seed_url}
+    frontier = [(seed_url, 0)]
+    pages = []
+    fetched = 0
+    while frontier and fetched < rules['max_pages']:
+        frontier = frontier[:rules['max_pages'] - fetched]
+        fetched += len(frontier)
+        contents = fetch_pool.map_in_order(lambda entry: fetch_page(entry[0]), frontier, max_workers=rules['concurrency'])
+        next_frontier = []
+        for (url, depth), content in zip(frontier, contents):
+            if not content:
+                continue
+            pages.append((url, content))
+            for link in extract_links(content, url):
+                kind = _classify(link, rules, seed_host)
+                link_depth = depth if kind == 'pagination' else depth + 1
+                if kind is None or link in seen or link_depth > rules['max_depth']:
+                    continue
+                seen.add(link)
+                next_frontier.append((link, link_depth))
+        frontier = next_frontier
+    if frontier:
+        logger.warning(f"Crawl of {seed_url} stopped at max_pages={rules['max_pages']}; {len(frontier)} pages left unvisited.")
+    run_metrics.count('crawl_pages', len(pages))
+    logger.info(f"Crawled {len(pages)} pages from {seed_url}.")
+    return pages
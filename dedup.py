@@ -0,0 +1,232 @@
+import logging
+import re
+import numpy as np
+import listing_records
+import run_metrics
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_NUM_PERM = 64
+DEFAULT_BANDS = 16
+DEFAULT_THRESHOLD = 0.7
+COMMON_FRACTION = 0.05
+MIN_COMMON_TEXTS = 3
+RENT_TOLERANCE = 0.03  # Sources updated at different times may disagree on rent by this much
+_PRIME = np.uint64(4294967311)  # Smallest prime above 2**32, for (a * h + b) % p hashing of 24-bit shingles
+_BAND_MULTIPLIERS = np.random.default_rng(2).integers(1, 2 ** 63, size=64, dtype=np.uint64) | np.uint64(1)
+
+_NON_WORD = re.compile(r'[^a-z0-9$ ]+')
+_NUMBER = re.compile(r'\d+')
+_ZIP_CODE = re.compile(r'\b\d{5}(?:-\d{4})?\b')
+# Spellings that differ between a property's site, AppFolio and the Jina markdown
+_ABBREVIATIONS = {
+    'street': 'st', 'avenue': 'ave', 'road': 'rd', 'boulevard': 'blvd', 'drive': 'dr', 'place': 'pl',
+    'lane': 'ln', 'court': 'ct', 'north': 'n', 'south': 's', 'east': 'e', 'west': 'w',
+    'residence': 'unit', 'apartment': 'unit', 'apt': 'unit', 'suite': 'unit', 'ste': 'unit',
+    'sq': '', 'ft': '', 'sqft': '', 'feet': '',
+}
+
+
+def settings(config):
+    """Returns the 'dedup' section of config.json with defaults filled in."""
+    dedup_config = (config or {}).get('dedup', {})
+    return {
+        'enabled': dedup_config.get('enabled', True),
+        'threshold': dedup_config.get('threshold', DEFAULT_THRESHOLD),
+        'num_perm': dedup_config.get('num_perm', DEFAULT_NUM_PERM),
+        'bands': dedup_config.get('bands', DEFAULT_BANDS),
+    }
+
+
+def normalize(listing):
+    """Returns the text a listing is compared on: address, unit, rent and square feet, spelled one way."""
+    text = ' '.join(str(listing.get(field) or '') for field in ('address', 'title', 'rent', 'square_feet')).lower()
+    text = _NON_WORD.sub(' ', text.replace('#', ' unit ').replace(',', ''))
+    return ' '.join(_ABBREVIATIONS.get(word, word) for word in text.split() if _ABBREVIATIONS.get(word, word))
+
+
+def unit_numbers(listing):
+    """Numbers naming the unit (street and unit numbers, not ZIP codes, rent or size)."""
+    text = _ZIP_CODE.sub(' ', f"{listing.get('address') or ''} {listing.get('title') or ''}")
+    return frozenset(_NUMBER.findall(text))
+
+
+def _numbers_agree(first, second, tolerance):
+    """Whether two parsed values (None when unknown) could describe the same unit."""
+    if first is None or second is None:
+        return True
+    return abs(first - second) <= tolerance * max(first, second)
+
+
+def signatures(texts, num_perm=DEFAULT_NUM_PERM, seed=1):
+    """
+    Returns the MinHash signatures of texts as a (len(texts), num_perm) array.
+
+    Shingles found in more than COMMON_FRACTION of the texts (city, state,
+    "unit", a street every listing of a building shares) are left out, so the
+    signatures reflect what tells units apart and LSH buckets stay small. All
+    texts' shingles are then permuted at once and reduced per text, so the
+    cost is one vectorized pass over every shingle of the run.
+    """
+    # Normalized text is ASCII, so a character 3-gram packs exactly into 24 bits
+    padded = [f" {text or '_'} " for text in texts]
+    data = np.frombuffer(''.join(padded).encode('ascii'), dtype=np.uint8).astype(np.uint64)
+    text_of = np.repeat(np.arange(len(texts), dtype=np.uint64), [len(text) for text in padded])
+    codes = (data[:-2] << np.uint64(16)) | (data[1:-1] << np.uint64(8)) | data[2:]
+    inside = text_of[:-2] == text_of[2:]
+    shingles = np.sort((text_of[:-2][inside] << np.uint64(24)) | codes[inside])  # Sorted by text
+    distinct = shingles[np.r_[True, shingles[1:] != shingles[:-1]]]
+    flat = distinct & np.uint64(0xFFFFFF)
+    counts = np.bincount((distinct >> np.uint64(24)).astype(np.int64), minlength=len(texts))
+    starts = np.r_[0, np.cumsum(counts)[:-1]]
+
+    # A text's shingles are distinct, so a shingle's count is the number of texts it appears in
+    _, inverse, frequency = np.unique(flat, return_inverse=True, return_counts=True)
+    keep = frequency[inverse] <= max(MIN_COMMON_TEXTS, COMMON_FRACTION * len(texts))
+    kept = np.add.reduceat(keep.astype(np.int64), starts)
+    keep |= np.repeat(kept == 0, counts)  # A text made only of common shingles keeps them
+    flat = flat[keep]
+    starts = np.r_[0, np.cumsum(np.where(kept == 0, counts, kept))[:-1]]
+
+    rng = np.random.default_rng(seed)
+    # a, b < 2**32 and shingles < 2**24 keep a * h + b below 2**64
+    a = rng.integers(1, 2 ** 32 - 1, size=(num_perm, 1), dtype=np.uint64)
+    b = rng.integers(0, 2 ** 32 - 1, size=(num_perm, 1), dtype=np.uint64)
+    permuted = (a * flat[None, :] + b) % _PRIME
+    return np.minimum.reduceat(permuted, starts, axis=1).T
+
+
+class _UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, item):
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:  # Path compression
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, first, second):
+        """Merges the sets of first and second and returns the merged set's root."""
+        first, second = self.find(first), self.find(second)
+        if first != second:
+            self.parent[max(first, second)] = min(first, second)
+        return min(first, second)
+
+
+def clusters(listings, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM, bands=DEFAULT_BANDS):
+    """
+    Groups near-duplicate listings by locality-sensitive hashing of their MinHash signatures.
+
+    Listings sharing a band of their signature are candidates; a candidate pair
+    is merged when its estimated Jaccard similarity reaches threshold, the
+    unit numbers of one cluster are a subset of the other's (so unit 801 never
+    merges with 802 however similar the rest is, even through a listing that
+    names neither) and their square feet and rents
+    (within RENT_TOLERANCE) agree where both are known. Work grows with the number of
+    listings and bucket sizes, not with the number of pairs.
+
+    Returns:
+        list: Lists of listing indices, one per cluster, in order of first occurrence.
+    """
+    if not listings:
+        return []
+    texts = [normalize(listing) for listing in listings]
+    signature = signatures(texts, num_perm)
+    numbers = [unit_numbers(listing) for listing in listings]
+    rents = [listing_records.parse_number(listing.get('rent')) for listing in listings]
+    sizes = [listing_records.parse_number(listing.get('square_feet')) for listing in listings]
+    rows = num_perm // bands
+    union_find = _UnionFind(len(listings))
+    # Unit numbers of each cluster, by root. Compared per cluster rather than per pair, since
+    # "Main St" is compatible with both "Main St #801" and "Main St #802" but they are not with each other.
+    cluster_numbers = list(numbers)
+    for band in range(bands):
+        # Listings whose signatures agree on every row of the band share a bucket. The rows are
+        # folded into one key; the rare key collision only adds a candidate that is then verified.
+        keys = np.bitwise_xor.reduce(signature[:, band * rows:(band + 1) * rows] * _BAND_MULTIPLIERS[:rows], axis=1)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        bucket_starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        counts = np.diff(np.r_[bucket_starts, len(keys)])
+        order = order.tolist()
+        for start, count in zip(bucket_starts[counts > 1].tolist(), counts[counts > 1].tolist()):
+            members = order[start:start + count]
+            for position, first in enumerate(members):
+                for second in members[position + 1:]:
+                    first_root, second_root = union_find.find(first), union_find.find(second)
+                    if not texts[first] or first_root == second_root:
+                        continue  # Listings with nothing to compare on are never merged
+                    first_numbers, second_numbers = cluster_numbers[first_root], cluster_numbers[second_root]
+                    if not (first_numbers <= second_numbers or second_numbers <= first_numbers):
+                        continue
+                    if not (_numbers_agree(rents[first], rents[second], RENT_TOLERANCE)
+                            and _numbers_agree(sizes[first], sizes[second], 0)):
+                        continue
+                    if np.mean(signature[first] == signature[second]) >= threshold:
+                        cluster_numbers[union_find.union(first, second)] = first_numbers | second_numbers
+    grouped = {}
+    for index in range(len(listings)):
+        grouped.setdefault(union_find.find(index), []).append(index)
+    return list(grouped.values())
+
+
+def _completeness(listing):
+    return sum(1 for value in listing.values() if value not in (None, '', 'N/A'))
+
+
+@run_metrics.timed('dedup')
+def dedup_listings(all_listings, config=None):
+    """
+    Collapses near-duplicate listings of a run into one canonical record each.
+
+    The same unit is often extracted from the property's own page and its
+    AppFolio listing, or by both engines. The canonical record is the most
+    complete one, with fields it lacks filled in from its duplicates and a
+    'sources' list of every (property, url) it was found at. It stays in the
+    first property it appeared in.
+
+    Args:
+        all_listings (list): [{'name': property name, 'listings': [listing dicts]}].
+
+    Returns:
+        list: Same shape, without the duplicates.
+    """
+    options = settings(config)
+    if not options['enabled']:
+        return all_listings
+    entries = [(property_index, listing)
+               for property_index, property_data in enumerate(all_listings)
+               for listing in property_data['listings']]
+    groups = clusters([listing for _, listing in entries], options['threshold'], options['num_perm'], options['bands'])
+
+    kept = {}  # first index of a cluster -> canonical record
+    for group in groups:
+        if len(group) == 1:
+            kept[group[0]] = entries[group[0]][1]
+            continue
+        members = [entries[index][1] for index in group]
+        canonical = dict(max(members, key=_completeness))
+        for member in members:
+            for field, value in member.items():
+                if canonical.get(field) in (None, '', 'N/A') and value not in (None, '', 'N/A'):
+                    canonical[field] = value
+        sources = []
+        for index in group:
+            source = {'property': all_listings[entries[index][0]]['name'], 'url': entries[index][1].get('url')}
+            if source not in sources:
+                sources.append(source)
+        canonical['sources'] = sources
+        kept[group[0]] = canonical
+
+    result = [{'name': property_data['name'], 'listings': []} for property_data in all_listings]
+    for index in sorted(kept):
+        result[entries[index][0]]['listings'].append(kept[index])
+    removed = len(entries) - len(kept)
+    run_metrics.count('duplicates_removed', removed)
+    if removed:
+        logger.info(f"Removed {removed} duplicate listings ({len(entries)} -> {len(kept)}).")
+    return result
@@ -0,0 +1,118 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import resilience
+import run_metrics
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_TOKENS = 6000
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_STRUCTURED_OUTPUT = True  # Ask Gemini for JSON matching the listing schema
+DEFAULT_STREAM = True  # Decode listings while the reply is still arriving
+RETRY_DELAY_SECONDS = 1.0
+CHARS_PER_TOKEN = 4  # Rough average for English text and markup
+
+# Caps Gemini calls across every property processed in this instance, not per property.
+_slots = threading.BoundedSemaphore(DEFAULT_MAX_CONCURRENCY)
+_max_concurrency = DEFAULT_MAX_CONCURRENCY
+
+
+def settings(config):
+    """Returns the 'extraction' section of config.json with defaults filled in."""
+    extraction_config = (config or {}).get('extraction', {})
+    return {
+        'chunk_tokens': extraction_config.get('chunk_tokens', DEFAULT_CHUNK_TOKENS),
+        'max_concurrency': extraction_config.get('max_concurrency', DEFAULT_MAX_CONCURRENCY),
+        'max_retries': extraction_config.get('max_retries', DEFAULT_MAX_RETRIES),
+        'structured_output': extraction_config.get('structured_output', DEFAULT_STRUCTURED_OUTPUT),
+        'stream': extraction_config.get('stream', DEFAULT_STREAM),
+    }
+
+
+def configure(config):
+    """Resizes the shared Gemini concurrency cap from config."""
+    global _slots, _max_concurrency
+    max_concurrency = max(1, int(settings(config)['max_concurrency']))
+    if max_concurrency != _max_concurrency:
+        _slots = threading.BoundedSemaphore(max_concurrency)
+        _max_concurrency = max_concurrency
+
+
+def estimate_tokens(text):
+    """Cheap token estimate used for chunk budgeting."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def chunk_blocks(listing_blocks, token_budget=DEFAULT_CHUNK_TOKENS):
+    """
+    Groups consecutive listing blocks into chunks that fit the token budget.
+
+    A block larger than the budget becomes a chunk on its own rather than being split.
+
+    Returns:
+        list: Chunks as lists of positions into listing_blocks.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+    for position, listing_text in enumerate(listing_blocks):
+        tokens = estimate_tokens(listing_text)
+        if current and current_tokens + tokens > token_budget:
+            chunks.append(current)
+            current = []
+            current_tokens = 0
+        current.append(position)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_text_blocks(text):
+    """Splits free text (e.g. Jina markdown) into paragraph blocks for chunking."""
+    return [block.strip() for block in text.split('\n\n') if block.strip()]
+
+
+def _run_with_retries(extract_chunk, chunk, max_retries):
+    for attempt in range(max_retries + 1):
+        try:
+            with _slots:
+                return extract_chunk(chunk)
+        except Exception as e:
+            if attempt == max_retries or not resilience.is_retryable(e):
+                logger.error(f"Giving up on extraction chunk after {attempt + 1} attempts: {e}")
+                run_metrics.count('extraction_chunks_failed')
+                return None
+            run_metrics.count('extraction_retries')
+            logger.warning(f"Extraction chunk failed (attempt {attempt + 1}), retrying: {e}")
+            time.sleep(resilience.backoff_delay(attempt, base=RETRY_DELAY_SECONDS))
+
+
+def run_chunks(chunks, extract_chunk, config=None):
+    """
+    Runs extract_chunk over every chunk concurrently.
+
+    Only chunks whose call raises (API errors, unparseable JSON) are retried,
+    up to max_retries times, so one bad reply costs a single chunk.
+
+    Args:
+        chunks (list): Chunks as returned by chunk_blocks.
+        extract_chunk (callable): Extracts one chunk; raises on failure.
+        config (dict, optional): Configuration with an 'extraction' section.
+
+    Returns:
+        list: One result per chunk, in order, with None for chunks that never succeeded.
+    """
+    if not chunks:
+        return []
+    options = settings(config)
+    workers = max(1, min(int(options['max_concurrency']), len(chunks)))
+    if workers == 1:
+        return [_run_with_retries(extract_chunk, chunk, options['max_retries']) for chunk in chunks]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        run_chunk = run_metrics.bind(lambda chunk: _run_with_retries(extract_chunk, chunk, options['max_retries']))
+        return list(executor.map(run_chunk, chunks))
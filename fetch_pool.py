@@ -0,0 +1,129 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import run_metrics
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_RATE_PER_SECOND = 0.5  # One request every two seconds per host
+DEFAULT_BURST = 1
+# The Jina reader is one host serving every property's page, so it gets its own, looser
+# default; the target site is rate limited separately. Set your plan's limit under 'hosts'.
+DEFAULT_HOST_OVERRIDES = {
+    'r.jina.ai': {'requests_per_second': 5, 'burst': 8},
+}
+
+
+class TokenBucket:
+    """Thread-safe token bucket that refills at a fixed rate up to a burst capacity."""
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(burst))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Blocks until a token is available and consumes it. Returns the time waited in seconds."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return waited
+                delay = (1.0 - self._tokens) / self.rate if self.rate > 0 else 1.0
+            time.sleep(delay)
+            waited += delay
+
+
+class HostRateLimiter:
+    """Keeps one token bucket per host so different sites can be fetched in parallel."""
+
+    def __init__(self, rate=DEFAULT_RATE_PER_SECOND, burst=DEFAULT_BURST, host_overrides=None):
+        self.rate = rate
+        self.burst = burst
+        self.host_overrides = dict(DEFAULT_HOST_OVERRIDES, **(host_overrides or {}))
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """Builds a limiter from the optional 'rate_limits' section of config.json."""
+        rate_config = (config or {}).get('rate_limits', {})
+        return cls(
+            rate=rate_config.get('requests_per_second', DEFAULT_RATE_PER_SECOND),
+            burst=rate_config.get('burst', DEFAULT_BURST),
+            host_overrides=rate_config.get('hosts', {}),
+        )
+
+    def _bucket_for(self, host):
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                override = self.host_overrides.get(host, {})
+                bucket = TokenBucket(
+                    override.get('requests_per_second', self.rate),
+                    override.get('burst', self.burst),
+                )
+                self._buckets[host] = bucket
+            return bucket
+
+    def acquire(self, url):
+        """Waits for the rate limit of the URL's host."""
+        host = urlparse(url).netloc.lower()
+        waited = self._bucket_for(host).acquire()
+        if waited:
+            logger.debug(f"Rate limited {host} for {waited:.2f}s")
+        return waited
+
+
+# Shared limiter used by the fetch functions; replaced by configure() at the start of a run.
+rate_limiter = HostRateLimiter()
+
+
+def configure(config):
+    """Rebuilds the shared rate limiter from config."""
+    global rate_limiter
+    rate_limiter = HostRateLimiter.from_config(config)
+    return rate_limiter
+
+
+def map_in_order(func, items, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Runs func over items on a bounded thread pool.
+
+    Args:
+        func (callable): Called once per item.
+        items (list): Inputs, e.g. the 'websites' entries from config.json.
+        max_workers (int): Upper bound on concurrent calls.
+
+    Returns:
+        list: Results in the same order as items. An item whose call raised
+              yields None so one bad property cannot abort the whole run.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    def run_one(item):
+        try:
+            return func(item)
+        except Exception as e:
+            logger.exception(f"Error processing {item}: {e}")
+            return None
+
+    workers = max(1, min(int(max_workers), len(items)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run_metrics.bind(run_one), items))
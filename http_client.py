@@ -0,0 +1,256 @@
+import codecs
+import importlib.util
+import logging
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+import local_store
+import run_metrics
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = (5, 30)  # (connect, read) seconds
+JINA_TIMEOUT = (5, 90)  # The reader renders the page before answering
+POOL_SIZE = 32
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024  # Decoded body size at which a streamed fetch gives up
+STREAM_CHUNK_SIZE = 16 * 1024
+
+# urllib3 decodes brotli itself when one of these packages is installed; only advertise it then.
+# find_spec avoids importing the codec on cold start.
+_HAS_BROTLI = any(importlib.util.find_spec(module) for module in ('brotli', 'brotlicffi'))
+ACCEPT_ENCODING = 'gzip, deflate, br' if _HAS_BROTLI else 'gzip, deflate'
+
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
+    'Accept-Encoding': ACCEPT_ENCODING,
+    'Accept-Language': 'en-US,en;q=0.9',
+    'DNT': '1',
+    'Priority': 'u=0, i',
+    'Sec-CH-UA': '"Not(A:Brand";v="99", "Google Chrome";v="133", "Chromium";v="133"',
+    'Sec-CH-UA-Mobile': '?0',
+    'Sec-CH-UA-Platform': '"macOS"',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'same-origin',
+    'Sec-Fetch-User': '?1',
+    'Service-Worker-Navigation-Preload': 'true',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+
+class NotModified:
+    """Sentinel returned by fetch() when the server answered 304 Not Modified."""
+
+    def __repr__(self):
+        return 'NOT_MODIFIED'
+
+    def __bool__(self):
+        return False
+
+
+NOT_MODIFIED = NotModified()
+
+
+class ResponseTooLarge(requests.exceptions.RequestException):
+    """Raised by a streamed fetch() when the body exceeds max_bytes."""
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Returns the process-wide requests.Session, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+
+class ValidatorStore:
+    """
+    Remembers ETag / Last-Modified validators and the listing fingerprint per URL
+    together with the listings extracted from that response, so a 304 or a page
+    whose listings did not change can reuse them without re-parsing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = None
+        self._pending = {}
+        self._dirty_urls = set()
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = local_store.load_json(self.path, default={}) or {}
+        return self._entries
+
+    def conditional_headers(self, url):
+        """Returns If-None-Match / If-Modified-Since headers for a URL with usable cached listings."""
+        with self._lock:
+            entry = self._load().get(url)
+        if not entry or not entry.get('listings'):
+            return {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def remember(self, url, response):
+        """Holds the validators of a fresh 200 response until its listings are committed."""
+        validators = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+        with self._lock:
+            if validators['etag'] or validators['last_modified']:
+                self._pending[url] = validators
+            else:
+                self._pending.pop(url, None)
+
+    def remember_fingerprint(self, url, fingerprint):
+        """Holds the listing fingerprint of a fresh page until its listings are committed."""
+        with self._lock:
+            self._pending.setdefault(url, {})['fingerprint'] = fingerprint
+
+    def is_unchanged(self, url, fingerprint):
+        """True if the last committed fetch of url had the same listing fingerprint and listings."""
+        if fingerprint is None:
+            return False
+        with self._lock:
+            entry = self._load().get(url) or {}
+        return bool(entry.get('listings')) and entry.get('fingerprint') == fingerprint
+
+    def commit(self, url, listings):
+        """Stores the validators of the last fetch of url alongside the listings extracted from it."""
+        if not listings:
+            return  # Never let a 304 stand in for an empty or failed extraction
+        with self._lock:
+            validators = self._pending.pop(url, None)
+            if not validators:
+                return
+            self._load()[url] = dict(validators, listings=listings)
+            self._dirty_urls.add(url)
+
+    def cached_listings(self, url):
+        """Returns the listings stored for url by the last committed fetch."""
+        with self._lock:
+            entry = self._load().get(url) or {}
+        return entry.get('listings', [])
+
+    def save(self):
+        """
+        Persists committed entries to disk.
+
+        Only the URLs committed by this process are written over what is on disk,
+        so shard processes sharing the cache directory keep each other's entries.
+        """
+        with self._lock:
+            if not self._dirty_urls:
+                return
+            entries = local_store.load_json(self.path, default={}) or {}
+            entries.update({url: self._entries[url] for url in self._dirty_urls})
+            local_store.save_json(self.path, entries)
+            self._dirty_urls = set()
+
+
+validator_store = ValidatorStore(local_store.cache_path('http_validators.json'))
+
+
+def _read_streaming(response, max_bytes=None, stop_reading=None, read_budget=None):
+    """
+    Reads a response body chunk by chunk, decompressing and decoding as it goes.
+
+    Stops as soon as stop_reading(text_chunk) returns True, raises
+    ResponseTooLarge once more than max_bytes of decoded body have arrived and
+    ReadTimeout once the whole body has taken longer than read_budget seconds
+    (the read timeout alone only bounds the gap between chunks).
+    """
+    content_length = response.headers.get('Content-Length')
+    if max_bytes and content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        response.close()
+        raise ResponseTooLarge(f"{response.url} declares {content_length} bytes, over the {max_bytes} byte limit", response=response)
+
+    decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+    parts = []
+    received = 0
+    stopped_early = False
+    deadline = time.monotonic() + read_budget if read_budget else None
+    try:
+        for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+            if deadline and time.monotonic() > deadline:
+                raise requests.exceptions.ReadTimeout(f"{response.url} took longer than {read_budget}s to send its body")
+            received += len(chunk)
+            if max_bytes and received > max_bytes:
+                raise ResponseTooLarge(f"{response.url} exceeded the {max_bytes} byte limit", response=response)
+            text = decoder.decode(chunk)
+            parts.append(text)
+            if stop_reading is not None and stop_reading(text):
+                stopped_early = True
+                break
+        parts.append(decoder.decode(b'', final=True))
+    finally:
+        run_metrics.count('bytes_downloaded', response.raw.tell())  # As received, i.e. still compressed
+        response.close()  # An abandoned body cannot go back to the pool; closing drops the connection
+    if stopped_early:
+        logger.info(f"Stopped reading {response.url} after {received} bytes; the listing section had closed.")
+        run_metrics.count('fetches_stopped_early')
+    return ''.join(parts)
+
+
+def fetch(url, headers=None, timeout=DEFAULT_TIMEOUT, conditional=True, max_bytes=None, stop_reading=None):
+    """
+    Fetches a URL over the shared pooled session.
+
+    When max_bytes or stop_reading is given the body is streamed: it is read in
+    chunks, the page is abandoned once stop_reading says the interesting part is
+    over, and pages larger than max_bytes are rejected instead of buffered.
+
+    Args:
+        url (str): The URL to fetch.
+        headers (dict, optional): Request headers.
+        timeout (tuple|float): Connect/read timeout passed to requests.
+        conditional (bool): Send stored validators and honour 304 responses.
+        max_bytes (int, optional): Largest decoded body accepted.
+        stop_reading (callable, optional): Called with each decoded text chunk;
+                                           returns True to stop reading.
+
+    Returns:
+        str | NotModified: The response body, or NOT_MODIFIED on a 304.
+
+    Raises:
+        requests.exceptions.RequestException: On network errors, 4xx/5xx responses
+            and (ResponseTooLarge) bodies over max_bytes.
+    """
+    request_headers = dict(headers or {})
+    if conditional:
+        request_headers.update(validator_store.conditional_headers(url))
+
+    stream = bool(max_bytes or stop_reading)
+    response = get_session().get(url, headers=request_headers, timeout=timeout, stream=stream)
+    run_metrics.count('http_requests')
+    if conditional and response.status_code == 304:
+        logger.info(f"{url} not modified since last run.")
+        run_metrics.count('http_not_modified')
+        response.close()
+        return NOT_MODIFIED
+    if response.status_code >= 400:
+        response.close()
+    response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
+    if conditional:
+        validator_store.remember(url, response)
+    if stream:
+        read_budget = timeout[1] if isinstance(timeout, tuple) else timeout
+        return _read_streaming(response, max_bytes, stop_reading, read_budget)
+    run_metrics.count('bytes_downloaded', len(response.content))
+    return response.text
@@ -0,0 +1,68 @@
+import logging
+import os
+import threading
+import local_store
+import run_metrics
+from resilience import host_key
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_HOURS = 6
+DEFAULT_MAX_MB = 200
+REFRESH_ENV_VAR = 'APT_FINDER_REFRESH'
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def settings(config):
+    """Returns the 'jina_cache' section of config.json with defaults filled in."""
+    cache_config = (config or {}).get('jina_cache', {})
+    return {
+        'enabled': cache_config.get('enabled', True),
+        'ttl_hours': cache_config.get('ttl_hours', DEFAULT_TTL_HOURS),
+        'hosts': cache_config.get('hosts', {}),
+        'max_mb': cache_config.get('max_mb', DEFAULT_MAX_MB),
+        'bypass': cache_config.get('bypass', False),
+    }
+
+
+def get_cache(config=None):
+    """Returns the process-wide Jina reader cache, opening it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            options = settings(config)
+            _cache = local_store.SQLiteCache(
+                local_store.cache_path('jina_pages.sqlite3'),
+                max_bytes=int(options['max_mb'] * 1024 * 1024),
+                compress=True,
+            )
+        return _cache
+
+
+def ttl_seconds(url, config):
+    """Freshness limit for a page: its host's entry under 'hosts', else the default ttl_hours."""
+    options = settings(config)
+    return options['hosts'].get(host_key(url), options['ttl_hours']) * 3600
+
+
+def is_bypassed(config):
+    """True when cached pages must be refetched (config 'bypass' or APT_FINDER_REFRESH=1)."""
+    return bool(settings(config)['bypass']) or os.environ.get(REFRESH_ENV_VAR, '').lower() in ('1', 'true', 'yes')
+
+
+def lookup(url, config=None):
+    """Returns the cached markdown for url if it is fresh, else None."""
+    if not settings(config)['enabled'] or is_bypassed(config):
+        return None
+    markdown = get_cache(config).get(url, ttl_seconds=ttl_seconds(url, config))
+    run_metrics.count('jina_cache_hits' if markdown is not None else 'jina_cache_misses')
+    return markdown
+
+
+def store(url, markdown, config=None):
+    """Caches the markdown the Jina reader returned for url."""
+    if settings(config)['enabled'] and markdown:
+        get_cache(config).set(url, markdown)
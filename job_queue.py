@@ -0,0 +1,328 @@
+import contextlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import local_store
+import resilience
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = 'pending'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+DEFAULT_LEASE_SECONDS = 600  # A running job whose worker died is picked up again after this
+DEFAULT_MAX_ATTEMPTS = 3
+RETRY_DELAY_SECONDS = 5
+POLL_SECONDS = 2.0  # Idle workers also look for jobs enqueued by other processes this often
+DEFAULT_WORKERS = {'fetch': 8, 'extract': 4, 'filter': 2, 'alert': 1}
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def settings(config):
+    """Returns the 'pipeline' section of config.json with defaults filled in."""
+    pipeline_config = (config or {}).get('pipeline', {})
+    return {
+        'enabled': pipeline_config.get('enabled', False),
+        'workers': dict(DEFAULT_WORKERS, **pipeline_config.get('workers', {})),
+        'lease_seconds': pipeline_config.get('lease_seconds', DEFAULT_LEASE_SECONDS),
+        'max_attempts': pipeline_config.get('max_attempts', DEFAULT_MAX_ATTEMPTS),
+    }
+
+
+class JobQueue:
+    """
+    Durable work queue in SQLite, standing in for Cloud Tasks.
+
+    A run fans out into one item per unit of work (a property). Each item moves
+    through stages as jobs: completing a job and enqueueing its item's next stage
+    is one transaction, so after a crash work resumes from the last finished
+    stage. Once every item has finished (or failed for good) the run's final
+    job is enqueued, and its output becomes the run's result.
+    """
+
+    def __init__(self, path, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(
+            '''
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                config TEXT NOT NULL,
+                final_stage TEXT NOT NULL,
+                items INTEGER NOT NULL,
+                open_items INTEGER NOT NULL,
+                result TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                item INTEGER,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL,
+                leased_until REAL,
+                output TEXT,
+                error TEXT,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (stage, status, available_at);
+            CREATE INDEX IF NOT EXISTS jobs_run ON jobs (run_id, status);
+            '''
+        )
+        self._condition = threading.Condition()
+
+    @contextlib.contextmanager
+    def _transaction(self, notify=False):
+        # BEGIN IMMEDIATE takes the write lock up front, so two processes never lease the same job
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+        if notify:  # Wake idle workers for the jobs just enqueued
+            with self._condition:
+                self._condition.notify_all()
+
+    def _insert_job(self, conn, run_id, stage, item, payload, now):
+        conn.execute(
+            'INSERT INTO jobs (run_id, stage, item, payload, status, available_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (run_id, stage, item, json.dumps(payload), STATUS_PENDING, now, now),
+        )
+
+    def _release(self, conn, job, status, now, error=None, available_at=None):
+        """Ends this attempt's lease; False if the lease had expired and the job was taken over."""
+        cursor = conn.execute(
+            'UPDATE jobs SET status = ?, leased_until = NULL, error = ?, available_at = COALESCE(?, available_at),'
+            ' updated_at = ? WHERE id = ? AND status = ? AND attempts = ?',
+            (status, error, available_at, now, job['id'], STATUS_RUNNING, job['attempts']),
+        )
+        if cursor.rowcount == 0:
+            logger.warning(f"Lease on {job['stage']} job {job['id']} expired before it finished; dropping its result.")
+            return False
+        return True
+
+    def create_run(self, run_id, config, stage, payloads, final_stage):
+        """
+        Enqueues a run: one job at stage per payload, then final_stage once all items are done.
+
+        Args:
+            run_id (str): Unique id of the run.
+            config (dict): Configuration snapshot the run's jobs should use.
+            stage (str): First stage of every item.
+            payloads (list): One JSON-serialisable payload per item.
+            final_stage (str): Stage of the run-level job that collects the items' outputs.
+        """
+        now = time.time()
+        with self._transaction(notify=True) as conn:
+            conn.execute(
+                'INSERT INTO runs (run_id, status, config, final_stage, items, open_items, created_at, updated_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (run_id, STATUS_PENDING, json.dumps(config), final_stage, len(payloads), len(payloads), now, now),
+            )
+            for item, payload in enumerate(payloads):
+                self._insert_job(conn, run_id, stage, item, payload, now)
+            if not payloads:
+                self._insert_job(conn, run_id, final_stage, None, {}, now)
+
+    def lease(self, stage, now=None):
+        """
+        Claims the oldest ready job of a stage, or returns None.
+
+        Jobs whose lease has expired (their worker crashed or hung) count as ready.
+        The returned dict has id, run_id, stage, item, payload, attempts and config.
+        """
+        now = now or time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                'SELECT j.id, j.run_id, j.stage, j.item, j.payload, j.attempts, r.config FROM jobs j'
+                ' JOIN runs r ON r.run_id = j.run_id'
+                ' WHERE j.stage = ? AND ((j.status = ? AND j.available_at <= ?) OR (j.status = ? AND j.leased_until < ?))'
+                ' ORDER BY j.id LIMIT 1',
+                (stage, STATUS_PENDING, now, STATUS_RUNNING, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                'UPDATE jobs SET status = ?, attempts = attempts + 1, leased_until = ?, updated_at = ? WHERE id = ?',
+                (STATUS_RUNNING, now + self.lease_seconds, now, row[0]),
+            )
+            conn.execute('UPDATE runs SET status = ?, updated_at = ? WHERE run_id = ? AND status = ?',
+                         (STATUS_RUNNING, now, row[1], STATUS_PENDING))
+        job_id, run_id, stage, item, payload, attempts, config = row
+        return {
+            'id': job_id, 'run_id': run_id, 'stage': stage, 'item': item,
+            'payload': json.loads(payload), 'attempts': attempts + 1, 'config': json.loads(config),
+        }
+
+    def _finish_item(self, conn, job, output, now):
+        """Records an item's final output and enqueues the run's final job after the last one."""
+        conn.execute('UPDATE jobs SET output = ? WHERE id = ?', (json.dumps(output), job['id']))
+        conn.execute('UPDATE runs SET open_items = open_items - 1, updated_at = ? WHERE run_id = ?', (now, job['run_id']))
+        open_items, final_stage = conn.execute(
+            'SELECT open_items, final_stage FROM runs WHERE run_id = ?', (job['run_id'],)
+        ).fetchone()
+        if open_items == 0:
+            self._insert_job(conn, job['run_id'], final_stage, None, {}, now)
+
+    def complete(self, job, next_stage=None, payload=None, output=None):
+        """
+        Marks a job done and, in the same transaction, moves its item on.
+
+        With next_stage the item continues there with payload. Otherwise output is
+        the item's final output, or, for the run's final job, the run's result.
+        """
+        now = time.time()
+        with self._transaction(notify=True) as conn:
+            if not self._release(conn, job, STATUS_DONE, now):
+                return
+            if next_stage is not None:
+                self._insert_job(conn, job['run_id'], next_stage, job['item'], payload, now)
+            elif job['item'] is not None:
+                self._finish_item(conn, job, output, now)
+            else:
+                conn.execute('UPDATE runs SET status = ?, result = ?, updated_at = ? WHERE run_id = ?',
+                             (STATUS_DONE, json.dumps(output), now, job['run_id']))
+
+    def fail(self, job, error):
+        """
+        Schedules a failed job for another attempt after a jittered backoff, or gives up on it.
+
+        An item that gives up finishes with no output, so the rest of the run still
+        completes; a final job that gives up fails the run. Returns True if the job will be retried.
+        """
+        now = time.time()
+        retry = job['attempts'] < self.max_attempts
+        with self._transaction(notify=not retry) as conn:
+            if retry:
+                delay = resilience.backoff_delay(job['attempts'], base=RETRY_DELAY_SECONDS, cap=10 * RETRY_DELAY_SECONDS)
+                return self._release(conn, job, STATUS_PENDING, now, str(error), available_at=now + delay)
+            if not self._release(conn, job, STATUS_FAILED, now, str(error)):
+                return False
+            if job['item'] is not None:
+                self._finish_item(conn, job, None, now)
+            else:
+                conn.execute('UPDATE runs SET status = ?, updated_at = ? WHERE run_id = ?', (STATUS_FAILED, now, job['run_id']))
+        return False
+
+    def outputs(self, run_id):
+        """Returns the final outputs of a run's items, in item order (None for items that failed)."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT item, output FROM jobs WHERE run_id = ? AND item IS NOT NULL AND output IS NOT NULL ORDER BY item',
+                (run_id,),
+            ).fetchall()
+        return [json.loads(output) for _, output in rows]
+
+    def run_status(self, run_id):
+        """Returns a run's status, progress and (once done) result, or None for an unknown run."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT status, items, open_items, result, created_at, updated_at FROM runs WHERE run_id = ?', (run_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        status, items, open_items, result, created_at, updated_at = row
+        return {
+            'run_id': run_id, 'status': status, 'items': items, 'items_done': items - open_items,
+            'result': json.loads(result) if result else None, 'created_at': created_at, 'updated_at': updated_at,
+        }
+
+    def wait_for_work(self, timeout):
+        """Blocks until this process changes the queue, or timeout seconds pass."""
+        with self._condition:
+            self._condition.wait(timeout)
+
+
+class StageWorkers:
+    """
+    Worker threads that lease jobs of each stage from a JobQueue and run its handler.
+
+    handlers maps stage -> handler(job), which returns (next_stage, payload) to move
+    the item on, or (None, output) when the item (or the run, for a final job) is
+    done. A handler that raises has its job retried by the queue. Each stage has
+    its own pool, so e.g. slow Gemini extraction never holds a fetch worker.
+    """
+
+    def __init__(self, queue, handlers, workers):
+        self.queue = queue
+        self.handlers = handlers
+        self.workers = workers
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Starts the worker threads once; later calls do nothing."""
+        with self._lock:
+            if self._threads:
+                return
+            for stage in self.handlers:
+                for index in range(max(1, int(self.workers.get(stage, 1)))):
+                    thread = threading.Thread(target=self._work, args=(stage,), name=f"{stage}-worker-{index}", daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+        logger.info(f"Started {len(self._threads)} pipeline workers: {self.workers}")
+
+    def _work(self, stage):
+        handler = self.handlers[stage]
+        while True:
+            try:
+                job = self.queue.lease(stage)
+            except sqlite3.Error as e:
+                logger.error(f"Could not lease a {stage} job: {e}")
+                job = None
+            if job is None:
+                self.queue.wait_for_work(POLL_SECONDS)
+                continue
+            try:
+                next_stage, value = handler(job)
+            except Exception as e:
+                try:
+                    will_retry = self.queue.fail(job, e)
+                except Exception as bookkeeping_error:
+                    # The job stays leased; it is picked up again once the lease expires
+                    logger.error(f"Could not record the failure of {stage} job {job['id']}: {bookkeeping_error}")
+                    will_retry = True
+                logger.error(f"{stage} job {job['id']} of run {job['run_id']} failed (attempt {job['attempts']}): {e}"
+                             + ('; retrying.' if will_retry else '; giving up.'))
+                continue
+            try:
+                if next_stage is None:
+                    self.queue.complete(job, output=value)
+                else:
+                    self.queue.complete(job, next_stage=next_stage, payload=value)
+            except Exception as e:
+                # Keep draining the stage (a locked database is transient); the job is redone once its lease expires
+                logger.error(f"Could not complete {stage} job {job['id']} of run {job['run_id']}: {e}")
+
+
+def get_queue(config=None):
+    """Returns the process-wide job queue, opening it on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            options = settings(config)
+            _queue = JobQueue(
+                local_store.cache_path('jobs.sqlite3'),
+                lease_seconds=options['lease_seconds'],
+                max_attempts=options['max_attempts'],
+            )
+        return _queue
@@ -0,0 +1,76 @@
+import json
+import logging
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+
+class JSONArrayDecoder:
+    """
+    Decodes the objects of a JSON array as its text arrives in pieces.
+
+    feed() returns every object completed by the new text, so callers can use
+    them before the reply has finished. Text outside the JSON (markdown fences,
+    a sentence before the array) is ignored, and a reply that is a single object
+    instead of an array yields that object. Only the text of the object being
+    decoded is kept in memory.
+    """
+
+    def __init__(self):
+        self.complete = False  # True once the top-level array (or object) has closed
+        self.objects_decoded = 0
+        self.errors = 0
+        self._stack = []
+        self._in_string = False
+        self._escaped = False
+        self._pending = []  # Text of the object currently being read
+        self._object_depth = None  # len(self._stack) before the current object opened
+
+    def feed(self, text):
+        """Consumes a piece of the reply and returns the objects it completed."""
+        decoded = []
+        if self.complete or not text:
+            return decoded
+        start = 0 if self._object_depth is not None else None
+        for position, char in enumerate(text):
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if char == '"':
+                self._in_string = bool(self._stack)  # Quotes outside any container are prose
+            elif char in '[{':
+                if char == '{' and self._object_depth is None and self._stack in ([], ['[']):
+                    self._object_depth = len(self._stack)
+                    start = position
+                self._stack.append(char)
+            elif char in ']}' and self._stack:
+                self._stack.pop()
+                if self._object_depth is not None and len(self._stack) == self._object_depth:
+                    self._pending.append(text[start:position + 1])
+                    self._emit(decoded)
+                    start = None
+                if not self._stack:
+                    self.complete = True
+                    break
+        if start is not None:
+            self._pending.append(text[start:])
+        return decoded
+
+    def _emit(self, decoded):
+        object_text = ''.join(self._pending)
+        self._pending = []
+        self._object_depth = None
+        try:
+            value = json.loads(object_text)
+        except json.JSONDecodeError as e:
+            self.errors += 1
+            logger.warning(f"Skipping malformed object in JSON reply: {e}")
+            return
+        if isinstance(value, dict):
+            decoded.append(value)
+            self.objects_decoded += 1
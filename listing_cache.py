@@ -0,0 +1,81 @@
+import hashlib
+import logging
+import re
+import threading
+import local_store
+import run_metrics
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_DAYS = 14
+DEFAULT_MAX_ENTRIES = 20000
+
+_WHITESPACE = re.compile(r'\s+')
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def normalize_block(listing_text):
+    """Collapses whitespace so cosmetic markup changes do not produce a new hash."""
+    return _WHITESPACE.sub(' ', listing_text).strip()
+
+
+def block_key(listing_text, context=''):
+    """
+    Returns the content hash used as cache key for one listing block.
+
+    Args:
+        listing_text (str): Text of a single listing block.
+        context (str): Anything else that changes the extraction result for the
+                       same text (model name, prompt version, filter criteria).
+    """
+    digest = hashlib.sha256()
+    digest.update(context.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(normalize_block(listing_text).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def get_cache(config=None):
+    """Returns the process-wide extraction cache, opening it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            cache_config = (config or {}).get('extraction_cache', {})
+            _cache = local_store.SQLiteCache(
+                local_store.cache_path('listing_extractions.sqlite3'),
+                ttl_seconds=cache_config.get('ttl_days', DEFAULT_TTL_DAYS) * 86400,
+                max_entries=cache_config.get('max_entries', DEFAULT_MAX_ENTRIES),
+            )
+        return _cache
+
+
+def is_enabled(config):
+    """Returns True unless the cache is switched off in config.json."""
+    return (config or {}).get('extraction_cache', {}).get('enabled', True)
+
+
+def lookup(listing_blocks, context, config=None):
+    """
+    Splits listing blocks into cache hits and misses.
+
+    Returns:
+        tuple: (keys, hits, misses) where keys[i] is the hash of listing_blocks[i],
+               hits maps block index -> cached list of listing dicts and misses is
+               the list of block indexes that still need extraction.
+    """
+    keys = [block_key(block, context) for block in listing_blocks]
+    cached = get_cache(config).get_many(keys)
+    hits = {index: cached[key] for index, key in enumerate(keys) if key in cached}
+    misses = [index for index in range(len(listing_blocks)) if index not in hits]
+    logger.info(f"Extraction cache: {len(hits)} hits, {len(misses)} misses.")
+    run_metrics.count('extraction_cache_hits', len(hits))
+    run_metrics.count('extraction_cache_misses', len(misses))
+    return keys, hits, misses
+
+
+def store(entries, config=None):
+    """Stores a dict of block key -> extracted listings."""
+    get_cache(config).set_many(entries)
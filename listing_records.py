@@ -0,0 +1,237 @@
+import datetime
+import logging
+import re
+import numpy as np
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+_NUMBER = re.compile(r'\d[\d,]*(?:\.\d+)?')
+_BEDS = re.compile(r'(\d+(?:\.\d+)?)\s*(?:bd|beds?|bedrooms?|br)\b', re.I)
+_BATHS = re.compile(r'(\d+(?:\.\d+)?)\s*(?:ba|baths?|bathrooms?)\b', re.I)
+_DATE_FORMATS = ('%m/%d/%y', '%m/%d/%Y', '%Y-%m-%d', '%B %d, %Y', '%b %d, %Y', '%B %d %Y', '%b %d %Y')
+_NOW_WORDS = ('now', 'today', 'immediately', 'available now')
+
+
+def parse_number(value):
+    """Returns the first number in a string like '$3,000' or '1,235 sq ft', or None."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER.search(str(value or ''))
+    return float(match.group().replace(',', '')) if match else None
+
+
+def parse_bed_bath(value):
+    """Parses strings like '2 bd / 1 ba' or 'Studio / 1 ba' into (beds, baths)."""
+    text = str(value or '')
+    beds = _BEDS.search(text)
+    baths = _BATHS.search(text)
+    bed_count = float(beds.group(1)) if beds else (0.0 if 'studio' in text.lower() else None)
+    return bed_count, float(baths.group(1)) if baths else None
+
+
+def parse_date_ordinal(value, today=None):
+    """Parses an available date ('4/14/25', 'NOW', '2025-05-10', 'May 10, 2025') into a date ordinal."""
+    text = str(value or '').strip()
+    lowered = text.lower()
+    if lowered.startswith('available'):
+        text = text[len('available'):].strip(' :')
+        lowered = text.lower()
+    if lowered in _NOW_WORDS:
+        return (today or datetime.date.today()).toordinal()
+    for date_format in _DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, date_format).date().toordinal()
+        except ValueError:
+            continue
+    return None
+
+
+class Listing:
+    """Compact listing record with parsed numeric fields next to the original strings."""
+
+    __slots__ = ('rent', 'square_feet', 'beds', 'baths', 'available_ordinal', 'fields')
+
+    def __init__(self, rent, square_feet, beds, baths, available_ordinal, fields):
+        self.rent = rent
+        self.square_feet = square_feet
+        self.beds = beds
+        self.baths = baths
+        self.available_ordinal = available_ordinal
+        self.fields = fields  # The listing dict as extracted, used for alerts
+
+    @classmethod
+    def from_dict(cls, listing, today=None):
+        """Builds a record from an extracted listing dict."""
+        beds, baths = parse_bed_bath(listing.get('bed_bath'))
+        return cls(
+            rent=parse_number(listing.get('rent')),
+            square_feet=parse_number(listing.get('square_feet')),
+            beds=beds,
+            baths=baths,
+            available_ordinal=parse_date_ordinal(listing.get('available_date'), today),
+            fields=listing,
+        )
+
+    @property
+    def available_date(self):
+        return datetime.date.fromordinal(self.available_ordinal) if self.available_ordinal else None
+
+    def to_dict(self):
+        """Returns the original listing dict."""
+        return self.fields
+
+    def __repr__(self):
+        return f"Listing(rent={self.rent}, square_feet={self.square_feet}, beds={self.beds}, baths={self.baths}, available={self.available_date})"
+
+
+class ListingBatch:
+    """Column arrays over a list of Listing records; missing values are NaN."""
+
+    def __init__(self, records):
+        self.records = list(records)
+
+        def column(attribute):
+            return np.array(
+                [np.nan if getattr(record, attribute) is None else getattr(record, attribute) for record in self.records],
+                dtype=np.float64,
+            )
+
+        self.rent = column('rent')
+        self.square_feet = column('square_feet')
+        self.beds = column('beds')
+        self.baths = column('baths')
+        self.available = column('available_ordinal')
+
+    @classmethod
+    def from_dicts(cls, listings, today=None):
+        return cls(Listing.from_dict(listing, today) for listing in listings)
+
+    def __len__(self):
+        return len(self.records)
+
+    def select(self, mask):
+        """Returns the listing dicts where mask is True, in original order."""
+        return [self.records[index].to_dict() for index in np.flatnonzero(mask)]
+
+
+def _within(column, passes, keep_unknown):
+    """Combines a comparison result with the policy for listings missing that value."""
+    missing = np.isnan(column)
+    return np.where(missing, keep_unknown, passes)
+
+
+def filter_mask(batch, filters, max_rent=None, keep_unknown=True):
+    """
+    Evaluates the config filters over a ListingBatch in one pass per criterion.
+
+    Args:
+        batch (ListingBatch): Listings to filter.
+        filters (dict): The 'filters' section of config.json.
+        max_rent (number, optional): config['max_rent_threshold'].
+        keep_unknown (bool): Whether a listing missing a value passes that criterion.
+
+    Returns:
+        numpy.ndarray: Boolean mask, True for listings that match.
+    """
+    filters = filters or {}
+    mask = np.ones(len(batch), dtype=bool)
+    if not len(batch):
+        return mask
+    with np.errstate(invalid='ignore'):
+        if max_rent is not None:
+            mask &= _within(batch.rent, batch.rent <= float(max_rent), keep_unknown)
+        if filters.get('min_sqft') is not None:
+            mask &= _within(batch.square_feet, batch.square_feet >= float(filters['min_sqft']), keep_unknown)
+        if filters.get('bedrooms') is not None:
+            mask &= _within(batch.beds, batch.beds == float(filters['bedrooms']), keep_unknown)
+        if filters.get('bathrooms') is not None:
+            mask &= _within(batch.baths, batch.baths == float(filters['bathrooms']), keep_unknown)
+        if filters.get('desired_move_in_date') and filters.get('move_in_date_range_days') is not None:
+            desired = parse_date_ordinal(filters['desired_move_in_date'])
+            if desired is None:
+                logger.warning(f"Could not parse desired_move_in_date {filters['desired_move_in_date']!r}; ignoring it.")
+            else:
+                window = np.abs(batch.available - desired) <= float(filters['move_in_date_range_days'])
+                mask &= _within(batch.available, window, keep_unknown)
+    return mask
+
+
+def filter_listings(listings, config, today=None):
+    """Returns the listing dicts that match config['filters'] and config['max_rent_threshold']."""
+    if not listings:
+        return []
+    filters = config.get('filters', {})
+    batch = ListingBatch.from_dicts(listings, today)
+    mask = filter_mask(
+        batch,
+        filters,
+        max_rent=config.get('max_rent_threshold'),
+        keep_unknown=filters.get('keep_unknown', True),
+    )
+    return batch.select(mask)
+
+
+class ListingIndex:
+    """
+    Sorted indexes on rent, square feet, beds, baths and available date over a ListingBatch.
+
+    Built once per run, it answers each filter profile with binary searches plus an
+    intersection of the matching positions, so evaluating many profiles costs little
+    more than building the index. query() matches exactly what filter_mask() keeps.
+    """
+
+    COLUMNS = ('rent', 'square_feet', 'beds', 'baths', 'available')
+
+    def __init__(self, batch):
+        self.batch = batch
+        self._columns = {}
+        for name in self.COLUMNS:
+            column = getattr(batch, name)
+            missing = np.isnan(column)
+            known = np.flatnonzero(~missing)
+            order = known[np.argsort(column[known], kind='stable')]
+            self._columns[name] = (column[order], order, np.flatnonzero(missing))
+
+    def _range(self, name, low=None, high=None, keep_unknown=True):
+        """Positions whose value lies in [low, high] (either end open when None), plus missing ones if kept."""
+        values, order, missing = self._columns[name]
+        start = 0 if low is None else np.searchsorted(values, low, side='left')
+        end = len(values) if high is None else np.searchsorted(values, high, side='right')
+        hits = order[start:end]
+        return np.concatenate([hits, missing]) if keep_unknown else hits
+
+    def query(self, filters, max_rent=None, keep_unknown=True):
+        """
+        Returns the positions (ascending) of the listings matching a filter profile.
+
+        Args take the same meaning as in filter_mask().
+        """
+        filters = filters or {}
+        ranges = []
+        if max_rent is not None:
+            ranges.append(self._range('rent', high=float(max_rent), keep_unknown=keep_unknown))
+        if filters.get('min_sqft') is not None:
+            ranges.append(self._range('square_feet', low=float(filters['min_sqft']), keep_unknown=keep_unknown))
+        if filters.get('bedrooms') is not None:
+            beds = float(filters['bedrooms'])
+            ranges.append(self._range('beds', beds, beds, keep_unknown))
+        if filters.get('bathrooms') is not None:
+            baths = float(filters['bathrooms'])
+            ranges.append(self._range('baths', baths, baths, keep_unknown))
+        if filters.get('desired_move_in_date') and filters.get('move_in_date_range_days') is not None:
+            desired = parse_date_ordinal(filters['desired_move_in_date'])
+            if desired is None:
+                logger.warning(f"Could not parse desired_move_in_date {filters['desired_move_in_date']!r}; ignoring it.")
+            else:
+                days = float(filters['move_in_date_range_days'])
+                ranges.append(self._range('available', desired - days, desired + days, keep_unknown))
+        if not ranges:
+            return np.arange(len(self.batch))
+        ranges.sort(key=len)  # Intersect starting from the most selective criterion
+        positions = np.sort(ranges[0])
+        for other in ranges[1:]:
+            if not len(positions):
+                break
+            positions = np.intersect1d(positions, other, assume_unique=True)
+        return positions
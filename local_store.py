@@ -0,0 +1,183 @@
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+CACHE_DIR_ENV = 'APT_FINDER_CACHE_DIR'
+
+
+def cache_dir():
+    """
+    Returns the directory used for state that should survive between runs.
+
+    Defaults to a folder under the system temp dir, which is the only writable
+    location on Cloud Functions. Set APT_FINDER_CACHE_DIR to keep it elsewhere.
+    """
+    path = os.environ.get(CACHE_DIR_ENV) or os.path.join(tempfile.gettempdir(), 'apt_finder')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def cache_path(name):
+    """Returns the full path of a file inside the cache directory."""
+    return os.path.join(cache_dir(), name)
+
+
+def load_json(path, default=None):
+    """Loads a JSON file, returning default if it is missing or unreadable."""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Ignoring unreadable cache file {path}: {e}")
+        return default
+
+
+def save_json(path, data):
+    """Writes a JSON file atomically so a crash never leaves a half-written cache."""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class SQLiteCache:
+    """
+    Small persistent key/value cache backed by SQLite.
+
+    Values are stored as JSON, zlib-compressed if compress is set. Entries
+    older than ttl_seconds are treated as missing, and once more than
+    max_entries or max_bytes (of stored values) are held the least recently
+    used ones are evicted.
+    """
+
+    def __init__(self, path, ttl_seconds=None, max_entries=None, max_bytes=None, compress=False):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            ' key TEXT PRIMARY KEY,'
+            ' value TEXT NOT NULL,'
+            ' created_at REAL NOT NULL,'
+            ' accessed_at REAL NOT NULL,'
+            ' size INTEGER NOT NULL DEFAULT 0)'
+        )
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(cache)')}
+        if 'size' not in columns:  # Caches created before size accounting
+            self._conn.execute('ALTER TABLE cache ADD COLUMN size INTEGER NOT NULL DEFAULT 0')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)')
+        self._conn.commit()
+
+    def _is_fresh(self, created_at, now, ttl_seconds):
+        return ttl_seconds is None or now - created_at <= ttl_seconds
+
+    def _encode(self, value):
+        data = json.dumps(value)
+        if self.compress:
+            return sqlite3.Binary(zlib.compress(data.encode('utf-8')))
+        return data
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, bytes):  # Compressed entry
+            value = zlib.decompress(value).decode('utf-8')
+        return json.loads(value)
+
+    def get_many(self, keys, ttl_seconds=None):
+        """
+        Returns a dict of key -> value for the keys that are cached and fresh.
+
+        ttl_seconds overrides the cache-wide TTL for this lookup.
+        """
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        now = time.time()
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):  # Stay under SQLite's bound-parameter limit
+                batch = keys[start:start + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = self._conn.execute(
+                    f'SELECT key, value, created_at FROM cache WHERE key IN ({placeholders})', batch
+                ).fetchall()
+                for key, value, created_at in rows:
+                    if self._is_fresh(created_at, now, ttl_seconds):
+                        found[key] = self._decode(value)
+            if found:
+                self._conn.executemany(
+                    'UPDATE cache SET accessed_at = ? WHERE key = ?', [(now, key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def get(self, key, default=None, ttl_seconds=None):
+        """Returns the cached value for key, or default."""
+        return self.get_many([key], ttl_seconds).get(key, default)
+
+    def set_many(self, items):
+        """Stores several key -> value pairs in one transaction and evicts if needed."""
+        now = time.time()
+        rows = []
+        for key, value in dict(items).items():
+            encoded = self._encode(value)
+            rows.append((key, encoded, now, now, len(encoded)))
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, created_at, accessed_at, size) VALUES (?, ?, ?, ?, ?)', rows
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def set(self, key, value):
+        """Stores a single value."""
+        self.set_many({key: value})
+
+    def _evict(self, now):
+        if self.ttl_seconds is not None:
+            self._conn.execute('DELETE FROM cache WHERE created_at < ?', (now - self.ttl_seconds,))
+        if self.max_entries is not None:
+            self._conn.execute(
+                'DELETE FROM cache WHERE key IN ('
+                ' SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                (int(self.max_entries),),
+            )
+        if self.max_bytes is not None:
+            # Keep the most recently used entries whose running size total fits the bound
+            self._conn.execute(
+                'DELETE FROM cache WHERE key IN ('
+                ' SELECT key FROM ('
+                '  SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC, key ROWS UNBOUNDED PRECEDING) AS total'
+                '  FROM cache)'
+                ' WHERE total > ?)',
+                (int(self.max_bytes),),
+            )
+
+    def close(self):
+        """Closes the database connection."""
+        with self._lock:
+            self._conn.close()
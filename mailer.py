@@ -0,0 +1,421 @@
+import html
+import json
+import logging
+import os
+import sqlite3
+import string
+import threading
+import time
+import local_store
+import rent_history
+import run_metrics
+import seen_store
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_SMTP_HOST = 'smtp.gmail.com'
+DEFAULT_SMTP_PORT = 587
+DEFAULT_SUBJECT = 'Daily Apartment Listing Alert - New Listings Found'
+DEFAULT_MESSAGES_PER_CONNECTION = 50
+DEFAULT_MESSAGES_PER_MINUTE = 20  # Well under Gmail's and SES's default sending rates
+
+# Credentials and addresses come from the environment first, then config['email']
+ENV_VARS = {
+    'host': 'SMTP_HOST',
+    'port': 'SMTP_PORT',
+    'username': 'SMTP_USERNAME',
+    'password': 'SMTP_PASSWORD',
+    'sender': 'ALERT_SENDER',
+    'recipients': 'ALERT_RECIPIENTS',
+}
+
+# Digest templates. Each is filled once per digest; the listing and property
+# parts are rendered into lists and joined, so the body is built in one pass.
+TEXT_TEMPLATE = string.Template(
+    "Here are the new apartment listings matching your criteria:\n\n"
+    "${properties}"
+    "\n\nHappy apartment hunting!\nYour Agentic Apartment Finder"
+)
+TEXT_PROPERTY_TEMPLATE = string.Template("--------------------\nProperty: ${name}\n${listings}\n")
+TEXT_LISTING_TEMPLATE = string.Template(
+    "  --------------------\n"
+    "${change}"
+    "  Title: ${title}\n"
+    "  Address: ${address}\n"
+    "  Rent: ${rent}\n"
+    "  Bed/Bath: ${bed_bath}\n"
+    "  Sq Ft: ${square_feet}\n"
+    "  Available Date: ${available_date}\n"
+    "  URL: ${url}\n"
+    "${sources}\n"
+)
+HTML_TEMPLATE = string.Template(
+    "<html><body>"
+    "<p>Here are the new apartment listings matching your criteria:</p>"
+    "${properties}"
+    "<p>Happy apartment hunting!<br>Your Agentic Apartment Finder</p>"
+    "</body></html>"
+)
+HTML_PROPERTY_TEMPLATE = string.Template("<h2>${name}</h2>${listings}")
+HTML_LISTING_TEMPLATE = string.Template(
+    "<table style=\"margin-bottom:12px\">"
+    "${change}"
+    "<tr><td><b>Title</b></td><td>${title}</td></tr>"
+    "<tr><td><b>Address</b></td><td>${address}</td></tr>"
+    "<tr><td><b>Rent</b></td><td>${rent}</td></tr>"
+    "<tr><td><b>Bed/Bath</b></td><td>${bed_bath}</td></tr>"
+    "<tr><td><b>Sq Ft</b></td><td>${square_feet}</td></tr>"
+    "<tr><td><b>Available Date</b></td><td>${available_date}</td></tr>"
+    "<tr><td><b>URL</b></td><td><a href=\"${url}\">${url}</a></td></tr>"
+    "${sources}"
+    "</table>"
+)
+LISTING_FIELDS = ('title', 'address', 'rent', 'bed_bath', 'square_feet', 'available_date', 'url')
+
+_pending = None
+_pending_lock = threading.Lock()
+
+
+class ConnectError(Exception):
+    """The SMTP server could not be reached or refused the login."""
+
+
+def _split_addresses(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return [address.strip() for address in value if address and address.strip()]
+
+
+def settings(config):
+    """Returns the 'email' section of config.json with defaults filled in and environment overrides applied."""
+    email_config = (config or {}).get('email', {})
+
+    def value(key, default=None):
+        return os.environ.get(ENV_VARS[key]) or email_config.get(key, default)
+
+    sender = value('sender')
+    return {
+        'host': value('host', DEFAULT_SMTP_HOST),
+        'port': int(value('port', DEFAULT_SMTP_PORT)),
+        'username': value('username') or sender,
+        'password': value('password'),
+        'sender': sender,
+        'recipients': _split_addresses(value('recipients')),
+        'subject': email_config.get('subject', DEFAULT_SUBJECT),
+        'html': email_config.get('html', True),
+        'messages_per_connection': email_config.get('messages_per_connection', DEFAULT_MESSAGES_PER_CONNECTION),
+        'messages_per_minute': email_config.get('messages_per_minute', DEFAULT_MESSAGES_PER_MINUTE),
+        'digest_minutes': email_config.get('digest_minutes', 0),
+    }
+
+
+def _change_note(listing):
+    if listing.get('change') == seen_store.CHANGE_PRICE_DROP:
+        return f"Price drop (was ${listing.get('previous_rent', 0):,.0f})"
+    if listing.get('change') == seen_store.CHANGE_UPDATED:
+        return 'Updated since last alert'
+    if listing.get('change') == rent_history.CHANGE_BELOW_MEDIAN:
+        return f"Below the property's median rent of ${listing.get('median_rent', 0):,.0f}"
+    return None
+
+
+def _other_sources(listing):
+    """URLs a de-duplicated listing was also found at, besides its own."""
+    urls = [source['url'] for source in listing.get('sources', []) if source.get('url')]
+    return [url for url in dict.fromkeys(urls) if url != listing.get('url')]
+
+
+def render_digest(all_listings):
+    """
+    Renders a digest of listings, organized by property, as plain text and HTML.
+
+    Args:
+        all_listings (list): [{'name': property name, 'listings': [listing dicts]}].
+
+    Returns:
+        tuple: (text, html) bodies.
+    """
+    text_properties = []
+    html_properties = []
+    for property_data in all_listings:
+        text_listings = []
+        html_listings = []
+        for listing in property_data['listings']:
+            fields = {field: str(listing.get(field) or 'N/A') for field in LISTING_FIELDS}
+            note = _change_note(listing)
+            other_sources = _other_sources(listing)
+            text_sources = f"  Also listed at: {', '.join(other_sources)}\n" if other_sources else ''
+            text_listings.append(TEXT_LISTING_TEMPLATE.substitute(
+                fields, change=f"  ** {note} **\n" if note else '', sources=text_sources))
+            html_fields = {field: html.escape(text) for field, text in fields.items()}
+            html_note = f"<tr><td colspan=\"2\"><b>{html.escape(note)}</b></td></tr>" if note else ''
+            html_sources = ''
+            if other_sources:
+                links = ', '.join(f"<a href=\"{html.escape(url)}\">{html.escape(url)}</a>" for url in other_sources)
+                html_sources = f"<tr><td><b>Also listed at</b></td><td>{links}</td></tr>"
+            html_listings.append(HTML_LISTING_TEMPLATE.substitute(html_fields, change=html_note, sources=html_sources))
+        if not text_listings:
+            text_listings.append("No listings found for this property.\n")
+            html_listings.append("<p>No listings found for this property.</p>")
+        text_properties.append(TEXT_PROPERTY_TEMPLATE.substitute(name=property_data['name'], listings=''.join(text_listings)))
+        html_properties.append(HTML_PROPERTY_TEMPLATE.substitute(
+            name=html.escape(property_data['name']), listings=''.join(html_listings)))
+    return (TEXT_TEMPLATE.substitute(properties=''.join(text_properties)),
+            HTML_TEMPLATE.substitute(properties=''.join(html_properties)))
+
+
+def build_message(all_listings, options, recipients):
+    """Returns the MIME message of one digest: plain text, plus an HTML alternative unless disabled."""
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+
+    text_body, html_body = render_digest(all_listings)
+    if options['html']:
+        message = MIMEMultipart('alternative')
+        message.attach(MIMEText(text_body, 'plain', 'utf-8'))
+        message.attach(MIMEText(html_body, 'html', 'utf-8'))
+    else:
+        message = MIMEText(text_body, 'plain', 'utf-8')
+    message['Subject'] = options['subject']
+    message['From'] = options['sender']
+    message['To'] = ', '.join(recipients)
+    return message
+
+
+class Mailer:
+    """
+    Sends messages over one authenticated SMTP connection.
+
+    The connection (EHLO, STARTTLS, login) is opened on the first send and
+    reused for up to messages_per_connection messages, then replaced. Sends are
+    spaced to stay under messages_per_minute.
+    """
+
+    def __init__(self, options):
+        self.options = options
+        self._server = None
+        self._sent_on_connection = 0
+        self._last_sent = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _connect(self):
+        import smtplib
+
+        with run_metrics.span('smtp_connect'):
+            try:
+                server = smtplib.SMTP(self.options['host'], self.options['port'], timeout=30)
+                server.ehlo()
+                if server.has_extn('starttls'):
+                    server.starttls()
+                    server.ehlo()
+                if self.options['username'] and self.options['password']:
+                    server.login(self.options['username'], self.options['password'])
+            except (smtplib.SMTPException, OSError) as e:
+                raise ConnectError(f"Could not connect to {self.options['host']}:{self.options['port']}: {e}") from e
+        run_metrics.count('smtp_connections')
+        self._server = server
+        self._sent_on_connection = 0
+
+    def _throttle(self):
+        per_minute = self.options['messages_per_minute']
+        if per_minute and self._last_sent is not None:
+            delay = self._last_sent + 60.0 / per_minute - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+    def send(self, message, recipients):
+        """
+        Sends one message, reconnecting once if the server dropped the connection.
+
+        Raises ConnectError when no session can be opened (unreachable server,
+        bad credentials), which no other message of the batch would get past either.
+        """
+        import smtplib
+
+        for attempt in range(2):
+            if self._server is None or self._sent_on_connection >= self.options['messages_per_connection']:
+                self.close()
+                self._connect()
+            self._throttle()
+            try:
+                self._server.sendmail(self.options['sender'], recipients, message.as_string())
+            except smtplib.SMTPServerDisconnected:
+                self._server = None
+                if attempt:
+                    raise
+                continue
+            self._last_sent = time.monotonic()
+            self._sent_on_connection += 1
+            run_metrics.count('emails_sent')
+            return
+
+    def close(self):
+        """Ends the SMTP session, if one is open."""
+        import smtplib
+
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._server = None
+
+
+def _merge_digests(digests):
+    """Merges several runs' listings into one, by property; a unit in several runs keeps its latest version."""
+    merged = {}
+    for all_listings in digests:
+        for property_data in all_listings:
+            units = merged.setdefault(property_data['name'], {})
+            for listing in property_data['listings']:
+                identity = seen_store.listing_identity(property_data['name'], listing)
+                earlier = units.get(identity)
+                if earlier is not None and earlier.get('change') == seen_store.CHANGE_NEW:
+                    listing = dict(listing, change=seen_store.CHANGE_NEW)  # Still new to the reader
+                    listing.pop('previous_rent', None)
+                units[identity] = listing
+    return [{'name': name, 'listings': list(units.values())} for name, units in merged.items() if units]
+
+
+class PendingDigests:
+    """SQLite table of alerts held back so several runs go out as one digest per recipient list."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            '''
+            CREATE TABLE IF NOT EXISTS pending (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                recipients TEXT NOT NULL,
+                queued REAL NOT NULL,
+                listings TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS pending_recipients ON pending (recipients, queued);
+            '''
+        )
+        self._conn.commit()
+
+    def add_and_collect(self, recipients, all_listings, window_seconds, now=None):
+        """
+        Queues one run's listings and returns the merged digest once it is due, else None.
+
+        A digest is due when its oldest queued run is at least window_seconds old;
+        all queued runs for the recipients are then removed and merged. Removing
+        them here keeps two concurrent runs from sending the same digest; if the
+        send fails, put the digest back with restore.
+        """
+        now = now or time.time()
+        key = ','.join(sorted(recipients))
+        with self._lock:
+            conn = self._conn
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                if all_listings:
+                    conn.execute('INSERT INTO pending (recipients, queued, listings) VALUES (?, ?, ?)',
+                                 (key, now, json.dumps(all_listings)))
+                oldest = conn.execute('SELECT MIN(queued) FROM pending WHERE recipients = ?', (key,)).fetchone()[0]
+                rows = []
+                if oldest is not None and now - oldest >= window_seconds:
+                    rows = conn.execute('SELECT listings FROM pending WHERE recipients = ? ORDER BY id', (key,)).fetchall()
+                    conn.execute('DELETE FROM pending WHERE recipients = ?', (key,))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        if not rows:
+            if oldest is not None:
+                logger.info(f"Holding alerts for {key} until the digest window of {window_seconds / 60:.0f} minutes has passed.")
+            return None
+        return _merge_digests(json.loads(listings) for (listings,) in rows)
+
+
+    def restore(self, recipients, all_listings, queued):
+        """Queues a collected digest again, as of its original time, after its send failed."""
+        with self._lock:
+            self._conn.execute('INSERT INTO pending (recipients, queued, listings) VALUES (?, ?, ?)',
+                               (','.join(sorted(recipients)), queued, json.dumps(all_listings)))
+            self._conn.commit()
+
+
+def get_pending():
+    """Returns the process-wide pending-digest store, opening it on first use."""
+    global _pending
+    with _pending_lock:
+        if _pending is None:
+            _pending = PendingDigests(local_store.cache_path('pending_alerts.sqlite3'))
+        return _pending
+
+
+@run_metrics.timed('alert')
+def send_digests(digests, config):
+    """
+    Renders and sends a batch of digests over one SMTP connection.
+
+    Args:
+        digests (list): (all_listings, recipients) pairs; recipients None means the configured ones.
+            A subscriber's digest never falls back to them: with no usable
+            addresses of its own it is not sent.
+        config (dict): The run's config; its 'email' section and the environment supply the settings.
+
+    Returns:
+        list: One flag per digest, True when it was sent, held for a later
+              digest or had nothing to send, False when it was skipped or failed.
+    """
+    options = settings(config)
+    delivered = []
+    with Mailer(options) as mailer:
+        for all_listings, recipients in digests:
+            if recipients is None:
+                recipients = options['recipients']
+            else:
+                recipients = _split_addresses(recipients)
+                if not recipients:
+                    # The global list would leak this subscriber's matches to other people
+                    logger.warning("A subscriber digest has no usable recipients; not sending it.")
+                    delivered.append(False)
+                    continue
+            if not options['sender'] or not recipients:
+                logger.warning("No sender or recipients configured (ALERT_SENDER / ALERT_RECIPIENTS or config['email']); skipping email alert.")
+                delivered.append(False)
+                continue
+            collected = False
+            if options['digest_minutes']:
+                now = time.time()
+                all_listings = get_pending().add_and_collect(recipients, all_listings, options['digest_minutes'] * 60, now)
+                collected = all_listings is not None
+            if not all_listings:
+                logger.info("No new listings matching criteria to send alerts for.")
+                delivered.append(True)
+                continue
+            stop = False
+            try:
+                mailer.send(build_message(all_listings, options, recipients), recipients)
+                delivered.append(True)
+                logger.info(f"Email alert sent to {', '.join(recipients)}.")
+                continue
+            except ConnectError as e:
+                # Every other digest would fail the same way; don't reconnect once per subscriber
+                logger.error(f"Error sending email alerts, stopping this batch: {e}")
+                stop = True
+            except Exception as e:
+                logger.error(f"Error sending email alert to {', '.join(recipients)}: {e}")
+                mailer.close()
+            delivered.append(False)
+            if collected:
+                # Due as soon as the next run, which retries it
+                get_pending().restore(recipients, all_listings, now - options['digest_minutes'] * 60)
+            if stop:
+                break
+    # Digests after a connection failure were not attempted
+    return delivered + [False] * (len(digests) - len(delivered))
@@ -1,20 +1,52 @@
+import asyncio
+import contextlib
 import json
 import logging
 import requests
-from bs4 import BeautifulSoup
 import os
-import smtplib
-from email.mime.text import MIMEText
-import google.generativeai as genai
-from flask import jsonify
+import threading
+import time
+import uuid
+import crawler
+import dedup
+import extraction_scheduler
+import fetch_pool
+import http_client
+import jina_cache
+import job_queue
+import json_stream
+import listing_cache
+import listing_records
+import mailer
+import rent_history
+import resilience
+import run_metrics
+import seen_store
+import sharding
+import subscribers
+from scraping_engines import markdown_pruning, page_fingerprint, registry, site_profiles
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Heavy dependencies (google.generativeai, bs4/lxml, flask, smtplib) are imported where they are
+# first used, so a cold start only pays for what the configured engine needs. The parsed config
+# and the Gemini client are kept at module level and reused across warm invocations.
+CONFIG_PATH = 'config.json'
+JINA_READER_URL = os.environ.get("JINA_READER_URL", "https://r.jina.ai/")
+_config = None
+_config_mtime = None
+_gemini_model = None
+_state_lock = threading.Lock()
+
 def load_config():
-    """Loads configuration from config.json."""
+    """Loads configuration from config.json, reusing the parsed copy while the file is unchanged."""
+    global _config, _config_mtime
     try:
-        with open('config.json', 'r') as f:
+        mtime = os.path.getmtime(CONFIG_PATH)
+        if _config is not None and mtime == _config_mtime:
+            return _config
+        with open(CONFIG_PATH, 'r') as f:
             config = json.load(f)
             logging.info("Configuration loaded successfully.")
 
@@ -22,6 +54,7 @@ def load_config():
             if 'filters' not in config:
                 config['filters'] = {}
 
+            _config, _config_mtime = config, mtime
             return config
     except FileNotFoundError:
         logging.error("Configuration file 'config.json' not found.")
@@ -30,194 +63,764 @@ def load_config():
         logging.error("Error decoding JSON in 'config.json'.")
         return None
 
-def scrape_website(url):
-    """Fetches content from a given URL with enhanced headers."""
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
-        'Accept-Language': 'en-US,en;q=0.9',
-        'Cache-Control': 'no-cache',
-        'Cookie': '.AspNetCore.Antiforgery.-rXc1S2HjzU=CfDJ8CtwjdPBESBMu9DVKc5_ZZ0nq2iPHLw2-VS6GAbmWzbhIkjJ8sLVqisiLudi9Wic1D-e5cx7TFN_67-QIEntMdhxXhCfEbmNw0ABK_OATlGSTDpRgZljif0MLzEYgNQLWJAy1E15_uwRcC76LhDs6qA; _cfuvid=MHI7jQp8.qJ4FOraGbadxjLFOnpevL5dhsKwdlJBjYg-1740537138507-0.0.1.1-604800000; yTrackUser=7JV529LUTIJJ5KTB4YUMT40537138575; PropLeadSource_1473965=portal; sReferrerURL=https%3A%2F%2Fwww.riversedgepi.com%2Ffloorplans; sCurrentURL=https%3A%2F%2Fwww.riversedgepi.com%2Ffloorplans%2Fa9%3Fmidate%3D05%2F10%2F2025; __utmzzses=1; _yTrackUser=MzI5OTA0Mzk2NiM0MDAzNDIyNDQ%253d-phXh3FjAj80%253d; rpTrackingExternalUserId=371559a4-c582-4735-af5d-16197cde34e0; sessionTrafficSource=utmcsr=(direct)|utmcmd=(none)|utmccn=(not set)|utmknock=(not set)|pathname=/floorplans/a9; _gid=GA1.2.1611080335.1740953636; __cf_bm=qshJW22wbssGx8OStcjtiqbRv1KXsQ3ZoPPyD.CqfVw-1741035282-1.0.1.1-_qFgPJEY1eUNPIDzGSPLDPiq3laUsYpjB7cZoysY3OjtAdL2g_4DkSuhzLGj4B0eaTlS9Nk.im.frq8vOBMWlkZyXDUXUTKbqS3PxBWnYfw; yTrackVisit=CVSJS3U5NYZEEFYWGJVI281035282321; _yTrackVisit=NTQ3MTA3NzM0NiMzNTAzNjk0ODc%253d-GaHMIiAZd74%253d; cf_clearance=CQ3VnRHp_595rGaK1N_kOQzdFgEI9Awp5DBLdzx6qN8-1741035282-1.2.1.1-4EhBpNSSSjdMwePSFnWCZF77MEJgE1jQpriCViXWOJnrKj3JAHzY65UolPBPuwcdO3GtXMDieUve_HJEI9bgQ3ei3D8LUpCsFVOnkqQd6Bq.OiQAPEoqTQbOswENZmYcnJzki8bKuDg6I9u4eKlpQd.gQ9ZeRT9yt._Ky8Zevk12wVNtvNM4fCkwUV9IDb_G59jTcLFG1WnyFE7zqrZqDm_WUYYWsqh82Ny_zWWY01gzt1eT_B9mOw5RWnZlqiATRbJKBOgApITnuw905itokwyA5tvozonxLD02xdJMnBpVa.VYi7P4Aahc_9orygc02oe6zWoFMTKM.3r2aSV.lhyEyTI3roVyAybLl2hwU7msdBbkW_A6HRBihW6XP7LevqAvkcJojz4ZCJU8Ei4PyNVZEaRw9GNWPmPkMq3XLb4; trackThisPage=1741035691097; _dc_gtm_UA-56407927-4=1; _dc_gtm_UA-99654580-21=1; _ga=GA1.1.1888777578.1740537139; _ga_DLQBM166D8=GS1.1.1741035283.11.1.1741035692.0.0.0; rpTrackingFirstPartyUserObj=%7B%22id%22%3A%22c23a63f8-6d3e-4e47-b3e2-ab060c2bd86c%22%2C%22hit%22%3A49%7D; _ga_QVB9X5Z5XV=GS1.2.1741035283.10.1.1741035692.60.0.0; _gali=btnFrontDesk',
-        'Pragma': 'no-cache',
-        'DNT': '1',
-        'Priority': 'u=0, i',
-        'Sec-CH-UA': '"Not(A:Brand";v="99", "Google Chrome";v="133", "Chromium";v="133"',
-        'Sec-CH-UA-Mobile': '?0',
-        'Sec-CH-UA-Platform': '"macOS"',
-        'Sec-Fetch-Dest': 'document',
-        'Sec-Fetch-Mode': 'navigate',
-        'Sec-Fetch-Site': 'same-origin',
-        'Sec-Fetch-User': '?1',
-        'Service-Worker-Navigation-Preload': 'true',
-        'Upgrade-Insecure-Requests': '1',
-        'Referer': url  # Set Referer to the website URL itself
-    }
+def get_gemini_model():
+    """Returns the shared Gemini model client, creating it on first use."""
+    global _gemini_model
+    with _state_lock:
+        if _gemini_model is None:
+            import google.generativeai as genai
+            genai.configure(api_key=os.environ.get("GOOGLE_API_KEY"))
+            _gemini_model = genai.GenerativeModel(model_name=GEMINI_MODEL_NAME)
+        return _gemini_model
+
+@run_metrics.timed('fetch')
+def scrape_website(url, max_bytes=None, container_class=None, conditional=True):
+    """
+    Fetches content from a given URL with enhanced headers over the shared pooled session.
+
+    With max_bytes or container_class the body is streamed: pages over max_bytes are
+    rejected and reading stops once the listing containers' section has closed.
+    With conditional=False stored validators are not sent, so the page always comes back in full.
+    """
+    headers = dict(http_client.BROWSER_HEADERS)
+    headers['Cookie'] = '.AspNetCore.Antiforgery.-rXc1S2HjzU=CfDJ8CtwjdPBESBMu9DVKc5_ZZ0nq2iPHLw2-VS6GAbmWzbhIkjJ8sLVqisiLudi9Wic1D-e5cx7TFN_67-QIEntMdhxXhCfEbmNw0ABK_OATlGSTDpRgZljif0MLzEYgNQLWJAy1E15_uwRcC76LhDs6qA; _cfuvid=MHI7jQp8.qJ4FOraGbadxjLFOnpevL5dhsKwdlJBjYg-1740537138507-0.0.1.1-604800000; yTrackUser=7JV529LUTIJJ5KTB4YUMT40537138575; PropLeadSource_1473965=portal; sReferrerURL=https%3A%2F%2Fwww.riversedgepi.com%2Ffloorplans; sCurrentURL=https%3A%2F%2Fwww.riversedgepi.com%2Ffloorplans%2Fa9%3Fmidate%3D05%2F10%2F2025; __utmzzses=1; _yTrackUser=MzI5OTA0Mzk2NiM0MDAzNDIyNDQ%253d-phXh3FjAj80%253d; rpTrackingExternalUserId=371559a4-c582-4735-af5d-16197cde34e0; sessionTrafficSource=utmcsr=(direct)|utmcmd=(none)|utmccn=(not set)|utmknock=(not set)|pathname=/floorplans/a9; _gid=GA1.2.1611080335.1740953636; __cf_bm=qshJW22wbssGx8OStcjtiqbRv1KXsQ3ZoPPyD.CqfVw-1741035282-1.0.1.1-_qFgPJEY1eUNPIDzGSPLDPiq3laUsYpjB7cZoysY3OjtAdL2g_4DkSuhzLGj4B0eaTlS9Nk.im.frq8vOBMWlkZyXDUXUTKbqS3PxBWnYfw; yTrackVisit=CVSJS3U5NYZEEFYWGJVI281035282321; _yTrackVisit=NTQ3MTA3NzM0NiMzNTAzNjk0ODc%253d-GaHMIiAZd74%253d; cf_clearance=CQ3VnRHp_595rGaK1N_kOQzdFgEI9Awp5DBLdzx6qN8-1741035282-1.2.1.1-4EhBpNSSSjdMwePSFnWCZF77MEJgE1jQpriCViXWOJnrKj3JAHzY65UolPBPuwcdO3GtXMDieUve_HJEI9bgQ3ei3D8LUpCsFVOnkqQd6Bq.OiQAPEoqTQbOswENZmYcnJzki8bKuDg6I9u4eKlpQd.gQ9ZeRT9yt._Ky8Zevk12wVNtvNM4fCkwUV9IDb_G59jTcLFG1WnyFE7zqrZqDm_WUYYWsqh82Ny_zWWY01gzt1eT_B9mOw5RWnZlqiATRbJKBOgApITnuw905itokwyA5tvozonxLD02xdJMnBpVa.VYi7P4Aahc_9orygc02oe6zWoFMTKM.3r2aSV.lhyEyTI3roVyAybLl2hwU7msdBbkW_A6HRBihW6XP7LevqAvkcJojz4ZCJU8Ei4PyNVZEaRw9GNWPmPkMq3XLb4; trackThisPage=1741035691097; _dc_gtm_UA-56407927-4=1; _dc_gtm_UA-99654580-21=1; _ga=GA1.1.1888777578.1740537139; _ga_DLQBM166D8=GS1.1.1741035283.11.1.1741035692.0.0.0; rpTrackingFirstPartyUserObj=%7B%22id%22%3A%22c23a63f8-6d3e-4e47-b3e2-ab060c2bd86c%22%2C%22hit%22%3A49%7D; _ga_QVB9X5Z5XV=GS1.2.1741035283.10.1.1741035692.60.0.0; _gali=btnFrontDesk'
+    headers['Referer'] = url  # Set Referer to the website URL itself
+    if container_class:
+        from scraping_engines import html_parsing
+
+    def attempt(timeout):
+        # Every attempt (retry or hedge) reads afresh
+        stop_reading = html_parsing.ListingSectionWatcher.create(container_class) if container_class else None
+        return http_client.fetch(
+            url, headers=headers, timeout=timeout, conditional=conditional, max_bytes=max_bytes, stop_reading=stop_reading
+        )
+
+    # Waited for once, outside the attempts, so the wait is not recorded as the host's latency
+    fetch_pool.rate_limiter.acquire(url)
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
-        return response.text
+        # NOT_MODIFIED when the page is unchanged since the last run
+        return resilience.policy.call(resilience.host_key(url), attempt)
     except requests.exceptions.RequestException as e:
         logging.error(f"Error scraping {url}: {e}")
         return None
 
-def scrape_using_jina_ai(url):
-    """Scrapes a website using the Jina AI API."""
+@run_metrics.timed('fetch')
+def scrape_using_jina_ai(url, config=None):
+    """
+    Scrapes a website using the Jina AI API. Returns the page markdown, or None on failure.
+
+    Pages are served from the Jina cache while fresh (see jina_cache.py).
+    """
+    cached = jina_cache.lookup(url, config)
+    if cached is not None:
+        return cached
+
     headers = {
-    'Authorization': 'Bearer ' + os.environ.get("JINA_API_KEY"),
+    'Authorization': 'Bearer ' + os.environ.get("JINA_API_KEY", ""),
     'X-Retain-Images': 'none',
     'X-Return-Format': 'markdown'
     }
 
-    response = requests.get('https://r.jina.ai/' + url, headers=headers)
-    return response.text
+    jina_url = JINA_READER_URL + url
 
-def generate_listing_text(html_content, config):
-    """Generates batched listing text from HTML content."""
-    batched_listing_text = ""
-    if html_content:
-        soup = BeautifulSoup(html_content, 'html.parser')
-        listing_items = soup.find_all('div', class_='listing-item result js-listing-item')
+    def attempt(timeout):
+        return http_client.fetch(jina_url, headers=headers, timeout=timeout, conditional=False)
 
-        for index, item in enumerate(listing_items):
-            listing_text = item.text.strip()
-            batched_listing_text += f"Listing {index + 1}:\n{listing_text}\n\n"
-    return batched_listing_text
+    # The reader fetches the target site, so the site's own limit applies as well as the reader's.
+    # Waited for outside the attempts, so the wait is not recorded as latency.
+    fetch_pool.rate_limiter.acquire(url)
+    fetch_pool.rate_limiter.acquire(jina_url)
+    try:
+        # Tracked per target site: the reader's latency depends on the page it renders
+        markdown = resilience.policy.call(
+            'jina/' + resilience.host_key(url), attempt, default_read_timeout=http_client.JINA_TIMEOUT[1]
+        )
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Error scraping {url} with Jina AI: {e}")
+        return None
+    jina_cache.store(url, markdown, config)
+    return markdown
 
-def extract_listings_with_gemini(batched_listing_text, config):
-    """Extracts listing data from batched listing text using Gemini API and filters."""
-    listings = []
-    if not batched_listing_text:
-        return listings
+GEMINI_MODEL_NAME = "gemini-2.0-flash-001"
+GEMINI_TIMEOUT = 120  # Seconds, until the API has latency samples
 
-    filters = config.get('filters', {})
-    filter_criteria = ""
-    if filters:
-        filter_criteria += "The listings should match the following criteria:\n"
-        if 'min_sqft' in filters:
-            filter_criteria += f"- Minimum Square Feet: {filters['min_sqft']}\n"
-        if 'bedrooms' in filters:
-            filter_criteria += f"- Bedrooms: {filters['bedrooms']}\n"
-        if 'bathrooms' in filters:
-            filter_criteria += f"- Bathrooms: {filters['bathrooms']}\n"
-        if 'move_in_date_range_days' in filters and 'desired_move_in_date' in filters:
-            filter_criteria += f"- Move-in Date within {filters['move_in_date_range_days']} days of {filters['desired_move_in_date']}\n"
-    else:
-        filter_criteria = "No specific criteria provided. Extract all available information."
-
-    # Consolidated Gemini API prompt for extraction for all listings with filters
-    prompt = """Extract the following information from each apartment listing text provided below and return it in JSON format. It must include 'Square Feet', 'Rent', 'Bed/Bath', 'Available Date', 'Address', 'Title', 'URL'.
+# Consolidated Gemini API prompt for extraction for all listings. Filters are applied locally
+# afterwards (listing_records.filter_listings), so every listing is extracted.
+EXTRACTION_PROMPT = """Extract the following information from each apartment listing text provided below and return it in JSON format. It must include 'Square Feet', 'Rent', 'Bed/Bath', 'Available Date', 'Address', 'Title', 'URL'.
+    Extract every listing; do not leave any out.
     Rent is the $ amount. 
     URL should be a link to the floor plan or more details about the unit if not present website url for the listing.
 Keys in the JSON should be: 'rent', 'square_feet', 'bed_bath', 'available_date', 'address', 'title', 'url'.
+    If the text is split into 'Listing N:' sections, also include 'listing_number' with the N of the section each listing came from.
     If the information is not found, use 'N/A' as the value.
 
-    Filter criteria: {}
-
     Listings text: {}""" # Placeholder for batched listing text
 
+LISTING_FIELDS = ('rent', 'square_feet', 'bed_bath', 'available_date', 'address', 'title', 'url')
+
+# Response schema for structured output: a flat array of listing objects
+LISTING_SCHEMA = {
+    'type': 'array',
+    'items': {
+        'type': 'object',
+        'properties': dict({field: {'type': 'string'} for field in LISTING_FIELDS}, listing_number={'type': 'integer'}),
+        'required': list(LISTING_FIELDS),
+    },
+}
+
+def generate_listing_blocks(html_content, config):
+    """Returns the text of each listing block in the HTML content."""
+    listing_blocks = []
+    if html_content:
+        from scraping_engines import html_parsing
+        listing_items = html_parsing.find_listing_items(html_content, config)
+        listing_blocks = [item.text.strip() for item in listing_items]
+    return listing_blocks
+
+@run_metrics.timed('parse')
+def parse_listings(html_content, url, config, profile_name=None):
+    """
+    Parses listings with a known site profile where possible.
+
+    Returns (listings, listing_blocks): listings parsed by selectors, and the text
+    of the blocks that still need Gemini (every block when no profile matches).
+    """
+    if not html_content:
+        return [], []
+    profile = None
+    if config.get('site_profiles', True):
+        profile = site_profiles.profile_for(url, html_content, name=profile_name)
+    if profile is None:
+        return [], generate_listing_blocks(html_content, config)
+
+    from scraping_engines import html_parsing
+    soup = html_parsing.parse_listing_containers(html_content, config, profile.container_class)
+    listings, unparsed_items = profile.extract(soup, url)
+    logging.info(f"{profile.name} profile parsed {len(listings)} listings; {len(unparsed_items)} left for Gemini.")
+    return listings, [item.text.strip() for item in unparsed_items]
+
+def format_listing_blocks(listing_blocks, numbers=None):
+    """Formats listing blocks as the numbered 'Listing N:' text sent to Gemini."""
+    numbers = numbers or range(1, len(listing_blocks) + 1)
+    return "".join(f"Listing {number}:\n{listing_text}\n\n" for number, listing_text in zip(numbers, listing_blocks))
+
+@run_metrics.timed('parse')
+def generate_listing_text(html_content, config):
+    """Generates batched listing text from HTML content."""
+    return format_listing_blocks(generate_listing_blocks(html_content, config))
+
+def record_token_usage(prompt, response, reply_chars):
+    """Counts prompt and response tokens, from the API's usage metadata when it reports them."""
+    usage = getattr(response, 'usage_metadata', None)
+    prompt_tokens = getattr(usage, 'prompt_token_count', None)
+    response_tokens = getattr(usage, 'candidates_token_count', None)
+    if prompt_tokens is None:
+        run_metrics.count('gemini_calls_without_usage')  # Token counts for these calls are estimates
+        prompt_tokens = extraction_scheduler.estimate_tokens(prompt)
+    if response_tokens is None:
+        response_tokens = reply_chars // extraction_scheduler.CHARS_PER_TOKEN + 1
+    run_metrics.count('gemini_calls')
+    run_metrics.count('prompt_tokens', prompt_tokens)
+    run_metrics.count('response_tokens', response_tokens)
+
+def _response_text(response):
+    """Returns the text of a Gemini response or stream chunk; '' for chunks without text (e.g. the final one)."""
     try:
-        response = gemini_model.generate_content(prompt.format(filter_criteria, batched_listing_text))
-        json_str = response.text.strip().replace('```json\n', '').replace('\n```', '')
-        listings_json = json.loads(json_str) # Parse JSON response for all listings
-        listings = listings_json if isinstance(listings_json, list) else [] # Ensure response is a list
-    except json.JSONDecodeError as e:
-        logging.error(f"Error parsing JSON response from Gemini API: {e}. Raw response: {response}")
-        listings = [] # Return empty list if JSON parsing fails
+        return response.text
+    except ValueError:
+        return ''
+
+@run_metrics.timed('gemini')
+def request_listings_from_gemini(batched_listing_text, config):
+    """
+    Sends one extraction prompt to Gemini and decodes the listings in its reply.
+
+    With the 'extraction' settings 'structured_output' and 'stream' (both on by default)
+    the model is held to LISTING_SCHEMA and listings are decoded as the reply streams in,
+    so a reply that is cut off still yields the listings that arrived complete.
+
+    Returns:
+        tuple: (listings, complete) where complete is False for a truncated reply.
+
+    Raises:
+        Exception: On API errors before any listing arrived, and on replies with no
+                   decodable listings, so the chunk is retried.
+    """
+    options = extraction_scheduler.settings(config)
+    prompt = EXTRACTION_PROMPT.format(batched_listing_text)
+    generation_options = {'stream': bool(options['stream'])}
+    if options['structured_output']:
+        generation_options['generation_config'] = {'response_mime_type': 'application/json', 'response_schema': LISTING_SCHEMA}
+
+    decoder = json_stream.JSONArrayDecoder()
+    listings = []
+    reply_chars = 0
+    reply_head = ''
+    response = None
+    started = time.perf_counter()
+
+    def attempt(timeout):
+        # The whole streamed reply is read here, so the latency the resilience policy records
+        # (and derives the next deadline from) is the full reply time, not time to first chunk
+        nonlocal response, reply_chars, reply_head
+        response = get_gemini_model().generate_content(prompt, request_options={'timeout': timeout[1]}, **generation_options)
+        for chunk in (response if options['stream'] else [response]):
+            text = _response_text(chunk)
+            reply_chars += len(text)
+            reply_head = reply_head or text[:500]
+            for listing in decoder.feed(text):
+                if not listings:
+                    run_metrics.record_span('gemini_first_listing', time.perf_counter() - started)
+                listings.append(listing)
+        return response
+
+    try:
+        # Retries are per chunk in extraction_scheduler; hedging would pay for the tokens twice
+        resilience.policy.call('gemini', attempt, retries=0, hedge=False, default_read_timeout=GEMINI_TIMEOUT)
     except Exception as e:
-        logging.error(f"Error extracting listing data using Gemini API: {e}")
-        listings = [] # Return empty list in case of error
+        if not listings:
+            raise
+        logging.warning(f"Gemini reply broke off after {len(listings)} listings: {e}")
+    record_token_usage(prompt, response, reply_chars)
+
+    if not decoder.complete:
+        if not listings:
+            raise ValueError(f"No listings could be decoded from the Gemini reply: {reply_head!r}")
+        run_metrics.count('gemini_truncated_replies')
+        logging.warning(f"Gemini reply was truncated; keeping the {len(listings)} listings that arrived complete.")
+    return listings, decoder.complete
 
+@run_metrics.timed('extract')
+def extract_listings_with_gemini(batched_listing_text, config):
+    """Extracts listing data from batched listing text using Gemini API."""
+    listings = []
+    if not batched_listing_text:
+        return listings
+
+    # Large pages are split into token-budgeted chunks so a bad reply only loses its own chunk
+    text_blocks = extraction_scheduler.split_text_blocks(batched_listing_text)
+    chunks = extraction_scheduler.chunk_blocks(text_blocks, extraction_scheduler.settings(config)['chunk_tokens'])
+
+    def extract_chunk(chunk):
+        listings, _ = request_listings_from_gemini("\n\n".join(text_blocks[position] for position in chunk), config)
+        return listings
+
+    for chunk_listings in extraction_scheduler.run_chunks(chunks, extract_chunk, config):
+        for listing in chunk_listings or []: # None when the chunk failed after retries
+            listing.pop('listing_number', None)
+            listings.append(listing)
     return listings
 
-def send_email_alert(all_listings):
-    """Sends email alert with listing details, organized by property."""
-    if not all_listings:
-        logging.info("No new listings matching criteria to send alerts for.")
-        return
+@run_metrics.timed('extract')
+def extract_listing_blocks(listing_blocks, config):
+    """Extracts listings block by block, sending only blocks missing from the extraction cache to Gemini."""
+    if not listing_blocks:
+        return []
+
+    use_cache = listing_cache.is_enabled(config)
+    results = {}
+    misses = list(range(len(listing_blocks)))
+    if use_cache:
+        # Anything that changes Gemini's answer for the same block text must be part of the key
+        context = f"{GEMINI_MODEL_NAME}\n{EXTRACTION_PROMPT}"
+        keys, results, misses = listing_cache.lookup(listing_blocks, context, config)
 
-    # Email configuration - Replace with your actual email settings
-    sender_email = "learnittej@gmail.com" # Replace with your email
-    sender_password = "eerj oobk dxfs hmgv"  # Replace with your Gmail App Password
-    receiver_email = "divtejus@gmail.com" # Replace with recipient email (your email for testing)
-    subject = "Daily Apartment Listing Alert - New Listings Found"
+    def extract_chunk(chunk):
+        batched_listing_text = format_listing_blocks(
+            [listing_blocks[index] for index in chunk], numbers=[index + 1 for index in chunk]
+        )
+        by_block = {index: [] for index in chunk}
+        unmatched = []
+        listings, complete = request_listings_from_gemini(batched_listing_text, config)
+        for listing in listings:
+            number = str(listing.pop('listing_number', '')).strip()
+            index = int(number) - 1 if number.isdigit() else None
+            if index in by_block:
+                by_block[index].append(listing)
+            else:
+                unmatched.append(listing)
+        return by_block, unmatched, complete
 
-    email_body = "Here are the new apartment listings matching your criteria:\n\n"
+    token_budget = extraction_scheduler.settings(config)['chunk_tokens']
+    chunks = [
+        [misses[position] for position in chunk]
+        for chunk in extraction_scheduler.chunk_blocks([listing_blocks[index] for index in misses], token_budget)
+    ]
+    unmatched = []
+    fresh_entries = {}
+    for chunk_result in extraction_scheduler.run_chunks(chunks, extract_chunk, config):
+        if chunk_result is None:
+            continue # Chunk failed after retries; its blocks are retried on the next run
+        by_block, chunk_unmatched, complete = chunk_result
+        results.update(by_block)
+        unmatched.extend(chunk_unmatched)
+        if not complete:
+            continue # Truncated reply: keep what arrived, but blocks after the cut must not be cached as empty
+        if use_cache and not chunk_unmatched:
+            # Blocks Gemini returned nothing for are cached as empty so they are not asked about again
+            fresh_entries.update({keys[index]: by_block[index] for index in by_block})
+        elif chunk_unmatched:
+            logging.warning(f"{len(chunk_unmatched)} listings came back without a listing number; not caching this chunk.")
+    if fresh_entries:
+        listing_cache.store(fresh_entries, config)
 
-    for property_data in all_listings:
-        property_name = property_data['name']
-        listings = property_data['listings']
+    listings = []
+    for index in range(len(listing_blocks)):
+        listings.extend(results.get(index, []))
+    return listings + unmatched
 
-        email_body += f"--------------------\n"
-        email_body += f"Property: {property_name}\n" # Add property name as title
+def streaming_options(property, config):
+    """
+    Returns (max_bytes, container_class) for fetching a property's page.
 
-        if not listings:
-            email_body += "No listings found for this property.\n\n"
+    Reads the 'streaming' section of config.json; a website entry may override
+    max_bytes. container_class is None when reading should not stop early, and
+    both are None when streaming is disabled.
+    """
+    streaming = config.get('streaming', {})
+    if not streaming.get('enabled', True):
+        return None, None
+    max_bytes = property.get('max_bytes', streaming.get('max_bytes', http_client.DEFAULT_MAX_BYTES))
+    container_class = None
+    if streaming.get('stop_after_listings', True):
+        container_class = listing_container_class(property, config)
+    return max_bytes, container_class
+
+def listing_container_class(property, config, html_content=None):
+    """Returns the class of one listing block on a property's page: its site profile's, or the default."""
+    from scraping_engines import html_parsing
+    profile = None
+    if config.get('site_profiles', True):
+        profile = site_profiles.profile_for(property['url'], html_content, name=property.get('profile'))
+    return profile.container_class if profile else html_parsing.LISTING_CONTAINER_CLASS
+
+@run_metrics.timed('fingerprint')
+def listings_unchanged(html_content, property, config):
+    """
+    Fingerprints the listing region of a fetched page, or of every page of a crawl
+    (see page_fingerprint.py), and returns True if it matches the last run's, so
+    parsing and Gemini can be skipped.
+    """
+    if not page_fingerprint.settings(config)['enabled']:
+        return False
+    pages = html_content if isinstance(html_content, list) else [(property['url'], html_content)]
+    fingerprints = [
+        (url, page_fingerprint.fingerprint(content, listing_container_class(property, config, content), config))
+        for url, content in pages
+    ]
+    fingerprint = fingerprints[0][1] if len(fingerprints) == 1 else page_fingerprint.combine(fingerprints)
+    http_client.validator_store.remember_fingerprint(property['url'], fingerprint)
+    return http_client.validator_store.is_unchanged(property['url'], fingerprint)
+
+def crawl_website(property, config):
+    """
+    Fetches every page a property's crawl rules lead to (see crawler.py).
+
+    Pages are fetched unconditionally and in full: the links to follow are needed
+    even when a page is unchanged, and pagination usually comes after the listings.
+    Returns a list of (url, html).
+    """
+    max_bytes, _ = streaming_options(property, config)
+    return crawler.crawl(
+        property['url'], crawler.rules_for(property), lambda url: scrape_website(url, max_bytes, conditional=False)
+    )
+
+def parse_pages(pages, config, profile_name=None):
+    """
+    Parses the pages of a crawled property like parse_listings and merges the results.
+
+    Listings and blocks that appear on several pages (e.g. a unit on both its
+    floorplan and detail page) are kept once.
+    """
+    listings, listing_blocks = [], []
+    seen_listings, seen_blocks = set(), set()
+    for url, html_content in pages:
+        page_listings, page_blocks = parse_listings(html_content, url, config, profile_name)
+        for listing in page_listings:
+            key = (listing.get('url'), listing.get('address') or listing.get('title'))
+            if key not in seen_listings:
+                seen_listings.add(key)
+                listings.append(listing)
+        for block in page_blocks:
+            key = listing_cache.normalize_block(block)
+            if key not in seen_blocks:
+                seen_blocks.add(key)
+                listing_blocks.append(block)
+    return listings, listing_blocks
+
+@registry.register_engine
+class BeautifulSoupEngine(registry.Engine):
+    """Fetches the page directly, parses known layouts with site profiles and sends the rest to Gemini."""
+
+    name = 'BeautifulSoup'
+    aliases = ('beautifulsoup', 'bs4')
+
+    async def fetch(self, property, config):
+        if crawler.rules_for(property):
+            page = await registry.run_blocking(crawl_website, property, config)
         else:
-            for listing in listings:
-                email_body += f"  --------------------\n" # Indent listings under property title
-                email_body += f"  Title: {listing.get('title', 'N/A')}\n"
-                email_body += f"  Address: {listing.get('address', 'N/A')}\n"
-                email_body += f"  Rent: {listing.get('rent', 'N/A')}\n"
-                email_body += f"  Bed/Bath: {listing.get('bed_bath', 'N/A')}\n"
-                email_body += f"  Sq Ft: {listing.get('square_feet', 'N/A')}\n"
-                email_body += f"  Available Date: {listing.get('available_date', 'N/A')}\n"
-                email_body += f"  URL: {listing.get('url', 'N/A')}\n\n"
-            email_body += "\n" # Add extra newline after each property's listings
-
-    email_body += "\n\nHappy apartment hunting!\nYour Agentic Apartment Finder"
-
-    message = MIMEText(email_body, 'plain')
-    message['Subject'] = subject
-    message['From'] = sender_email
-    message['To'] = receiver_email
+            page = await registry.run_blocking(scrape_website, property['url'], *streaming_options(property, config))
+        if page and await registry.run_blocking(listings_unchanged, page, property, config):
+            logging.info(f"Listings on {property['name']} are unchanged since the last run; reusing them.")
+            run_metrics.count('pages_unchanged')
+            return http_client.NOT_MODIFIED  # Handled like a 304: the last run's listings are reused
+        return page
 
-    try:
-        with smtplib.SMTP('smtp.gmail.com', 587) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.sendmail(sender_email, receiver_email, message.as_string())
-        logging.info("Email alert sent successfully.")
-    except Exception as e:
-        logging.error(f"Error sending email alert: {e}")
+    async def parse(self, page, property, config):
+        if isinstance(page, list):  # Crawled pages
+            return await registry.run_blocking(parse_pages, page, config, property.get('profile'))
+        return await registry.run_blocking(parse_listings, page, property['url'], config, property.get('profile'))
+
+    async def extract(self, parsed, property, config):
+        parsed_listings, listing_blocks = parsed
+        run_metrics.count('listings_parsed_by_profile', len(parsed_listings))
+        return parsed_listings + await registry.run_blocking(extract_listing_blocks, listing_blocks, config)
+
+    def commit(self, property, listings):
+        http_client.validator_store.commit(property['url'], listings)
+
+@registry.register_engine
+class JinaEngine(registry.Engine):
+    """Fetches the page as markdown through the Jina reader, prunes it and extracts listings with Gemini."""
+
+    name = 'JinaAi'
+    aliases = ('jina',)
+
+    async def fetch(self, property, config):
+        rules = crawler.rules_for(property)
+        if not rules:
+            return await registry.run_blocking(scrape_using_jina_ai, property['url'], config)
+        # Links are followed in the reader's markdown; the pages are extracted together
+        pages = await registry.run_blocking(crawler.crawl, property['url'], rules, lambda url: scrape_using_jina_ai(url, config))
+        return "\n\n".join(content for _, content in pages)
+
+    async def parse(self, page, property, config):
+        with run_metrics.span('prune'):
+            listing_text, pruning_stats = markdown_pruning.prune_markdown(page, config)
+        run_metrics.count('markdown_tokens_pruned', pruning_stats['tokens_removed'])
+        logging.info(
+            f"Pruned {pruning_stats['chars_removed']} chars (~{pruning_stats['tokens_removed']} tokens) of Jina markdown for "
+            f"{property['name']}; kept {pruning_stats['sections_kept']}/{pruning_stats['sections_total']} sections."
+        )
+        return listing_text
+
+    async def extract(self, parsed, property, config):
+        return await registry.run_blocking(extract_listings_with_gemini, parsed, config)
+
+def process_property(property, config):
+    """Scrapes one property with the configured engine and returns its name and listings."""
+    with run_metrics.property_scope(property['name']), run_metrics.span('property'):
+        return _process_property(property, config)
+
+def _process_property(property, config):
+    engine = registry.engine_for(property, config)
+    logging.info(f"Scraping website: {property['url']} with the {engine.name} engine")
+    property_listings = asyncio.run(engine.scrape(property, config))
+    return property_result(property, property_listings)
+
+def property_result(property, property_listings):
+    """Returns a property's name and its full extraction; the filters are applied in deliver_alerts."""
+    run_metrics.count('listings_extracted', len(property_listings))
+    logging.info(f"Extracted {len(property_listings)} listings for {property['name']}.")
+    return {
+        'name': property['name'],
+        'listings': property_listings
+    }
+
+def filter_all_listings(all_listings, config):
+    """Applies config's filters to every property's listings."""
+    # Filters run locally over the full extraction, so they are exact and can be re-run without Gemini
+    with run_metrics.span('filter'):
+        matching_listings = [
+            {'name': property_data['name'], 'listings': listing_records.filter_listings(property_data['listings'], config)}
+            for property_data in all_listings
+        ]
+    matched = sum(len(property_data['listings']) for property_data in matching_listings)
+    run_metrics.count('listings_matched', matched)
+    logging.info(f"{matched} of {sum(len(property_data['listings']) for property_data in all_listings)} listings match the filters.")
+    return matching_listings
+
+def deliver_alerts(all_listings, config, run_id=None):
+    """
+    Sends a run's alerts and returns what was sent, for the response. The
+    response's 'listings' stays the full extraction; the returned keys
+    ('matching_listings' and 'new_listings', or 'subscribers') never replace it.
+
+    all_listings is the unfiltered extraction, which is appended as a whole to
+    the rent history so its price changes and medians cover every unit. Without
+    subscriber profiles it is then filtered with config's filters for the single
+    recipient; with profiles every profile is matched against it, and each gets
+    its own seen-store history and email. The history's alert rules can add
+    units to the emails.
+
+    run_id identifies a queued run, whose alert job may be retried: its rent
+    observations are then not appended again, and units whose email already
+    went out are no longer new in the seen store, so they are not re-sent.
+    """
+    alert_only_changes = config.get('alert_only_changes', True)
+    history_options = rent_history.settings(config)
+    if history_options['enabled']:
+        with run_metrics.span('rent_history'):
+            rent_history.get_history().append(all_listings, batch=run_id)
+
+    def add_trend_alerts(alert_listings, listings, subscriber=None):
+        # Rules over the rent history (drop from a recent high, below the property median).
+        # Returns the merged alerts and the triggered ones, to mark as sent once delivered.
+        if not history_options['enabled']:
+            return alert_listings, []
+        with run_metrics.span('rent_history'):
+            triggered = rent_history.get_history().trend_alerts(listings, history_options, subscriber)
+        return rent_history.merge_alerts(alert_listings, triggered), triggered
+
+    def record_delivered(listings, triggered, subscriber=None):
+        # Recorded only once delivered, so a failed or skipped alert is retried on the next run
+        if alert_only_changes:
+            with run_metrics.span('seen_store'):
+                seen_store.get_store().mark_seen(listings, subscriber=subscriber)
+        if triggered:
+            with run_metrics.span('rent_history'):
+                rent_history.get_history().mark_alerted(subscriber, triggered)
+
+    subscriber_profiles = subscribers.profiles(config)
+    if not subscriber_profiles:
+        matching_listings = filter_all_listings(all_listings, config)
+        # Only units that are new, changed or cheaper than last time are emailed
+        alert_listings = matching_listings
+        if alert_only_changes:
+            with run_metrics.span('seen_store'):
+                alert_listings = seen_store.get_store().changes(matching_listings)
+        alert_listings, triggered = add_trend_alerts(alert_listings, matching_listings)
+        delivered, = mailer.send_digests([(alert_listings, None)], config)
+        if delivered:
+            record_delivered(matching_listings, triggered)
+        return {"matching_listings": matching_listings, "new_listings": alert_listings}
+
+    with run_metrics.span('match_subscribers'):
+        matches = subscribers.match(all_listings, subscriber_profiles)
+    results = {}
+    digests = []
+    triggered_alerts = []
+    for profile, matched_listings in zip(subscriber_profiles, matches):
+        alert_listings = matched_listings
+        if alert_only_changes:
+            with run_metrics.span('seen_store'):
+                alert_listings = seen_store.get_store().changes(matched_listings, subscriber=profile['name'])
+        alert_listings, triggered = add_trend_alerts(alert_listings, matched_listings, profile['name'])
+        triggered_alerts.append(triggered)
+        digests.append((alert_listings, profile['recipients']))
+        results[profile['name']] = {"listings": matched_listings, "new_listings": alert_listings}
+    # All profiles' emails go out over one SMTP connection
+    delivered = mailer.send_digests(digests, config)
+    for profile, matched_listings, triggered, sent in zip(subscriber_profiles, matches, triggered_alerts, delivered):
+        if sent:
+            record_delivered(matched_listings, triggered, profile['name'])
+    return {"subscribers": results}
+
+# Queued runs (job_queue.py): each property goes fetch -> extract -> filter on its own
+# stage's workers, then one alert job per run collects the results.
+_pipeline_workers = None
+_pipeline_metrics = {}  # run_id -> RunMetrics of the runs this process has worked on
+
+@contextlib.contextmanager
+def _pipeline_scope(job, property=None):
+    """Attributes a job's spans and counters to its run (and property)."""
+    metrics = _pipeline_metrics.setdefault(job['run_id'], run_metrics.RunMetrics())
+    with run_metrics.use(metrics):
+        if property is None:
+            yield
+            return
+        with run_metrics.property_scope(property['name']):
+            yield
+
+def fetch_stage(job):
+    """Fetches and parses a property's page. Engines that cannot be split (race) scrape it fully here."""
+    property, config = job['payload']['property'], job['config']
+    with _pipeline_scope(job, property):
+        engine = registry.engine_for(property, config)
+        logging.info(f"Fetching {property['url']} with the {engine.name} engine (run {job['run_id']})")
+        if not engine.staged:
+            return 'filter', {'property': property, 'listings': asyncio.run(engine.scrape(property, config))}
+        listings, parsed = asyncio.run(engine.fetch_and_parse(property, config))
+        if listings is not None:
+            engine.commit(property, listings)
+            return 'filter', {'property': property, 'listings': listings}
+        return 'extract', {'property': property, 'parsed': parsed}
+
+def extract_stage(job):
+    """Extracts the listings of a parsed page (the Gemini step)."""
+    property, config = job['payload']['property'], job['config']
+    with _pipeline_scope(job, property):
+        engine = registry.engine_for(property, config)
+        listings = asyncio.run(engine.extract(job['payload']['parsed'], property, config))
+        engine.commit(property, listings)
+    return 'filter', {'property': property, 'listings': listings}
+
+def filter_stage(job):
+    """Records a property's extraction as its output for the alert stage, which applies the filters."""
+    property = job['payload']['property']
+    with _pipeline_scope(job, property):
+        return None, property_result(property, job['payload']['listings'])
+
+def alert_stage(job):
+    """Collects every property of a run, removes duplicates, records them in the seen store and sends the alert."""
+    config = job['config']
+    with _pipeline_scope(job):
+        all_listings = [result for result in job_queue.get_queue(config).outputs(job['run_id']) if result is not None]
+        http_client.validator_store.save()
+        resilience.policy.save()
+        all_listings = dedup.dedup_listings(all_listings, config)
+        alerts = deliver_alerts(all_listings, config, job['run_id'])
+    metrics = _pipeline_metrics.pop(job['run_id'])
+    return None, {"listings": all_listings, **alerts, "metrics": metrics.to_dict()}
+
+def start_pipeline_workers(config):
+    """Starts the stage worker pools once per process; they also resume runs interrupted by a crash."""
+    global _pipeline_workers
+    with _state_lock:
+        if _pipeline_workers is None:
+            _pipeline_workers = job_queue.StageWorkers(
+                job_queue.get_queue(config),
+                {'fetch': fetch_stage, 'extract': extract_stage, 'filter': filter_stage, 'alert': alert_stage},
+                job_queue.settings(config)['workers'],
+            )
+    _pipeline_workers.start()
+    return _pipeline_workers
+
+def enqueue_run(config):
+    """Queues a run over every website in config and returns its run id."""
+    run_id = uuid.uuid4().hex
+    payloads = [{'property': property} for property in config.get('websites', [])]
+    job_queue.get_queue(config).create_run(run_id, config, 'fetch', payloads, 'alert')
+    logging.info(f"Queued run {run_id} with {len(payloads)} properties.")
+    return run_id
+
+def _run_pipeline_request(request_json, config):
+    """Queues a run and answers 202 at once, or reports on the run given as run_id."""
+    from flask import jsonify
+
+    start_pipeline_workers(config)
+    run_id = request_json.get('run_id')
+    if not run_id:
+        run_id = enqueue_run(config)
+        return jsonify({"message": "Apartment finder run queued.", "run_id": run_id, "status": job_queue.STATUS_PENDING}), 202
+
+    status = job_queue.get_queue(config).run_status(run_id)
+    if status is None:
+        return jsonify({"error": f"Unknown run_id {run_id}."}), 404
+    if status['status'] == job_queue.STATUS_DONE:
+        return jsonify(dict(status, message="Apartment finder ran successfully!")), 200
+    if status['status'] == job_queue.STATUS_FAILED:
+        return jsonify(dict(status, error="The run's alert stage failed.")), 500
+    return jsonify(status), 202
+
+def configure_modules(config):
+    """Applies config to the process-wide fetch pool, extraction scheduler and resilience policy."""
+    fetch_pool.configure(config)
+    extraction_scheduler.configure(config)
+    resilience.configure(config)
+
+def scrape_properties(properties, config):
+    """
+    Scrapes properties concurrently and saves the HTTP validators and host health.
+
+    Returns the results of the properties that succeeded, in the given order.
+    """
+    all_listings = fetch_pool.map_in_order(
+        lambda property: process_property(property, config),
+        properties,
+        max_workers=config.get('max_concurrent_properties', fetch_pool.DEFAULT_MAX_WORKERS),
+    )
+    http_client.validator_store.save()
+    resilience.policy.save()
+    return [result for result in all_listings if result is not None]
+
+def run_shard(config, shard, shards):
+    """
+    Scrapes the properties sharding.py assigns to one shard, without alerting.
+
+    Runs in a worker process (sharding mode 'process') or a separate function
+    invocation (mode 'http'); the coordinator merges the returned listings and metrics.
+    """
+    configure_modules(config)
+    properties = sharding.partition(config.get('websites', []), shards)[shard]
+    with run_metrics.run(config) as metrics:
+        all_listings = scrape_properties(properties, config)
+    succeeded = {result['name'] for result in all_listings}
+    return {
+        'shard': shard,
+        'listings': all_listings,
+        'failed_properties': [property['name'] for property in properties if property['name'] not in succeeded],
+        'metrics': metrics.to_dict(),
+    }
+
+def run_sharded(config, metrics, request_fields=None):
+    """
+    Dispatches the shards (see sharding.py) and merges their listings, in config order, and metrics.
+
+    Returns:
+        tuple: (all_listings, shard_reports). A failed shard is reported with its
+               error and properties; the listings of the healthy shards are kept.
+    """
+    all_listings = []
+    shard_reports = []
+    for report, result in sharding.dispatch(config, run_shard, request_fields):
+        if result is not None:
+            all_listings.extend(result['listings'])
+            metrics.merge(result['metrics'])
+            report['failed_properties'] = result['failed_properties']
+        shard_reports.append(report)
+    run_metrics.count('shards_failed', sum(1 for report in shard_reports if report['status'] != 'ok'))
+    order = {property['name']: index for index, property in enumerate(config.get('websites', []))}
+    all_listings.sort(key=lambda result: order.get(result['name'], len(order)))
+    return all_listings, shard_reports
+
+def _is_shard_request_authorized(request):
+    """Shard requests must carry the shared token when APT_FINDER_SHARD_TOKEN is set."""
+    token = os.environ.get(sharding.SHARD_TOKEN_ENV)
+    return not token or request.headers.get('Authorization') == 'Bearer ' + token
 
 def run_apartment_finder(request):
     """Runs the apartment finder logic. This is the entry point for the Cloud Function."""
+    from flask import jsonify
+
     try:
-        # Handle potential JSON input (not used in this basic version)
-        request_json = request.get_json(silent=True)
+        request_json = request.get_json(silent=True) or {}
 
         config = load_config()
         if not config:
             return jsonify({"error": "Failed to load configuration."}), 500
-
-        genai.configure(api_key=os.environ.get("GOOGLE_API_KEY"))
-        gemini_model = genai.GenerativeModel(model_name="gemini-2.0-flash-001")
+        if request_json.get('refresh'):
+            # Forced refresh: refetch Jina pages instead of serving them from the cache
+            config = dict(config, jina_cache=dict(config.get('jina_cache', {}), bypass=True))
 
         logging.info("Agent started with configuration: %s", config)
-        all_listings = []
-
-        for property in config.get('websites', []):
-            logging.info(f"Scraping website: {property['url']}")
-            if config.get('scraping_engine','') == 'BeautifulSoup':
-                html_content = scrape_website(property['url'])
-                if html_content:
-                    batched_listing_text = generate_listing_text(html_content, config)
-                    property_listings = extract_listings_with_gemini(batched_listing_text, config)
-                    
-            elif config.get('scraping_engine','') == 'JinaAi':
-                listing_text = scrape_using_jina_ai(property['url'])
-                property_listings = extract_listings_with_gemini(listing_text, config)
-            
-            logging.info(f"Extracted {len(property_listings)} listings using Gemini API.")
-               
-            # Append the property name and its listings to all_listings
-            
-            all_listings.append({
-                'name': property['name'],
-                'listings': property_listings
-            })   
-        send_email_alert(all_listings)  # Send email alert. Consider moving to Cloud Tasks for production.
-        return jsonify({"message": "Apartment finder ran successfully!", "listings": all_listings}), 200
+        if 'shard' in request_json:
+            # Invoked by a coordinator (sharding mode 'http'): run one shard, no alert
+            if not _is_shard_request_authorized(request):
+                return jsonify({"error": "Unauthorized shard request."}), 403
+            return jsonify(run_shard(config, int(request_json['shard']), int(request_json['shards']))), 200
+        configure_modules(config)
+        if job_queue.settings(config)['enabled']:
+            return _run_pipeline_request(request_json, config)
+
+        shard_reports = None
+        with run_metrics.run(config) as metrics:
+            if sharding.settings(config)['enabled']:
+                all_listings, shard_reports = run_sharded(config, metrics, {'refresh': bool(request_json.get('refresh'))})
+            else:
+                all_listings = scrape_properties(config.get('websites', []), config)
+            # The same unit found on several pages, properties or engines is alerted once
+            all_listings = dedup.dedup_listings(all_listings, config)
+            alerts = deliver_alerts(all_listings, config)
+        response = {
+            "message": "Apartment finder ran successfully!",
+            "listings": all_listings,
+            **alerts,
+            "metrics": metrics.to_dict(),
+        }
+        if shard_reports is not None:
+            response["shards"] = shard_reports
+        return jsonify(response), 200
 
     except Exception as e:
         logging.exception("An error occurred: %s", e)  # Log the full traceback
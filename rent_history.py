@@ -0,0 +1,384 @@
+import logging
+import os
+import threading
+import time
+import numpy as np
+import listing_records
+import local_store
+import seen_store
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+DAY_SECONDS = 86400
+KEPT_BATCHES = 200  # Batch ids remembered to skip re-appends; far more than runs are ever retried after
+CHANGE_BELOW_MEDIAN = 'below_median'
+
+# One little-endian binary file per column, appended to on every run and read back with
+# numpy in one call. Row i of every column is one observation of one unit.
+COLUMNS = (
+    ('unit', np.dtype('<i4')),       # Index into the units table (units.json)
+    ('time', np.dtype('<i8')),       # Observation time, epoch seconds
+    ('rent', np.dtype('<f4')),       # NaN when the rent could not be parsed
+    ('available', np.dtype('<i4')),  # Available date as a date ordinal, 0 when unknown
+    ('beds', np.dtype('<f4')),       # NaN when unknown, 0 for studios
+)
+
+_history = None
+_history_lock = threading.Lock()
+
+
+def settings(config):
+    """Returns the 'rent_history' section of config.json with defaults filled in."""
+    history_config = (config or {}).get('rent_history', {})
+    return {
+        'enabled': history_config.get('enabled', True),
+        'price_drop_percent': history_config.get('price_drop_percent'),
+        'price_drop_days': history_config.get('price_drop_days', 14),
+        'below_median_percent': history_config.get('below_median_percent'),
+        'median_days': history_config.get('median_days', 30),
+        'min_units': history_config.get('min_units', 3),
+    }
+
+
+def _group_starts(*keys):
+    """Start index of each run of equal keys in arrays already sorted by those keys."""
+    changed = np.zeros(len(keys[0]), dtype=bool)
+    changed[0] = True
+    for key in keys:
+        changed[1:] |= key[1:] != key[:-1]
+    return np.flatnonzero(changed)
+
+
+def _latest_per_unit(units, times, *columns):
+    """Keeps each unit's latest observation; returns (units, *columns) sorted by unit."""
+    order = np.lexsort((times, units))
+    units = units[order]
+    last = np.r_[_group_starts(units)[1:], len(units)] - 1
+    return (units[last],) + tuple(column[order][last] for column in columns)
+
+
+def _group_medians(groups, values):
+    """Returns (group keys, medians, counts) of values grouped by an integer key, without a Python loop."""
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    starts = _group_starts(groups)
+    counts = np.diff(np.r_[starts, len(groups)])
+    low = starts + (counts - 1) // 2
+    high = starts + counts // 2
+    return groups[starts], (values[low] + values[high]) / 2, counts
+
+
+class RentHistory:
+    """
+    Append-only columnar store of rent observations.
+
+    Each run appends one row per listing to the column files; units and
+    properties are interned in units.json, so a row is 24 bytes. Queries load
+    the columns as numpy arrays (reading only what was appended since the last
+    query) and are evaluated with vectorized scans, sorts and group reductions.
+    Written by one process at a time: the coordinator of a run.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._load_units()
+        self._alerted = local_store.load_json(self._path('alerted.json'), {})
+        self._batches = local_store.load_json(self._path('batches.json'), [])
+        self._columns = {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS}
+        self._rows = 0
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _load_units(self):
+        data = local_store.load_json(self._path('units.json'), {})
+        self._properties = data.get('properties', [])
+        self._units = data.get('units', [])  # [identity, property index, unit, url]
+        self._property_ids = {name: index for index, name in enumerate(self._properties)}
+        self._unit_ids = {unit[0]: index for index, unit in enumerate(self._units)}
+        self._unit_property = np.array([unit[1] for unit in self._units], dtype=np.int32)
+
+    def _stored_rows(self):
+        """Rows complete in every column file; a crash mid-append leaves some columns longer."""
+        sizes = []
+        for name, dtype in COLUMNS:
+            path = self._path(name + '.bin')
+            sizes.append(os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0)
+        return min(sizes)
+
+    def _refresh(self):
+        """Reads the rows appended since the last read."""
+        rows = self._stored_rows()
+        if rows < self._rows:  # Files replaced underneath us: read them again from the start
+            self._columns = {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS}
+            self._rows = 0
+        if rows == self._rows:
+            return
+        for name, dtype in COLUMNS:
+            tail = np.fromfile(self._path(name + '.bin'), dtype=dtype, count=rows - self._rows,
+                               offset=self._rows * dtype.itemsize)
+            self._columns[name] = np.concatenate((self._columns[name], tail))
+        self._rows = rows
+        if len(self._columns['unit']) and self._columns['unit'].max() >= len(self._units):
+            self._load_units()
+
+    def _intern(self, property_name, listing):
+        identity = seen_store.listing_identity(property_name, listing)
+        unit_id = self._unit_ids.get(identity)
+        if unit_id is None:
+            property_id = self._property_ids.get(property_name)
+            if property_id is None:
+                property_id = self._property_ids[property_name] = len(self._properties)
+                self._properties.append(property_name)
+            unit_id = self._unit_ids[identity] = len(self._units)
+            self._units.append([identity, property_id, listing.get('address') or listing.get('title'), listing.get('url')])
+        return unit_id
+
+    def append(self, all_listings, now=None, today=None, batch=None):
+        """
+        Appends one observation per listing of a run.
+
+        Args:
+            all_listings (list): [{'name': property name, 'listings': [listing dicts]}].
+            now (float, optional): Observation time in epoch seconds.
+            batch (str, optional): Id of the run. A batch already appended (a
+                retried alert job) is skipped rather than recorded twice.
+
+        Returns:
+            int: Rows appended.
+        """
+        now = int(now or time.time())
+        with self._lock:
+            if batch is not None and batch in self._batches:
+                logger.info(f"Rent observations of run {batch} are already recorded; skipping.")
+                return 0
+            known_units = len(self._units)
+            units = []
+            listings = []
+            for property_data in all_listings:
+                for listing in property_data['listings']:
+                    units.append(self._intern(property_data['name'], listing))
+                    listings.append(listing)
+            if not listings:
+                return 0
+            if len(self._units) > known_units:
+                # Written before the rows that refer to the new units
+                local_store.save_json(self._path('units.json'), {'properties': self._properties, 'units': self._units})
+                self._unit_property = np.array([unit[1] for unit in self._units], dtype=np.int32)
+
+            parsed = listing_records.ListingBatch.from_dicts(listings, today)
+            rows = {
+                'unit': np.array(units),
+                'time': np.full(len(listings), now),
+                'rent': parsed.rent,
+                'available': np.nan_to_num(parsed.available, nan=0),
+                'beds': parsed.beds,
+            }
+            stored_rows = self._stored_rows()
+            for name, dtype in COLUMNS:
+                with open(self._path(name + '.bin'), 'ab') as f:
+                    f.truncate(stored_rows * dtype.itemsize)  # Drop the tail of an interrupted append
+                    rows[name].astype(dtype).tofile(f)
+            if batch is not None:
+                self._batches = (self._batches + [batch])[-KEPT_BATCHES:]
+                local_store.save_json(self._path('batches.json'), self._batches)
+        logger.info(f"Recorded {len(listings)} rent observations ({len(self._units) - known_units} new units).")
+        return len(listings)
+
+    def _unit_info(self, unit_id):
+        identity, property_id, unit, url = self._units[unit_id]
+        return {'property': self._properties[property_id], 'unit': unit, 'url': url}
+
+    def _drops(self, percent, days, now):
+        """(units, latest rents, high rents) of units whose latest rent is percent below their high of the last days."""
+        columns = self._columns
+        window = (columns['time'] >= now - days * DAY_SECONDS) & ~np.isnan(columns['rent'])
+        units, times, rents = columns['unit'][window], columns['time'][window], columns['rent'][window]
+        if not len(units):
+            return units, rents, rents
+        order = np.lexsort((times, units))
+        units, rents = units[order], rents[order]
+        starts = _group_starts(units)
+        high = np.maximum.reduceat(rents, starts)
+        latest = rents[np.r_[starts[1:], len(units)] - 1]
+        dropped = latest <= high * (1 - percent / 100)
+        return units[starts][dropped], latest[dropped], high[dropped]
+
+    def price_drops(self, percent=5, days=14, now=None):
+        """
+        Returns the units whose latest rent is at least percent below their highest rent in the last days.
+
+        Returns:
+            list: {'property', 'unit', 'url', 'rent', 'previous_rent', 'drop_percent'}, largest drop first.
+        """
+        with self._lock:
+            self._refresh()
+            units, latest, high = self._drops(percent, days, now or time.time())
+            result = [
+                dict(self._unit_info(unit_id), rent=float(rent), previous_rent=float(previous),
+                     drop_percent=round(float((previous - rent) / previous * 100), 1))
+                for unit_id, rent, previous in zip(units, latest, high)
+            ]
+        return sorted(result, key=lambda entry: -entry['drop_percent'])
+
+    def _current_medians(self, days, now, min_units):
+        """Median of each unit's latest rent in the last days, by (property, beds); {(property id, beds): median}."""
+        columns = self._columns
+        window = (columns['time'] >= now - days * DAY_SECONDS) & ~np.isnan(columns['rent']) & ~np.isnan(columns['beds'])
+        if not window.any():
+            return {}
+        units, rents, beds = _latest_per_unit(columns['unit'][window], columns['time'][window],
+                                              columns['rent'][window], columns['beds'][window])
+        half_beds = np.rint(beds * 2).astype(np.int64)
+        groups, medians, counts = _group_medians(self._unit_property[units].astype(np.int64) * 1024 + half_beds, rents)
+        return {(int(group) // 1024, (int(group) % 1024) / 2): float(median)
+                for group, median, count in zip(groups, medians, counts) if count >= min_units}
+
+    def median_rent(self, beds=None, property_name=None, bucket_days=1, since=None, now=None):
+        """
+        Returns the median rent per property over time.
+
+        Each unit counts once per bucket (its latest rent in it), however often
+        it was observed.
+
+        Args:
+            beds (float, optional): Only units with this many bedrooms (0 for studios).
+            property_name (str, optional): Only this property.
+            bucket_days (int): Width of a time bucket in days.
+            since (float, optional): Epoch seconds of the first observation to include.
+
+        Returns:
+            dict: {property name: [(bucket start date, median rent, units), ...]} in time order.
+        """
+        with self._lock:
+            self._refresh()
+            columns = self._columns
+            mask = ~np.isnan(columns['rent'])
+            if beds is not None:
+                mask &= columns['beds'] == beds
+            if since is not None:
+                mask &= columns['time'] >= since
+            if now is not None:
+                mask &= columns['time'] <= now
+            if property_name is not None:
+                if property_name not in self._property_ids:
+                    return {}
+                mask &= self._unit_property[columns['unit']] == self._property_ids[property_name]
+            if not mask.any():
+                return {}
+            bucket_seconds = bucket_days * DAY_SECONDS
+            buckets = columns['time'][mask] // bucket_seconds
+            # Latest observation of each unit within each bucket, then medians per (property, bucket)
+            bucketed_units = buckets * (len(self._units) + 1) + columns['unit'][mask]
+            keys, rents = _latest_per_unit(bucketed_units, columns['time'][mask], columns['rent'][mask])
+            buckets, units = keys // (len(self._units) + 1), keys % (len(self._units) + 1)
+            properties = self._unit_property[units].astype(np.int64)
+            bucket_span = int(buckets.max()) + 1
+            groups, medians, counts = _group_medians(properties * bucket_span + buckets, rents)
+            property_ids, buckets = np.divmod(groups, bucket_span)
+            starts = np.datetime_as_string((buckets * bucket_seconds).astype('datetime64[s]'), unit='D')
+
+            result = {}
+            for property_id, start, median, count in zip(property_ids.tolist(), starts.tolist(), medians.tolist(), counts.tolist()):
+                result.setdefault(self._properties[property_id], []).append((start, median, count))
+        return result
+
+    def trend_alerts(self, all_listings, options, subscriber=None, now=None):
+        """
+        Returns the listings of a run that trip a rent_history alert rule, annotated for the email.
+
+        A listing whose rent is price_drop_percent below its high of the last
+        price_drop_days gets change 'price_drop' and previous_rent; one
+        below_median_percent under the median rent of its property and bed count
+        gets change 'below_median' and median_rent. Each unit alerts once per rent
+        and subscriber: nothing is recorded here, call mark_alerted once the
+        alert is delivered, so a failed or skipped email is retried next run.
+        """
+        if options['price_drop_percent'] is None and options['below_median_percent'] is None:
+            return []
+        now = now or time.time()
+        with self._lock:
+            self._refresh()
+            drops = {}
+            if options['price_drop_percent'] is not None:
+                units, _, high = self._drops(options['price_drop_percent'], options['price_drop_days'], now)
+                drops = dict(zip(units.tolist(), high.tolist()))
+            medians = {}
+            if options['below_median_percent'] is not None:
+                medians = self._current_medians(options['median_days'], now, options['min_units'])
+
+            triggered = []
+            for property_data in all_listings:
+                listings = []
+                for listing in property_data['listings']:
+                    unit_id = self._unit_ids.get(seen_store.listing_identity(property_data['name'], listing))
+                    rent = listing_records.parse_number(listing.get('rent'))
+                    if unit_id is None or rent is None:
+                        continue
+                    annotated = None
+                    if unit_id in drops:
+                        annotated = dict(listing, change=seen_store.CHANGE_PRICE_DROP, previous_rent=drops[unit_id])
+                    elif medians:
+                        beds, _ = listing_records.parse_bed_bath(listing.get('bed_bath'))
+                        median = medians.get((int(self._unit_property[unit_id]), beds))
+                        if median and rent <= median * (1 - options['below_median_percent'] / 100):
+                            annotated = dict(listing, change=CHANGE_BELOW_MEDIAN, median_rent=median)
+                    if annotated is None:
+                        continue
+                    if self._alerted.get(self._alert_key(subscriber, unit_id)) == self._alert_value(annotated['change'], rent):
+                        continue
+                    listings.append(annotated)
+                if listings:
+                    triggered.append({'name': property_data['name'], 'listings': listings})
+        return triggered
+
+    @staticmethod
+    def _alert_key(subscriber, unit_id):
+        return f"{subscriber or ''}\0{unit_id}"
+
+    @staticmethod
+    def _alert_value(change, rent):
+        return f"{change}:{rent}"
+
+    def mark_alerted(self, subscriber, all_listings):
+        """Records the trend alerts of a delivered email (listings returned by trend_alerts) as sent."""
+        with self._lock:
+            changed = False
+            for property_data in all_listings:
+                for listing in property_data['listings']:
+                    unit_id = self._unit_ids.get(seen_store.listing_identity(property_data['name'], listing))
+                    rent = listing_records.parse_number(listing.get('rent'))
+                    if unit_id is None or rent is None or 'change' not in listing:
+                        continue
+                    self._alerted[self._alert_key(subscriber, unit_id)] = self._alert_value(listing['change'], rent)
+                    changed = True
+            if changed:
+                local_store.save_json(self._path('alerted.json'), self._alerted)
+
+
+def merge_alerts(alert_listings, triggered):
+    """Adds trend-alert listings to a run's alerts; a unit already alerted for a change keeps that entry."""
+    if not triggered:
+        return alert_listings
+    merged = {property_data['name']: {seen_store.listing_identity(property_data['name'], listing): listing
+                                      for listing in property_data['listings']}
+              for property_data in alert_listings}
+    for property_data in triggered:
+        units = merged.setdefault(property_data['name'], {})
+        for listing in property_data['listings']:
+            identity = seen_store.listing_identity(property_data['name'], listing)
+            if units.get(identity, {}).get('change') is None:
+                units[identity] = listing
+    return [{'name': name, 'listings': list(units.values())} for name, units in merged.items() if units]
+
+
+def get_history():
+    """Returns the process-wide rent history, opening it on first use."""
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = RentHistory(local_store.cache_path('rent_history'))
+        return _history
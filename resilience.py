@@ -0,0 +1,268 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+import requests
+import local_store
+import run_metrics
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 30  # Until a host has enough latency samples
+MIN_READ_TIMEOUT = 5
+MAX_READ_TIMEOUT = 90
+TIMEOUT_PERCENTILE = 95
+TIMEOUT_MULTIPLIER = 3  # Read timeout = multiplier x the host's p95 latency, clamped
+HEDGE_PERCENTILE = 90  # A second request is sent once the first is slower than this
+MIN_HEDGE_DELAY = 0.5
+LATENCY_WINDOW = 50
+MIN_SAMPLES = 5
+DEFAULT_MAX_RETRIES = 2
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+DEFAULT_CALL_BUDGET = 120  # Seconds one call may spend across attempts and backoff
+FAILURE_THRESHOLD = 3
+COOLDOWN_SECONDS = 30 * 60
+HEDGE_WORKERS = 16
+
+_hedge_executor = None
+_hedge_executor_lock = threading.Lock()
+
+
+class CircuitOpen(requests.exceptions.RequestException):
+    """Raised instead of calling a host whose circuit breaker is open."""
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Full-jitter exponential backoff: a random delay in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def is_retryable(error):
+    """Timeouts, connection errors, 429 and 5xx are worth another attempt; other errors are not."""
+    if isinstance(error, CircuitOpen):
+        return False
+    if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+        return True
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None)
+    if isinstance(error, requests.exceptions.HTTPError) and status is not None:
+        return status == 429 or status >= 500
+    return not isinstance(error, requests.exceptions.RequestException)  # API client errors, bad replies
+
+
+def _percentile(samples, percentile):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class HostHealth:
+    """Recent latencies and circuit breaker state of one host."""
+
+    def __init__(self, latencies=(), failures=0, opened_at=None):
+        self.latencies = deque(latencies, maxlen=LATENCY_WINDOW)
+        self.failures = failures  # Consecutive failed calls
+        self.opened_at = opened_at  # Wall-clock time the breaker opened, None while closed
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    def read_timeout(self, settings, default=None):
+        """Read timeout from the host's latency percentile, or the default until there are enough samples."""
+        default = default or settings['default_read_timeout']
+        with self._lock:
+            if len(self.latencies) < MIN_SAMPLES:
+                return default
+            observed = _percentile(self.latencies, TIMEOUT_PERCENTILE)
+        ceiling = max(settings['max_read_timeout'], default)
+        return min(ceiling, max(settings['min_read_timeout'], observed * TIMEOUT_MULTIPLIER))
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging, or None until there are enough samples."""
+        with self._lock:
+            if len(self.latencies) < MIN_SAMPLES:
+                return None
+            return max(MIN_HEDGE_DELAY, _percentile(self.latencies, HEDGE_PERCENTILE))
+
+    def allow(self, settings, now=None):
+        """False while the breaker is open; after the cooldown one trial call is let through."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if (now or time.time()) - self.opened_at < settings['cooldown_seconds'] or self.trial_running:
+                return False
+            self.trial_running = True  # Half-open
+            return True
+
+    def record_success(self, seconds):
+        with self._lock:
+            self.latencies.append(seconds)
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self, settings, now=None):
+        """Counts a failed call; returns True if this opened the breaker."""
+        with self._lock:
+            self.failures += 1
+            was_open = self.opened_at is not None
+            if self.failures >= settings['failure_threshold'] or self.trial_running:
+                self.opened_at = now or time.time()
+            self.trial_running = False
+            return self.opened_at is not None and not was_open
+
+    def to_dict(self):
+        with self._lock:
+            return {'latencies': list(self.latencies), 'failures': self.failures, 'opened_at': self.opened_at}
+
+
+def settings(config):
+    """Returns the 'resilience' section of config.json with defaults filled in."""
+    resilience_config = (config or {}).get('resilience', {})
+    return {
+        'default_read_timeout': resilience_config.get('default_read_timeout', DEFAULT_READ_TIMEOUT),
+        'min_read_timeout': resilience_config.get('min_read_timeout', MIN_READ_TIMEOUT),
+        'max_read_timeout': resilience_config.get('max_read_timeout', MAX_READ_TIMEOUT),
+        'max_retries': resilience_config.get('max_retries', DEFAULT_MAX_RETRIES),
+        'call_budget_seconds': resilience_config.get('call_budget_seconds', DEFAULT_CALL_BUDGET),
+        'hedge': resilience_config.get('hedge', True),
+        'failure_threshold': resilience_config.get('failure_threshold', FAILURE_THRESHOLD),
+        'cooldown_seconds': resilience_config.get('cooldown_seconds', COOLDOWN_SECONDS),
+    }
+
+
+def _get_hedge_executor():
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='hedge')
+        return _hedge_executor
+
+
+def _hedged(attempt, hedge_after):
+    """
+    Runs attempt(); if it has not finished after hedge_after seconds, starts a
+    second identical attempt and returns whichever succeeds first. The slower
+    one is left to finish in the background and its result is dropped.
+    """
+    executor = _get_hedge_executor()
+    pending = {executor.submit(run_metrics.bind(attempt))}
+    done, pending = wait(pending, timeout=hedge_after)
+    if not done:
+        run_metrics.count('hedged_requests')
+        pending.add(executor.submit(run_metrics.bind(attempt)))
+    error = None
+    while True:
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+        if not pending:
+            raise error
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+
+class ResiliencePolicy:
+    """
+    Per-host adaptive timeouts, hedging, jittered retries and circuit breakers.
+
+    Host health (recent latencies, consecutive failures, breaker state) is kept
+    in the cache directory so it carries over between runs.
+    """
+
+    def __init__(self, path, config=None):
+        self.path = path
+        self.settings = settings(config)
+        self._hosts = None
+        self._used = set()  # Keys called by this process
+        self._lock = threading.Lock()
+
+    def configure(self, config):
+        self.settings = settings(config)
+
+    def _host(self, key):
+        with self._lock:
+            if self._hosts is None:
+                stored = local_store.load_json(self.path, default={}) or {}
+                self._hosts = {name: HostHealth(**entry) for name, entry in stored.items()}
+            if key not in self._hosts:
+                self._hosts[key] = HostHealth()
+            self._used.add(key)
+            return self._hosts[key]
+
+    def call(self, key, func, retries=None, hedge=None, default_read_timeout=None):
+        """
+        Calls func(timeout) against the host named key.
+
+        Args:
+            key (str): Host (or service) the call goes to; health is tracked per key.
+            func (callable): Makes one attempt given a (connect, read) timeout; raises on failure.
+            retries (int, optional): Extra attempts for retryable errors (default from config).
+            hedge (bool, optional): Send a backup attempt when the first is slow (default from config).
+            default_read_timeout (float, optional): Read timeout until the host has latency samples.
+
+        Raises:
+            CircuitOpen: If the host has failed repeatedly and is cooling down.
+            Exception: The last error once retries or the call budget are used up.
+        """
+        options = self.settings
+        health = self._host(key)
+        if not health.allow(options):
+            run_metrics.count('circuit_open_skips')
+            raise CircuitOpen(f"{key} failed {health.failures} times in a row; skipping it until the cooldown ends.")
+
+        retries = options['max_retries'] if retries is None else retries
+        hedge = options['hedge'] if hedge is None else hedge
+        deadline = time.monotonic() + options['call_budget_seconds']
+        for attempt_number in range(retries + 1):
+            timeout = (CONNECT_TIMEOUT, health.read_timeout(options, default_read_timeout))
+            started = time.monotonic()
+            try:
+                hedge_after = health.hedge_delay() if hedge else None
+                if hedge_after is None:
+                    result = func(timeout)
+                else:
+                    result = _hedged(lambda: func(timeout), hedge_after)
+            except Exception as e:
+                delay = backoff_delay(attempt_number)
+                out_of_budget = time.monotonic() + delay + timeout[0] + timeout[1] > deadline
+                if attempt_number == retries or not is_retryable(e) or out_of_budget:
+                    if health.record_failure(options):
+                        logger.warning(f"Circuit opened for {key} after {health.failures} consecutive failures.")
+                        run_metrics.count('circuits_opened')
+                    raise
+                logger.warning(f"{key}: attempt {attempt_number + 1} failed ({e}); retrying in {delay:.1f}s.")
+                run_metrics.count('retries')
+                time.sleep(delay)
+                continue
+            health.record_success(time.monotonic() - started)
+            return result
+
+    def save(self):
+        """Persists the health of the hosts this process called, keeping other processes' entries on disk."""
+        with self._lock:
+            if not self._used:
+                return
+            hosts = {key: self._hosts[key] for key in self._used}
+        stored = local_store.load_json(self.path, default={}) or {}
+        stored.update({key: health.to_dict() for key, health in hosts.items()})
+        local_store.save_json(self.path, stored)
+
+
+def host_key(url):
+    """Health-tracking key for a URL: its host name."""
+    return urlparse(url).netloc.lower()
+
+
+policy = ResiliencePolicy(local_store.cache_path('host_health.json'))
+
+
+def configure(config):
+    """Applies the 'resilience' section of config to the shared policy."""
+    policy.configure(config)
+    return policy
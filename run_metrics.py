@@ -0,0 +1,188 @@
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import threading
+import time
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+# The run being measured and the property currently being processed. Worker pools copy the
+# context into their threads (see bind), so spans and counters land on the right run/property.
+_current_run = contextvars.ContextVar('apt_finder_run', default=None)
+_current_property = contextvars.ContextVar('apt_finder_property', default=None)
+
+
+class RunMetrics:
+    """Timing spans and counters for one run, overall and per property."""
+
+    def __init__(self, log_events=False):
+        self.log_events = log_events
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self.properties = {}
+        self._lock = threading.Lock()
+
+    def _property_entry(self, property_name):
+        return self.properties.setdefault(property_name, {'stages': {}, 'counters': {}})
+
+    def add_span(self, stage, seconds, property_name=None, error=False):
+        with self._lock:
+            targets = [self.stages]
+            if property_name is not None:
+                targets.append(self._property_entry(property_name)['stages'])
+            for stages in targets:
+                entry = stages.setdefault(stage, {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'errors': 0})
+                entry['calls'] += 1
+                entry['total_ms'] += seconds * 1000
+                entry['max_ms'] = max(entry['max_ms'], seconds * 1000)
+                entry['errors'] += int(error)
+        if self.log_events:
+            _log_event('span', stage=stage, property=property_name, ms=round(seconds * 1000, 1), error=error)
+
+    def add_count(self, name, amount, property_name=None):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+            if property_name is not None:
+                counters = self._property_entry(property_name)['counters']
+                counters[name] = counters.get(name, 0) + amount
+
+    def merge(self, data):
+        """Adds the stages, counters and per-property entries of another run's to_dict(), e.g. a shard's."""
+        def merge_stages(stages, other):
+            for stage, entry in other.items():
+                target = stages.setdefault(stage, {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'errors': 0})
+                target['calls'] += entry['calls']
+                target['total_ms'] += entry['total_ms']
+                target['max_ms'] = max(target['max_ms'], entry['max_ms'])
+                target['errors'] += entry['errors']
+
+        def merge_counters(counters, other):
+            for name, amount in other.items():
+                counters[name] = counters.get(name, 0) + amount
+
+        with self._lock:
+            merge_stages(self.stages, data.get('stages', {}))
+            merge_counters(self.counters, data.get('counters', {}))
+            for property_name, entry in data.get('properties', {}).items():
+                target = self._property_entry(property_name)
+                merge_stages(target['stages'], entry.get('stages', {}))
+                merge_counters(target['counters'], entry.get('counters', {}))
+
+    def to_dict(self):
+        """Returns the metrics as JSON-serialisable data with times rounded to 0.1 ms."""
+        def rounded(stages):
+            return {
+                stage: dict(entry, total_ms=round(entry['total_ms'], 1), max_ms=round(entry['max_ms'], 1))
+                for stage, entry in sorted(stages.items())
+            }
+
+        with self._lock:
+            return {
+                'wall_ms': round((time.perf_counter() - self.started) * 1000, 1),
+                'stages': rounded(self.stages),
+                'counters': dict(sorted(self.counters.items())),
+                'properties': {
+                    name: {'stages': rounded(entry['stages']), 'counters': dict(sorted(entry['counters'].items()))}
+                    for name, entry in self.properties.items()
+                },
+            }
+
+
+def _log_event(event, **fields):
+    logger.info(json.dumps(dict(fields, event=event), default=str, sort_keys=True))
+
+
+def is_logging_enabled(config):
+    """Whether config asks for spans and the run summary as structured (JSON) log lines."""
+    return bool((config or {}).get('metrics', {}).get('log', False))
+
+
+@contextlib.contextmanager
+def run(config=None):
+    """Measures everything executed in this context; yields the RunMetrics."""
+    metrics = RunMetrics(log_events=is_logging_enabled(config))
+    token = _current_run.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current_run.reset(token)
+        if metrics.log_events:
+            _log_event('run', **metrics.to_dict())
+
+
+@contextlib.contextmanager
+def use(metrics):
+    """Records into an existing RunMetrics, e.g. on a queue worker handling one job of a run."""
+    token = _current_run.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current_run.reset(token)
+
+
+@contextlib.contextmanager
+def property_scope(property_name):
+    """Attributes spans and counters in this context to one property as well as the run."""
+    token = _current_property.set(property_name)
+    try:
+        yield
+    finally:
+        _current_property.reset(token)
+
+
+@contextlib.contextmanager
+def span(stage):
+    """Times the enclosed block as one call of stage. A no-op outside run()."""
+    metrics = _current_run.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        metrics.add_span(stage, time.perf_counter() - start, _current_property.get(), error)
+
+
+def timed(stage):
+    """Decorator form of span()."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_span(stage, seconds):
+    """Records an already measured duration as one call of stage. A no-op outside run()."""
+    metrics = _current_run.get()
+    if metrics is not None:
+        metrics.add_span(stage, seconds, _current_property.get())
+
+
+def count(name, amount=1):
+    """Adds amount to a counter of the current run (and property). A no-op outside run()."""
+    metrics = _current_run.get()
+    if metrics is not None and amount:
+        metrics.add_count(name, amount, _current_property.get())
+
+
+def bind(func):
+    """Returns func wrapped to run in a copy of the caller's context, for use on worker threads."""
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # A Context can only be entered by one thread at a time, so each call gets its own copy
+        return context.copy().run(func, *args, **kwargs)
+    return wrapper
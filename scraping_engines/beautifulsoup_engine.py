@@ -1,6 +1,7 @@
 import logging
 import requests
-from bs4 import BeautifulSoup
+import http_client
+from scraping_engines import html_parsing, site_profiles
 
 # Configure logging for this module
 logger = logging.getLogger(__name__)
@@ -11,46 +12,34 @@ def scrape_listings(url, config=None):
 
     Args:
         url (str): The URL of the website to scrape.
-        config (dict, optional): Configuration parameters (not used in this basic example).
+        config (dict, optional): Configuration parameters. 'profile' forces a site profile by name.
 
     Returns:
         list: A list of dictionaries, where each dictionary represents a listing 
-              and contains extracted data (currently just title for placeholder).
+              and contains extracted data (all listing fields when a site profile
+              matches the page, otherwise just the title).
               Returns an empty list if scraping fails.
     """
     listings = []
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Cache-Control': 'no-cache',
-            'Pragma': 'no-cache',
-            'DNT': '1',
-            'Priority': 'u=0, i',
-            'Sec-CH-UA': '"Not(A:Brand";v="99", "Google Chrome";v="133", "Chromium";v="133"',
-            'Sec-CH-UA-Mobile': '?0',
-            'Sec-CH-UA-Platform': '"macOS"',
-            'Sec-Fetch-Dest': 'document',
-            'Sec-Fetch-Mode': 'navigate',
-            'Sec-Fetch-Site': 'same-origin',
-            'Sec-Fetch-User': '?1',
-            'Service-Worker-Navigation-Preload': 'true',
-            'Upgrade-Insecure-Requests': '1',
-            'Referer': url  # Set Referer to the website URL itself
-        }
-        response = requests.get(url, headers=headers, timeout=10)  # Add timeout
-        response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
-        html_content = response.text
-        soup = BeautifulSoup(html_content, 'html.parser')
-        listing_items = soup.find_all('div', class_='listing-item result js-listing-item')
+        headers = dict(http_client.BROWSER_HEADERS)
+        headers['Referer'] = url  # Set Referer to the website URL itself
+        html_content = http_client.fetch(url, headers=headers, conditional=False)  # Shared pooled session with timeouts
+        profile = site_profiles.profile_for(url, html_content, name=(config or {}).get('profile'))
+        if profile:
+            soup = html_parsing.parse_listing_containers(html_content, config, profile.container_class)
+            listings, unparsed_items = profile.extract(soup, url)
+            if unparsed_items:
+                logger.info(f"{len(unparsed_items)} listing blocks could not be parsed by the {profile.name} profile.")
+        else:
+            listing_items = html_parsing.find_listing_items(html_content, config)
 
-        for item in listing_items:
-            listing_data = {}
-            # Example: Extract title (replace with actual logic to extract all required data)
-            title_element = item.find('h2', class_='js-listing-title')
-            listing_data['title'] = title_element.text.strip() if title_element else "N/A" 
-            listings.append(listing_data)
+            for item in listing_items:
+                listing_data = {}
+                # Unknown layout: only the title can be extracted without Gemini
+                title_element = item.find('h2', class_='js-listing-title')
+                listing_data['title'] = title_element.text.strip() if title_element else "N/A" 
+                listings.append(listing_data)
 
     except requests.exceptions.RequestException as e:
         logger.error(f"Error scraping website {url} using BeautifulSoup: {e}")
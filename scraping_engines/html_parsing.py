@@ -0,0 +1,101 @@
+import logging
+from bs4 import BeautifulSoup, SoupStrainer
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARSER = 'lxml'
+FALLBACK_PARSER = 'html.parser'
+LISTING_CONTAINER_CLASS = 'listing-item result js-listing-item'
+
+_parser_available = {}
+
+
+def _is_available(parser):
+    if parser not in _parser_available:
+        try:
+            BeautifulSoup('<p></p>', parser)
+            _parser_available[parser] = True
+        except Exception:  # bs4.FeatureNotFound when the backend is not installed
+            logger.warning(f"HTML parser '{parser}' is not installed; falling back to '{FALLBACK_PARSER}'.")
+            _parser_available[parser] = False
+    return _parser_available[parser]
+
+
+def parser_name(config=None):
+    """Returns the BeautifulSoup backend selected by config['html_parser'], if installed."""
+    parser = (config or {}).get('html_parser', DEFAULT_PARSER)
+    return parser if _is_available(parser) else FALLBACK_PARSER
+
+
+def parse_listing_containers(html_content, config=None, container_class=LISTING_CONTAINER_CLASS):
+    """
+    Parses only the listing blocks of a page.
+
+    A SoupStrainer limits tree building to `div`s with the given class, so the
+    scripts, head markup and navigation around the listings are never turned
+    into nodes. Set config['parse_only_listings'] to false to build the full tree.
+
+    Args:
+        html_content (str): Page HTML.
+        config (dict, optional): Configuration with 'html_parser' / 'parse_only_listings'.
+        container_class (str): Full class attribute of one listing block.
+
+    Returns:
+        BeautifulSoup: A soup whose top-level elements are the listing blocks.
+    """
+    config = config or {}
+    parse_only = None
+    if config.get('parse_only_listings', True):
+        parse_only = SoupStrainer('div', class_=container_class)
+    return BeautifulSoup(html_content, parser_name(config), parse_only=parse_only)
+
+
+def find_listing_items(html_content, config=None, container_class=LISTING_CONTAINER_CLASS):
+    """Returns the listing block elements of a page."""
+    soup = parse_listing_containers(html_content, config, container_class)
+    return soup.find_all('div', class_=container_class)
+
+
+class ListingSectionWatcher:
+    """
+    Incremental parser for a streamed page that reports when the listings are over.
+
+    Fed each decoded chunk (see http_client.fetch's stop_reading), it returns
+    True once the element holding the listing containers has been closed, so
+    the scripts and footer after it never have to be downloaded. Elements are
+    cleared as soon as they end, so the watcher keeps no tree in memory.
+    """
+
+    def __init__(self, container_class=LISTING_CONTAINER_CLASS):
+        from lxml import etree
+        self.container_class = ' '.join(container_class.split())
+        self.listings_seen = 0
+        self.done = False
+        self._section = None
+        self._parser = etree.HTMLPullParser(events=('start', 'end'))
+
+    @classmethod
+    def create(cls, container_class=LISTING_CONTAINER_CLASS):
+        """Returns a watcher, or None when lxml is not installed (the page is then read in full)."""
+        try:
+            return cls(container_class)
+        except ImportError:
+            return None
+
+    def __call__(self, text):
+        if self.done:
+            return True
+        self._parser.feed(text)
+        for event, element in self._parser.read_events():
+            if event == 'start':
+                if ' '.join((element.get('class') or '').split()) == self.container_class:
+                    self.listings_seen += 1
+                    if self._section is None:
+                        self._section = element.getparent()
+            elif element is self._section:
+                self.done = True
+                break
+            else:
+                element.clear(keep_tail=True)
+        return self.done
@@ -0,0 +1,98 @@
+import logging
+import re
+from extraction_scheduler import estimate_tokens
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIN_SCORE = 2
+MAX_SECTION_CHARS = 4000
+LINK_DENSITY_LIMIT = 0.6
+
+HEADING = re.compile(r'^\s{0,3}#{1,6}\s')
+MARKDOWN_LINK = re.compile(r'!?\[[^\]]*\]\([^)]*\)')
+
+# Listing-likeness signals; each category counts at most MAX_HITS_PER_SIGNAL times.
+SIGNALS = {
+    'money': re.compile(r'\$\s?\d[\d,]*(?:\.\d+)?'),
+    'square_feet': re.compile(r'\b\d[\d,]*\s*(?:sq\.?\s*ft\.?|sqft|square\s+feet|sf)\b|\bsquare\s+feet\b', re.I),
+    'bed_bath': re.compile(r'\b(?:\d+(?:\.\d)?\s*(?:bd|beds?|bedrooms?|br|ba|baths?|bathrooms?)|studio)\b', re.I),
+    'date': re.compile(
+        r'\b\d{1,2}/\d{1,2}/\d{2,4}\b|\bavailable\b|\bmove[- ]in\b|'
+        r'\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?\s+\d{1,2}\b',
+        re.I,
+    ),
+}
+MAX_HITS_PER_SIGNAL = 3
+
+
+def split_sections(markdown):
+    """Splits markdown into sections at headings, and long sections further at blank lines."""
+    sections = []
+    current = []
+    for line in markdown.splitlines():
+        if HEADING.match(line) and current:
+            sections.append('\n'.join(current))
+            current = []
+        current.append(line)
+    if current:
+        sections.append('\n'.join(current))
+
+    split = []
+    for section in sections:
+        if len(section) <= MAX_SECTION_CHARS:
+            split.append(section)
+            continue
+        buffer = ''
+        for paragraph in section.split('\n\n'):
+            if buffer and len(buffer) + len(paragraph) > MAX_SECTION_CHARS:
+                split.append(buffer)
+                buffer = ''
+            buffer = f"{buffer}\n\n{paragraph}" if buffer else paragraph
+        if buffer:
+            split.append(buffer)
+    return [section for section in split if section.strip()]
+
+
+def score_section(section):
+    """Scores how much a section looks like listing data ($, sq ft, bd/ba, dates), penalising link farms."""
+    score = sum(min(len(pattern.findall(section)), MAX_HITS_PER_SIGNAL) for pattern in SIGNALS.values())
+    text_length = len(section.strip()) or 1
+    link_length = sum(len(match) for match in MARKDOWN_LINK.findall(section))
+    if link_length / text_length > LINK_DENSITY_LIMIT:
+        score /= 4  # Menus and footers: mostly links, maybe a stray price or date
+    return score
+
+
+def prune_markdown(markdown, config=None):
+    """
+    Keeps only the listing-like sections of a Jina markdown page.
+
+    Args:
+        markdown (str): Page markdown returned by the Jina reader.
+        config (dict, optional): Configuration with an optional 'markdown_pruning'
+                                 section ({"enabled": bool, "min_score": number}).
+
+    Returns:
+        tuple: (pruned_markdown, stats) where stats reports sections kept and the
+               characters and estimated tokens removed. The original text is
+               returned unchanged if pruning is disabled or nothing scores.
+    """
+    markdown = markdown or ''
+    pruning_config = (config or {}).get('markdown_pruning', {})
+    sections = split_sections(markdown)
+    kept = []
+    if pruning_config.get('enabled', True):
+        min_score = pruning_config.get('min_score', DEFAULT_MIN_SCORE)
+        kept = [section for section in sections if score_section(section) >= min_score]
+    pruned = '\n\n'.join(kept) if kept else markdown  # Never hand Gemini an empty page
+
+    stats = {
+        'sections_total': len(sections),
+        'sections_kept': len(kept) if kept else len(sections),
+        'chars_before': len(markdown),
+        'chars_after': len(pruned),
+        'chars_removed': len(markdown) - len(pruned),
+        'tokens_removed': max(0, estimate_tokens(markdown) - estimate_tokens(pruned)),
+    }
+    return pruned, stats
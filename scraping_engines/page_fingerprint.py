@@ -0,0 +1,97 @@
+import hashlib
+import logging
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+# Markup that changes on every request without the listings changing: scripts (RUM and
+# analytics config, CSRF tokens), styles, comments. Tags and their attributes are dropped too,
+# except link targets, since hidden inputs and data-* attributes carry per-request tokens.
+_VOLATILE_MARKUP = re.compile(r'<(script|style|noscript|template)\b.*?</\1\s*>|<!--.*?-->', re.S | re.I)
+_HREF = re.compile(r'<a\b[^>]*?\bhref\s*=\s*["\']([^"\']*)["\']', re.I)
+_TAG = re.compile(r'<[^>]*>')
+_WHITESPACE = re.compile(r'\s+')
+TRACKING_PARAMS = ('utm_', 'gclid', 'fbclid', 'msclkid', '_ga', '_gl', 'session', 'token', 'csrf')
+
+
+def settings(config):
+    """Returns the 'fingerprint' section of config.json with defaults filled in."""
+    fingerprint_config = (config or {}).get('fingerprint', {})
+    return {
+        'enabled': fingerprint_config.get('enabled', True),
+        'ignore_patterns': fingerprint_config.get('ignore_patterns', []),
+    }
+
+
+def _container_pattern(container_class):
+    classes = r'\s+'.join(re.escape(name) for name in container_class.split())
+    return re.compile(r'<div\b[^>]*?\bclass\s*=\s*["\']\s*' + classes + r'\s*["\']', re.I)
+
+
+def _default_container_class():
+    # Imported here: html_parsing pulls in bs4 and lxml, which a JinaAi-only cold start never needs
+    from scraping_engines.html_parsing import LISTING_CONTAINER_CLASS
+    return LISTING_CONTAINER_CLASS
+
+
+def listing_blocks(html_content, container_class=None):
+    """
+    Splits a page into the raw HTML of its listing blocks without parsing it.
+
+    Each block runs from one container's opening tag to the next one; the last
+    runs to the end of the page. container_class defaults to the generic listing container.
+    """
+    container_class = container_class or _default_container_class()
+    starts = [match.start() for match in _container_pattern(container_class).finditer(html_content)]
+    return [html_content[start:end] for start, end in zip(starts, starts[1:] + [len(html_content)])]
+
+
+def _strip_tracking(url):
+    parts = urlsplit(url)
+    if not parts.query:
+        return url
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+             if not key.lower().startswith(TRACKING_PARAMS)]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def normalize_block(block_html, ignore_patterns=()):
+    """Returns the material content of a listing block: its text plus link targets, volatile parts removed."""
+    block_html = _VOLATILE_MARKUP.sub(' ', block_html)
+    links = [_strip_tracking(href) for href in _HREF.findall(block_html)]
+    text = _WHITESPACE.sub(' ', _TAG.sub(' ', block_html)).strip()
+    for pattern in ignore_patterns:
+        text = re.sub(pattern, '', text)
+    return text + '\0' + ' '.join(links)
+
+
+def fingerprint(html_content, container_class=None, config=None):
+    """
+    Returns a fingerprint of the listing region of a page, or None if no listing block is found.
+
+    Two fetches with the same fingerprint have the same listing text and links in
+    the same order, whatever changed in the scripts, cookies or markup around them.
+    Extra patterns to ignore (e.g. "Posted \\d+ days ago") come from
+    config['fingerprint']['ignore_patterns'].
+    """
+    blocks = listing_blocks(html_content, container_class)
+    if not blocks:
+        return None
+    ignore_patterns = settings(config)['ignore_patterns']
+    digest = hashlib.blake2b(digest_size=16)
+    for block in blocks:
+        digest.update(normalize_block(block, ignore_patterns).encode('utf-8'))
+        digest.update(b'\0\0')
+    return f"{len(blocks)}:{digest.hexdigest()}"
+
+
+def combine(page_fingerprints):
+    """Combines (url, fingerprint) pairs of a crawled property into one, or None if no page had listings."""
+    if all(fingerprint is None for _, fingerprint in page_fingerprints):
+        return None
+    digest = hashlib.blake2b(digest_size=16)
+    for url, fingerprint in sorted(page_fingerprints, key=lambda pair: pair[0]):
+        digest.update(f"{url}={fingerprint}\0".encode('utf-8'))
+    return f"{len(page_fingerprints)}p:{digest.hexdigest()}"
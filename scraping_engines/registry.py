@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import http_client
+import run_metrics
+from listing_records import parse_number
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENGINE = 'BeautifulSoup'
+DEFAULT_RACE_ENGINES = ('BeautifulSoup', 'JinaAi')
+MIN_RENT_SHARE = 0.5  # A result validates when at least this share of listings has a rent
+STAGE_WORKERS = 32
+
+_ENGINES = {}
+_ALIASES = {}
+_stage_executor = None
+_stage_executor_lock = threading.Lock()
+
+
+def _get_stage_executor():
+    global _stage_executor
+    with _stage_executor_lock:
+        if _stage_executor is None:
+            _stage_executor = ThreadPoolExecutor(max_workers=STAGE_WORKERS, thread_name_prefix='engine-stage')
+        return _stage_executor
+
+
+async def run_blocking(func, *args):
+    """
+    Runs a blocking stage function on the shared stage pool.
+
+    Unlike asyncio.to_thread this pool outlives the event loop, so a run does
+    not wait for a cancelled engine's in-flight stage before returning.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_stage_executor(), run_metrics.bind(func), *args)
+
+
+class Engine:
+    """
+    Scraping engine interface: fetch -> parse -> extract, as coroutines.
+
+    Subclasses set `name` (and optional `aliases` accepted in config.json) and
+    implement the three stages; blocking work goes through run_blocking so
+    engines can be raced and cancelled between stages. Engines whose stages
+    cannot be run separately (e.g. on different queue workers) set `staged` to False.
+    """
+
+    name = None
+    aliases = ()
+    staged = True
+
+    async def fetch(self, property, config):
+        """Returns the raw page for a property, NOT_MODIFIED, or None on failure."""
+        raise NotImplementedError
+
+    async def parse(self, page, property, config):
+        """Turns a fetched page into whatever extract() needs."""
+        raise NotImplementedError
+
+    async def extract(self, parsed, property, config):
+        """Returns the listing dicts found in a parsed page."""
+        raise NotImplementedError
+
+    def commit(self, property, listings):
+        """Called with the final listings of a property; engines that keep per-page state store it here."""
+
+    async def fetch_and_parse(self, property, config):
+        """
+        Runs the fetch and parse stages.
+
+        Returns:
+            tuple: (listings, None) when there is nothing to extract (page unchanged
+                   since the last run, or not fetched), else (None, parsed).
+        """
+        page = await self.fetch(property, config)
+        if page is http_client.NOT_MODIFIED:
+            # Page unchanged since the last run: skip parsing and extraction entirely
+            return http_client.validator_store.cached_listings(property['url']), None
+        if not page:
+            return [], None
+        return None, await self.parse(page, property, config)
+
+    async def scrape(self, property, config):
+        """Runs the three stages for one property and returns its listings."""
+        listings, parsed = await self.fetch_and_parse(property, config)
+        if listings is None:
+            listings = await self.extract(parsed, property, config)
+        self.commit(property, listings)
+        return listings
+
+    def validate(self, listings):
+        """True if listings look like a real extraction: non-empty, and mostly with a rent."""
+        if not listings:
+            return False
+        with_rent = sum(1 for listing in listings if parse_number(listing.get('rent')) is not None)
+        return with_rent >= MIN_RENT_SHARE * len(listings)
+
+
+def register_engine(engine_class):
+    """Class decorator that adds an engine to the registry under its name and aliases."""
+    engine = engine_class()
+    _ENGINES[engine.name] = engine
+    for alias in (engine.name, *engine.aliases):
+        _ALIASES[alias.lower()] = engine.name
+    return engine_class
+
+
+def get_engine(name):
+    """Returns a registered engine by name or alias (case-insensitive), or None."""
+    return _ENGINES.get(_ALIASES.get(str(name or '').lower()))
+
+
+def engine_for(property, config):
+    """
+    Returns the engine for a website entry: its own 'engine' if set, else
+    config['scraping_engine']. Unknown names fall back to DEFAULT_ENGINE.
+    """
+    name = property.get('engine') or (config or {}).get('scraping_engine') or DEFAULT_ENGINE
+    engine = get_engine(name)
+    if engine is None:
+        logger.error(f"Unknown scraping engine '{name}' for {property.get('name')}; using {DEFAULT_ENGINE}.")
+        engine = get_engine(DEFAULT_ENGINE)
+    return engine
+
+
+def scrape(property, config):
+    """Runs the property's engine to completion from synchronous code (e.g. a worker thread)."""
+    return asyncio.run(engine_for(property, config).scrape(property, config))
+
+
+@register_engine
+class RaceEngine(Engine):
+    """
+    Runs several engines on the same property concurrently and keeps the first
+    result that validates. The others are cancelled at their next stage
+    boundary, so e.g. a Jina fetch that loses never reaches Gemini. If nothing
+    validates, the first non-empty result is used.
+
+    The contenders come from config['race_engines'] (default: BeautifulSoup and JinaAi).
+    """
+
+    name = 'race'
+    staged = False
+
+    async def scrape(self, property, config):
+        names = [name for name in config.get('race_engines', DEFAULT_RACE_ENGINES) if name != self.name]
+        contenders = {}
+        for name in names:
+            engine = get_engine(name)
+            if engine is None:
+                logger.error(f"Unknown engine '{name}' in race_engines; skipping it.")
+                continue
+            contenders[asyncio.create_task(engine.scrape(property, config))] = engine
+        fallback = []
+        try:
+            while contenders:
+                done, _ = await asyncio.wait(contenders, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    engine = contenders.pop(task)
+                    if task.exception() is not None:
+                        logger.warning(f"{engine.name} failed in the race for {property.get('name')}: {task.exception()}")
+                        continue
+                    listings = task.result()
+                    if engine.validate(listings):
+                        logger.info(f"{engine.name} won the race for {property.get('name')} with {len(listings)} listings.")
+                        run_metrics.count(f"race_won_by_{engine.name}")
+                        return listings
+                    fallback = fallback or listings
+            return fallback
+        finally:
+            for task in contenders:
+                task.cancel()
+            if contenders:
+                await asyncio.gather(*contenders, return_exceptions=True)
@@ -0,0 +1,144 @@
+import logging
+from urllib.parse import urljoin, urlparse
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+LISTING_FIELDS = ('rent', 'square_feet', 'bed_bath', 'available_date', 'address', 'title', 'url')
+
+_PROFILES = {}
+
+
+class SiteProfile:
+    """
+    Selector-based extractor for a known listing platform.
+
+    Subclasses set `name` and `container_class` and implement `extract_item`.
+    Listings come back with the same keys the Gemini prompt asks for, so the
+    rest of the pipeline cannot tell which path produced them.
+    """
+
+    name = None
+    container_class = None  # Full class attribute of one listing block
+    hosts = ()  # Hostname suffixes that always use this profile
+    markers = ()  # Strings whose presence in the HTML identifies the platform
+
+    def matches(self, url, html_content):
+        """Returns True if this profile should be used for the page."""
+        host = urlparse(url or '').netloc.lower()
+        if any(host == suffix or host.endswith('.' + suffix) for suffix in self.hosts):
+            return True
+        return bool(html_content) and all(marker in html_content for marker in self.markers)
+
+    def find_items(self, soup):
+        """Returns the listing blocks of a parsed page."""
+        return soup.find_all('div', class_=self.container_class)
+
+    def extract_item(self, item, base_url):
+        """Returns a listing dict, or None if the block cannot be parsed reliably."""
+        raise NotImplementedError
+
+    def extract(self, soup, base_url):
+        """
+        Extracts every listing block on the page.
+
+        Returns:
+            tuple: (listings, unparsed_items) where unparsed_items are the blocks
+                   the selectors could not handle and should go to Gemini.
+        """
+        listings = []
+        unparsed_items = []
+        for item in self.find_items(soup):
+            try:
+                listing = self.extract_item(item, base_url)
+            except Exception as e:
+                logger.warning(f"{self.name} profile failed on a listing block: {e}")
+                listing = None
+            if listing is None:
+                unparsed_items.append(item)
+            else:
+                listings.append(listing)
+        return listings, unparsed_items
+
+
+def register_profile(profile_class):
+    """Class decorator that adds a site profile to the registry."""
+    _PROFILES[profile_class.name] = profile_class()
+    return profile_class
+
+
+def get_profile(name):
+    """Returns a registered profile by name, or None."""
+    return _PROFILES.get(name)
+
+
+def profile_for(url, html_content, name=None):
+    """Returns the profile named in config, else the first registered one matching the page."""
+    if name:
+        return get_profile(name)
+    for profile in _PROFILES.values():
+        if profile.matches(url, html_content):
+            return profile
+    return None
+
+
+def _text(element):
+    return ' '.join(element.get_text(' ', strip=True).split()) if element else ''
+
+
+@register_profile
+class AppFolioProfile(SiteProfile):
+    """AppFolio hosted listings pages (e.g. https://namdar.appfolio.com/listings/)."""
+
+    name = 'appfolio'
+    container_class = 'listing-item result js-listing-item'
+    hosts = ('appfolio.com',)
+    markers = ('js-listing-item', 'js-listing-quick-facts')
+
+    # Quick-facts labels (lowercased) mapped to listing keys
+    FACT_LABELS = {
+        'rent': 'rent',
+        'square feet': 'square_feet',
+        'bed / bath': 'bed_bath',
+        'available': 'available_date',
+    }
+
+    def extract_item(self, item, base_url):
+        listing = dict.fromkeys(LISTING_FIELDS, 'N/A')
+
+        quick_facts = item.find(class_='js-listing-quick-facts')
+        if quick_facts:
+            for label in quick_facts.find_all('dt', class_='detail-box__label'):
+                key = self.FACT_LABELS.get(_text(label).lower())
+                value = label.find_next_sibling('dd', class_='detail-box__value')
+                if key and value and _text(value):
+                    listing[key] = _text(value)
+
+        if listing['available_date'] == 'N/A':
+            available = item.find(class_='js-listing-available')
+            if available:
+                listing['available_date'] = _text(available).replace('Available', '').strip() or 'N/A'
+
+        title = item.find(class_='js-listing-title')
+        if title:
+            listing['title'] = _text(title)
+
+        address = item.find(class_='js-listing-address')
+        if address:
+            listing['address'] = _text(address)
+
+        link = (
+            item.find('a', class_='js-link-to-detail')
+            or (title.find('a') if title else None)
+            or item.find('a', class_='js-listing-apply')
+        )
+        if link and link.get('href'):
+            listing['url'] = urljoin(base_url or '', link['href'])
+        elif base_url:
+            listing['url'] = base_url
+
+        # Rent plus something identifying the unit is the minimum worth returning;
+        # anything less is left for Gemini.
+        if listing['rent'] == 'N/A' or (listing['title'] == 'N/A' and listing['address'] == 'N/A'):
+            return None
+        return listing
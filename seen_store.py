@@ -0,0 +1,199 @@
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+import local_store
+from listing_records import parse_number
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+CHANGE_NEW = 'new'
+CHANGE_UPDATED = 'changed'
+CHANGE_PRICE_DROP = 'price_drop'
+
+_WHITESPACE = re.compile(r'\s+')
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def _normalize(value):
+    value = '' if value in (None, 'N/A') else str(value)
+    return _WHITESPACE.sub(' ', value).strip().lower()
+
+
+def listing_identity(property_name, listing, subscriber=None):
+    """Stable identity of a unit: property + unit (title/address) + URL, per subscriber if given."""
+    unit = _normalize(listing.get('address')) or _normalize(listing.get('title'))
+    key = '\0'.join((_normalize(property_name), unit, _normalize(listing.get('url'))))
+    if subscriber:  # Each subscriber has its own alert history
+        key = _normalize(subscriber) + '\0' + key
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def listing_fingerprint(listing):
+    """Hash of the fields whose change is worth an alert."""
+    key = '\0'.join(_normalize(listing.get(field)) for field in ('rent', 'available_date', 'square_feet', 'bed_bath'))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+class SeenListingStore:
+    """SQLite table of every listing alerted on, keyed by listing identity."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            '''
+            CREATE TABLE IF NOT EXISTS listings (
+                identity TEXT PRIMARY KEY,
+                property TEXT NOT NULL,
+                unit TEXT,
+                url TEXT,
+                rent REAL,
+                fingerprint TEXT NOT NULL,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS listings_property ON listings (property);
+            CREATE INDEX IF NOT EXISTS listings_last_seen ON listings (last_seen);
+            '''
+        )
+        self._conn.commit()
+
+    def _rows(self, all_listings, subscriber):
+        rows = []
+        for property_index, property_data in enumerate(all_listings):
+            for listing_index, listing in enumerate(property_data['listings']):
+                rows.append((
+                    listing_identity(property_data['name'], listing, subscriber),
+                    property_data['name'],
+                    listing.get('address') or listing.get('title'),
+                    listing.get('url'),
+                    parse_number(listing.get('rent')),
+                    listing_fingerprint(listing),
+                    property_index,
+                    listing_index,
+                ))
+        return rows
+
+    def _load_incoming(self, rows):
+        conn = self._conn
+        conn.execute(
+            'CREATE TEMP TABLE IF NOT EXISTS incoming ('
+            ' identity TEXT, property TEXT, unit TEXT, url TEXT, rent REAL, fingerprint TEXT,'
+            ' property_index INTEGER, listing_index INTEGER)'
+        )
+        conn.execute('DELETE FROM incoming')
+        conn.executemany('INSERT INTO incoming VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def changes(self, all_listings, subscriber=None):
+        """
+        Returns only the listings of a run worth alerting on, without recording them.
+
+        The run is loaded into a temporary table and joined against the store on
+        its primary key, so the cost depends on the size of the run, not on the
+        number of listings ever seen. Call mark_seen once the alert is delivered.
+
+        Args:
+            all_listings (list): [{'name': property name, 'listings': [listing dicts]}].
+            subscriber (str, optional): Keeps a separate history per subscriber profile.
+
+        Returns:
+            list: Same shape, keeping only properties with new, changed or
+                  price-dropped units. Each listing copy carries 'change' and,
+                  when known, 'previous_rent'.
+        """
+        rows = self._rows(all_listings, subscriber)
+        if not rows:
+            return []
+
+        with self._lock:
+            conn = self._conn
+            self._load_incoming(rows)
+            previous = conn.execute(
+                'SELECT i.property_index, i.listing_index, i.rent, l.rent, i.fingerprint, l.fingerprint, l.identity'
+                ' FROM incoming i LEFT JOIN listings l ON l.identity = i.identity'
+            ).fetchall()
+            conn.execute('DELETE FROM incoming')
+            conn.commit()
+
+        changes = {}
+        for property_index, listing_index, rent, previous_rent, fingerprint, previous_fingerprint, known in previous:
+            if known is None:
+                change = CHANGE_NEW
+            elif rent is not None and previous_rent is not None and rent < previous_rent:
+                change = CHANGE_PRICE_DROP
+            elif fingerprint != previous_fingerprint:
+                change = CHANGE_UPDATED
+            else:
+                continue
+            changes[(property_index, listing_index)] = (change, previous_rent)
+
+        changed_listings = []
+        for property_index, property_data in enumerate(all_listings):
+            listings = []
+            for listing_index, listing in enumerate(property_data['listings']):
+                if (property_index, listing_index) not in changes:
+                    continue
+                change, previous_rent = changes[(property_index, listing_index)]
+                listing = dict(listing, change=change)
+                if change != CHANGE_NEW and previous_rent is not None:
+                    listing['previous_rent'] = previous_rent
+                listings.append(listing)
+            if listings:
+                changed_listings.append({'name': property_data['name'], 'listings': listings})
+        logger.info(f"{len(changes)} of {len(rows)} listings are new or changed since the last run.")
+        return changed_listings
+
+    def mark_seen(self, all_listings, now=None, subscriber=None):
+        """Upserts one run's listings, so later runs only alert on what changes from here."""
+        now = now or time.time()
+        rows = self._rows(all_listings, subscriber)
+        if not rows:
+            return
+        with self._lock:
+            conn = self._conn
+            self._load_incoming(rows)
+            conn.execute(
+                'INSERT INTO listings (identity, property, unit, url, rent, fingerprint, first_seen, last_seen)'
+                ' SELECT identity, property, unit, url, rent, fingerprint, ?, ? FROM incoming WHERE true'
+                ' ON CONFLICT (identity) DO UPDATE SET'
+                ' unit = excluded.unit, url = excluded.url, rent = excluded.rent,'
+                ' fingerprint = excluded.fingerprint, last_seen = excluded.last_seen',
+                (now, now),
+            )
+            conn.execute('DELETE FROM incoming')
+            conn.commit()
+
+    def record(self, all_listings, now=None, subscriber=None):
+        """Returns the listings worth alerting on (see changes) and marks the whole run as seen."""
+        changed_listings = self.changes(all_listings, subscriber)
+        self.mark_seen(all_listings, now, subscriber)
+        return changed_listings
+
+    def prune(self, older_than_seconds, now=None):
+        """Deletes listings not seen for the given time; uses the last_seen index."""
+        cutoff = (now or time.time()) - older_than_seconds
+        with self._lock:
+            deleted = self._conn.execute('DELETE FROM listings WHERE last_seen < ?', (cutoff,)).rowcount
+            self._conn.commit()
+        return deleted
+
+    def close(self):
+        """Closes the database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+def get_store():
+    """Returns the process-wide seen-listing store, opening it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SeenListingStore(local_store.cache_path('seen_listings.sqlite3'))
+        return _store
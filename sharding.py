@@ -0,0 +1,236 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from multiprocessing import connection
+import requests
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+MODE_PROCESS = 'process'
+MODE_HTTP = 'http'
+DEFAULT_SHARDS = 4
+DEFAULT_TIMEOUT_SECONDS = 540  # Cloud Functions (1st gen) maximum
+TERMINATE_GRACE_SECONDS = 5
+SHARD_TOKEN_ENV = 'APT_FINDER_SHARD_TOKEN'
+
+_shard_processes = {}  # shard -> ShardProcess, kept between runs
+_shard_processes_lock = threading.Lock()
+
+
+def settings(config):
+    """Returns the 'sharding' section of config.json with defaults filled in."""
+    sharding_config = (config or {}).get('sharding', {})
+    return {
+        'enabled': sharding_config.get('enabled', False),
+        'shards': max(1, int(sharding_config.get('shards', DEFAULT_SHARDS))),
+        'mode': sharding_config.get('mode', MODE_PROCESS),
+        'worker_url': sharding_config.get('worker_url'),
+        'timeout_seconds': sharding_config.get('timeout_seconds', DEFAULT_TIMEOUT_SECONDS),
+    }
+
+
+def property_key(property):
+    """Identity a property is sharded by: its URL, so renaming it does not move it."""
+    return property.get('url') or property.get('name', '')
+
+
+def shard_for(key, shards):
+    """
+    Returns the shard (0..shards-1) that owns key, by rendezvous hashing.
+
+    Each shard scores the key and the highest score wins, so a property always
+    lands on the same shard (whose caches are warm for it), and changing the
+    shard count only moves the properties of the shards added or removed.
+    """
+    def score(shard):
+        return hashlib.blake2b(f"{shard}\0{key}".encode('utf-8'), digest_size=8).digest()
+    return max(range(shards), key=score)
+
+
+def partition(websites, shards):
+    """Splits the websites list into shards lists, keeping config order within each."""
+    partitions = [[] for _ in range(shards)]
+    for property in websites:
+        partitions[shard_for(property_key(property), shards)].append(property)
+    return partitions
+
+
+def _serve(conn):
+    """Worker process loop: runs each (func, args) received and sends back (ok, result or error)."""
+    while True:
+        try:
+            func, args = conn.recv()
+        except EOFError:
+            return  # The coordinator closed its end
+        try:
+            conn.send((True, func(*args)))
+        except Exception as e:
+            conn.send((False, f"{type(e).__name__}: {e}"))
+
+
+class ShardProcess:
+    """
+    A shard's long-lived worker process, driven over a pipe.
+
+    Unlike a process pool, the process itself is held, so a shard that hangs
+    can be terminated rather than left running (and writing to the caches)
+    after its run gave up on it. It is a daemon, so it never outlives the coordinator.
+    """
+
+    def __init__(self):
+        # spawn: the coordinator has live thread pools, which a forked child would inherit half-initialised
+        context = multiprocessing.get_context('spawn')
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def submit(self, func, *args):
+        """Starts func(*args) in the process; collect the outcome with result once ready."""
+        self.conn.send((func, args))
+
+    def ready(self):
+        """Objects connection.wait can wait on for this shard: its reply, or the process exiting."""
+        return [self.conn, self.process.sentinel]
+
+    def result(self):
+        """Returns the finished call's result; raises RuntimeError if it failed or the process died."""
+        if not self.conn.poll():
+            raise RuntimeError(f"worker process exited with code {self.process.exitcode}")
+        ok, value = self.conn.recv()
+        if not ok:
+            raise RuntimeError(value)
+        return value
+
+    def terminate(self):
+        """Stops the process (SIGTERM, then SIGKILL after a grace period) and waits for it."""
+        self.conn.close()
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(TERMINATE_GRACE_SECONDS)
+            if self.process.is_alive():
+                self.process.kill()
+        self.process.join()
+
+
+def _shard_process(shard):
+    """
+    Returns the long-lived worker process of a shard, starting it if needed.
+
+    A shard always runs in the same process, so its properties also find the
+    in-memory state (sessions, parsed config, loaded caches) warm on the next run.
+    """
+    with _shard_processes_lock:
+        worker = _shard_processes.get(shard)
+        if worker is None or not worker.process.is_alive():
+            worker = ShardProcess()
+            _shard_processes[shard] = worker
+        return worker
+
+
+def _discard_shard_process(shard):
+    """Terminates a shard's process after it failed or hung, so the next run starts a fresh one."""
+    with _shard_processes_lock:
+        worker = _shard_processes.pop(shard, None)
+    if worker is not None:
+        worker.terminate()
+
+
+def _report(shard, properties, status, result=None, error=None):
+    report = {'shard': shard, 'status': status, 'properties': [property['name'] for property in properties]}
+    if error is not None:
+        report['error'] = error
+    return report, result
+
+
+def _post_shard(options, shard, request_fields, timeout):
+    headers = {}
+    if os.environ.get(SHARD_TOKEN_ENV):
+        headers['Authorization'] = 'Bearer ' + os.environ[SHARD_TOKEN_ENV]
+    payload = dict(request_fields, shard=shard, shards=options['shards'])
+    response = requests.post(options['worker_url'], json=payload, headers=headers, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+def dispatch(config, run_shard, request_fields=None):
+    """
+    Runs every non-empty shard in parallel and collects the results.
+
+    In 'process' mode each shard is run_shard(config, shard, shards) in its own
+    long-lived worker process. In 'http' mode each shard is a POST of {"shard": i, "shards": n}
+    (plus request_fields) to sharding.worker_url, i.e. a parallel invocation of
+    the function itself.
+
+    A process shard that misses the deadline is terminated, so it stops
+    fetching and writing to the caches; its next run starts a fresh process.
+
+    Returns:
+        list: (report, result) per shard. A failed or timed-out shard has
+              status 'failed', an error and a None result; the others are unaffected.
+    """
+    options = settings(config)
+    shards = options['shards']
+    partitions = partition(config.get('websites', []), shards)
+    active = [shard for shard in range(shards) if partitions[shard]]
+    if not active:
+        return []
+    deadline = time.monotonic() + options['timeout_seconds']
+
+    if options['mode'] == MODE_HTTP:
+        return _dispatch_http(options, partitions, active, request_fields, deadline)
+
+    workers = {}
+    for shard in active:
+        workers[shard] = _shard_process(shard)
+        workers[shard].submit(run_shard, config, shard, shards)
+    pending = set(active)
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        ready = connection.wait([handle for shard in pending for handle in workers[shard].ready()], timeout=remaining)
+        pending = {shard for shard in pending if not any(handle in ready for handle in workers[shard].ready())}
+
+    results = []
+    for shard in active:
+        if shard in pending:
+            logger.error(f"Shard {shard} did not finish within {options['timeout_seconds']}s; terminating its process.")
+            results.append(_report(shard, partitions[shard], 'failed', error='timed out'))
+        else:
+            try:
+                results.append(_report(shard, partitions[shard], 'ok', result=workers[shard].result()))
+                continue
+            except (RuntimeError, EOFError, OSError) as e:
+                logger.error(f"Shard {shard} failed: {e}")
+                results.append(_report(shard, partitions[shard], 'failed', error=str(e)))
+        _discard_shard_process(shard)
+    return results
+
+
+def _dispatch_http(options, partitions, active, request_fields, deadline):
+    if not options['worker_url']:
+        raise ValueError("sharding.mode 'http' needs sharding.worker_url")
+    executor = ThreadPoolExecutor(max_workers=len(active), thread_name_prefix='shard')
+    futures = {shard: executor.submit(_post_shard, options, shard, request_fields or {}, options['timeout_seconds'])
+               for shard in active}
+    wait(futures.values(), timeout=max(0, deadline - time.monotonic()))
+    results = []
+    for shard in active:
+        future = futures[shard]
+        if not future.done():
+            future.cancel()
+            logger.error(f"Shard {shard} did not finish within {options['timeout_seconds']}s.")
+            results.append(_report(shard, partitions[shard], 'failed', error='timed out'))
+        elif future.exception() is not None:
+            logger.error(f"Shard {shard} failed: {future.exception()}")
+            results.append(_report(shard, partitions[shard], 'failed', error=str(future.exception())))
+        else:
+            results.append(_report(shard, partitions[shard], 'ok', result=future.result()))
+    executor.shutdown(wait=False, cancel_futures=True)
+    return results
@@ -0,0 +1,61 @@
+import logging
+import listing_records
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+
+def profiles(config):
+    """
+    Returns the subscriber profiles of config.json, or [] when there are none.
+
+    Each entry of config['subscribers'] has a name, recipients, its own filters
+    and max_rent_threshold, and optionally the property names it follows (all by default).
+    """
+    result = []
+    for index, subscriber in enumerate((config or {}).get('subscribers', [])):
+        recipients = subscriber.get('recipients') or []
+        filters = subscriber.get('filters', {})
+        result.append({
+            'name': subscriber.get('name') or f"subscriber-{index + 1}",
+            'recipients': [recipients] if isinstance(recipients, str) else list(recipients),
+            'filters': filters,
+            'max_rent_threshold': subscriber.get('max_rent_threshold'),
+            'keep_unknown': filters.get('keep_unknown', True),
+            'properties': set(subscriber['properties']) if subscriber.get('properties') else None,
+        })
+    return result
+
+
+def match(all_listings, subscriber_profiles, today=None):
+    """
+    Evaluates every subscriber profile against one run's shared listings.
+
+    All properties' listings go into a single ListingIndex, so each profile is a
+    handful of index lookups rather than a pass over every listing.
+
+    Args:
+        all_listings (list): [{'name': property name, 'listings': [listing dicts]}], unfiltered.
+        subscriber_profiles (list): From profiles().
+
+    Returns:
+        list: One all_listings-shaped list per profile, keeping the properties with matches.
+    """
+    property_names = []
+    flat_listings = []
+    for property_data in all_listings:
+        property_names.extend([property_data['name']] * len(property_data['listings']))
+        flat_listings.extend(property_data['listings'])
+    index = listing_records.ListingIndex(listing_records.ListingBatch.from_dicts(flat_listings, today))
+
+    results = []
+    for profile in subscriber_profiles:
+        grouped = {}
+        for position in index.query(profile['filters'], profile['max_rent_threshold'], profile['keep_unknown']):
+            name = property_names[position]
+            if profile['properties'] is None or name in profile['properties']:
+                grouped.setdefault(name, []).append(flat_listings[position])
+        # Positions are ascending, so properties and listings keep their run order
+        results.append([{'name': name, 'listings': listings} for name, listings in grouped.items()])
+        logger.info(f"Subscriber {profile['name']}: {sum(len(listings) for listings in grouped.values())} matching listings.")
+    return results